@@ -0,0 +1,260 @@
+# Headless command line entry point for the Group Assignment Tool
+# Runs group assignment on a question data file and a student response CSV
+# without the GUI, so nothing from Kivy is imported
+#
+# Usage, from the repository root:
+#   python -m Group_Assignment data/qtypes.csv data/c6_s_117.csv -g 4 -o groups.csv
+
+import sys
+import time
+import random
+import argparse
+from typing import *
+
+from Group_Assignment.groupAssignmentTool import GroupAssign, read_question_file
+from Group_Assignment.solverMetrics import SolverMetrics
+
+IDENTIFICATION = "(Identification Question)"
+
+# Default question weights, as in the GUI: heterogeneous multiple choice and
+# isolation questions, homogeneous otherwise, and isolation weighted higher
+DEFAULT_WEIGHT = 15
+HIGH_WEIGHT_TYPES = ["(Isolation Question)"]
+HETEROGENEOUS_TYPES = ["(Multiple Choice Question)", "(Isolation Question)"]
+
+def default_weight(q_type: str) -> float:
+    '''
+    Gets the default weight of a question type, negative for homogeneous distribution
+    '''
+    if q_type == IDENTIFICATION:
+        return 0
+    weight = DEFAULT_WEIGHT*4 if q_type in HIGH_WEIGHT_TYPES else DEFAULT_WEIGHT
+    return weight if q_type in HETEROGENEOUS_TYPES else -weight
+
+def find_question(key: str, q_texts: List[str]) -> str:
+    '''
+    Looks up a question given on the command line by its text or its
+    1-based column number in the question data file
+    Args:
+        key: str, question text or column number
+        q_texts: List[str], question texts of the question data file
+    Returns:
+        str, question text
+    Raises:
+        ValueError: If no question matches
+    '''
+    if key in q_texts:
+        return key
+    if key.isdigit() and 1 <= int(key) <= len(q_texts):
+        return q_texts[int(key) - 1]
+    raise ValueError("Unknown question \"{}\".".format(key))
+
+def build_questions(q_texts: List[str], q_types: List[str], q_opts: List[List[str]],
+                    weights: List[str], skip: List[str]) -> Tuple[Dict[str,float], Dict[str,str], Dict[str,List[str]]]:
+    '''
+    Builds the question dictionaries for GroupAssign
+    Args:
+        q_texts: List of question texts
+        q_types: List of question types
+        q_opts: List of lists of question response options
+        weights: List of "QUESTION=WEIGHT" overrides, negative weights for homogeneous groups
+        skip: List of questions to leave out of scoring
+    Returns:
+        Tuple of question weights, question types, and question options dictionaries
+    Raises:
+        ValueError: If an override is malformed or names an unknown question
+    '''
+    skipped = set(find_question(key, q_texts) for key in skip)
+    q_weights = {}
+    q_type_dict = {}
+    q_opt_dict = {}
+    for (text, q_type, options) in zip(q_texts, q_types, q_opts):
+        if text in skipped and q_type != IDENTIFICATION:
+            continue
+        q_weights[text] = default_weight(q_type)
+        q_type_dict[text] = q_type
+        q_opt_dict[text] = options
+
+    for override in weights:
+        (key, sep, value) = override.rpartition("=")
+        if not sep:
+            raise ValueError("Weight \"{}\" is not of the form QUESTION=WEIGHT.".format(override))
+        question = find_question(key, q_texts)
+        if question not in q_weights:
+            raise ValueError("Question \"{}\" is skipped and cannot be weighted.".format(question))
+        q_weights[question] = float(value)
+    return (q_weights, q_type_dict, q_opt_dict)
+
+def print_progress(record: Dict[str, Any]):
+    '''
+    Prints a solver progress record to stderr
+    '''
+    if record["event"] == "restart":
+        gap = "" if record["gap"] is None else ", gap {:.2%}".format(record["gap"])
+        print("[{:7.2f}s] restart {}: score {:.4f}, best {:.4f}{}".format(
+            record["elapsed"], record["restart"], record["score"], record["best"], gap),
+            file=sys.stderr)
+    elif record["event"] == "polish":
+        print("[{:7.2f}s] polish round {}: score {:.4f}, best {:.4f}".format(
+            record["elapsed"], record["iteration"], record["score"], record["best"]), file=sys.stderr)
+    elif "temperature" in record:
+        print("[{:7.2f}s] move {}: score {:.4f}, best {:.4f}, temperature {:.4g}".format(
+            record["elapsed"], record["iteration"], record["score"], record["best"],
+            record["temperature"]), file=sys.stderr)
+    else:
+        print("[{:7.2f}s] iteration {}: score {:.4f}".format(
+            record["elapsed"], record["iteration"], record["score"]), file=sys.stderr)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    '''
+    Command line entry point
+    Returns:
+        int, exit status
+    '''
+    parser = argparse.ArgumentParser(prog="python -m Group_Assignment",
+                                     description="Assign students to groups from survey responses.")
+    parser.add_argument("questions", help="question data file, in the format of data/qtypes.csv")
+    parser.add_argument("responses", help="student response CSV, with questions as headers")
+    parser.add_argument("-w", "--weight", action="append", default=[], metavar="QUESTION=WEIGHT",
+                        help="question weight, the question given by text or column number; "
+                             "negative weights group similar answers together (repeatable)")
+    parser.add_argument("--skip", action="append", default=[], metavar="QUESTION",
+                        help="question to leave out of scoring (repeatable)")
+    parser.add_argument("-g", "--group-size", type=int, default=4, help="students per group")
+    parser.add_argument("-m", "--mode", choices=["Strong", "Random", "Anneal"], default="Strong",
+                        help="Strong: greedy initialization then one swap search; "
+                             "Random: random restarts for the time budget; "
+                             "Anneal: simulated annealing for the time budget")
+    parser.add_argument("-t", "--time", type=float, default=10,
+                        help="time budget in seconds for Random and Anneal modes")
+    parser.add_argument("--restarts", choices=["fixed", "halving"], default="fixed",
+                        help="Random mode restart strategy: full swap searches, or "
+                             "successive halving which drops weak restarts early")
+    parser.add_argument("--shards", type=int, default=0, metavar="N",
+                        help="Strong and Random modes: split the class into N shards, searched "
+                             "independently (across -p processes) and then across shard "
+                             "boundaries, in place of one search over every group; for very "
+                             "large classes")
+    parser.add_argument("--checkpoint", metavar="FILE",
+                        help="Random mode with fixed restarts in one process: file to save "
+                             "search progress to, so that a killed run can be resumed")
+    parser.add_argument("--checkpoint-every", type=float, default=30, metavar="SECONDS",
+                        help="least seconds between checkpoints")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue from the --checkpoint file if it exists")
+    parser.add_argument("--gap", type=float, metavar="TOLERANCE",
+                        help="stop once the class score is within this fraction of an "
+                             "upper bound on the best possible score, e.g. 0.01")
+    parser.add_argument("--polish", type=float, default=0, metavar="SECONDS",
+                        help="seconds of compound move search (three-group rotations and "
+                             "ejection chains) after the main search, 0 to skip")
+    parser.add_argument("--previous", metavar="CSV",
+                        help="previous assignment, as written by -o, to carry over to the "
+                             "responses' roster after students add or drop, moving as few "
+                             "students as possible instead of assigning from scratch")
+    parser.add_argument("--drop", action="append", default=[], metavar="NAME",
+                        help="with --previous, student to leave out although in the responses (repeatable)")
+    parser.add_argument("--lock", action="append", default=[], metavar="NAME",
+                        help="with --previous, student to keep in their group (repeatable)")
+    parser.add_argument("-i", "--iterations", type=int, default=15000,
+                        help="swap attempts per swap search")
+    parser.add_argument("--combos", type=int, default=10000,
+                        help="combinations sampled per group by Strong initialization")
+    parser.add_argument("--engine", choices=["python", "numpy"], default="python")
+    parser.add_argument("-p", "--processes", type=int, default=1,
+                        help="worker processes for Random mode restarts or --shards, 0 for one per CPU")
+    parser.add_argument("--max-rows", type=int, default=0,
+                        help="number of response rows to load, 0 for all")
+    parser.add_argument("--cache-dir", metavar="DIR",
+                        help="directory of encoded response caches, so that later runs on "
+                             "an unchanged CSV and question config skip parsing it")
+    parser.add_argument("--seed", type=int, help="random seed")
+    parser.add_argument("-o", "--output", help="CSV file to write groups to, printed if not given")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="report progress and solver metrics on stderr")
+    args = parser.parse_args(argv)
+
+    if args.group_size < 2:
+        parser.error("group size must be at least 2")
+    if args.polish < 0:
+        parser.error("polish time must not be negative")
+    if args.gap is not None and args.gap < 0:
+        parser.error("gap tolerance must not be negative")
+    if (args.drop or args.lock) and not args.previous:
+        parser.error("--drop and --lock require --previous")
+    if args.resume and not args.checkpoint:
+        parser.error("--resume requires --checkpoint")
+    if args.checkpoint and (args.mode != "Random" or args.restarts != "fixed"
+                            or args.processes != 1 or args.previous):
+        parser.error("--checkpoint requires Random mode with fixed restarts in one process")
+    if args.shards < 0:
+        parser.error("number of shards must not be negative")
+    if args.shards and (args.mode == "Anneal" or args.previous or args.checkpoint):
+        parser.error("--shards requires Strong or Random mode without --previous or --checkpoint")
+    if args.previous and args.polish > 0:
+        parser.error("--polish moves any student, so cannot follow --previous")
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    start = time.perf_counter()
+    metrics = SolverMetrics(callback=print_progress if args.verbose else None)
+    try:
+        (q_texts, q_types, q_opts) = read_question_file(args.questions)
+        (q_weights, q_type_dict, q_opt_dict) = build_questions(q_texts, q_types, q_opts,
+                                                               args.weight, args.skip)
+        assigner = GroupAssign(args.responses, q_weights, q_type_dict, question_opts=q_opt_dict,
+                               per_group=args.group_size, n_iter=args.iterations,
+                               combos=args.combos, timelimit=args.time,
+                               mode="Repair" if args.previous else args.mode,
+                               select_size=args.max_rows, engine=args.engine, metrics=metrics,
+                               gap_tolerance=args.gap, cache_dir=args.cache_dir)
+        if args.previous:
+            score = assigner.repair(args.previous, dropped=args.drop, locked=args.lock)
+        elif args.shards:
+            shard_size = -(-len(assigner.students)//args.shards)
+            score = assigner.sharded_run(shard_size=shard_size, processes=args.processes,
+                                         seed=args.seed)
+        elif args.mode == "Strong":
+            score = assigner.iterate_normal()
+        elif args.mode == "Anneal":
+            score = assigner.anneal()
+        else:
+            score = assigner.anytime_run(processes=args.processes, seed=args.seed,
+                                         strategy=args.restarts, checkpoint=args.checkpoint,
+                                         checkpoint_every=args.checkpoint_every,
+                                         resume=args.resume)
+        if args.polish > 0 and not assigner.within_gap(score):
+            score = assigner.polish(timelimit=args.polish)
+    except (OSError, ValueError, AssertionError) as err:
+        print("Error: {}".format(err), file=sys.stderr)
+        return 2
+
+    if args.output:
+        assigner.output_state('c', args.output)
+    else:
+        assigner.output_state('p')
+
+    print("Assigned {} students to {} groups, class score {:.4f} ({:.2f}s).".format(
+        sum(len(group.students) for group in assigner.class_state.groups),
+        len(assigner.class_state.groups), score,
+        time.perf_counter() - start), file=sys.stderr)
+    if args.previous:
+        kept = sum(1 for student in assigner.students
+                   if assigner.previous_assignment.get(student.index) == student.group)
+        print("Kept {} of {} continuing students in their groups.".format(
+            kept, len(assigner.previous_assignment)), file=sys.stderr)
+    bound = assigner.upper_bound()
+    if bound is not None:
+        print("Upper bound {:.4f}, gap {:.2%}.".format(bound, assigner.optimality_gap(score)),
+              file=sys.stderr)
+    if args.verbose:
+        summary = metrics.summary()
+        phases = summary.pop("phases")
+        print(", ".join("{} {}".format(name, value) for (name, value) in summary.items()
+                        if name != "cache_hit_rate"), file=sys.stderr)
+        print(", ".join("{} {:.2f}s".format(name, seconds) for (name, seconds) in phases.items()),
+              file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
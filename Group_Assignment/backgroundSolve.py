@@ -0,0 +1,156 @@
+# Background solving for the Group Assignment Tool
+# Runs a GroupAssign solve in a separate process so that a GUI stays
+# responsive, streaming progress back at a bounded rate and supporting
+# cancellation, after which the best groups found so far are returned
+
+import sys
+import time
+import queue
+import types
+import multiprocessing
+from typing import *
+
+from Group_Assignment.groupAssignmentTool import GroupAssign
+from Group_Assignment.solverMetrics import SolverMetrics, SolveCancelled
+
+def _solve_worker(assign_args: Tuple, assign_kwargs: Dict[str, Any], messages, cancel,
+                  interval: float):
+    '''
+    Runs a solve in the worker process, putting messages on the queue:
+        ("progress", record) at most once per interval, where record holds
+            elapsed seconds, the current class score, the best class score that
+            would be kept if cancelled (None before any), the number of swap
+            attempts, and the number of restarts
+        ("done", (score, cancelled, assigner)) once the solve finishes or is cancelled
+        ("error", message) if the solve fails
+    Args:
+        assign_args: Tuple, positional arguments of GroupAssign
+        assign_kwargs: Dict, keyword arguments of GroupAssign; its mode selects
+            iterate_normal() for "Strong", anytime_run() for "Random", or
+            anneal() for "Anneal"
+        messages: multiprocessing Queue to put messages on
+        cancel: multiprocessing Event, set to stop the solve
+        interval: float, minimum seconds between progress messages
+    '''
+    mode = assign_kwargs.get("mode", "Strong")
+    strong = mode == "Strong"
+    best = [None]
+    last_sent = [float('-inf')]
+
+    def progress(record: Dict[str, Any]):
+        if cancel.is_set():
+            raise SolveCancelled()
+        # Strong searches only make improving swaps, restarts and annealing
+        # report the best groups they keep
+        if strong:
+            best[0] = record["score"]
+        elif "best" in record:
+            best[0] = record["best"]
+        now = time.perf_counter()
+        if now - last_sent[0] >= interval:
+            last_sent[0] = now
+            messages.put(("progress", {"elapsed": record["elapsed"], "score": record["score"],
+                                       "best": best[0],
+                                       "swaps": record["greedy_swaps"] + record["random_swaps"]
+                                                + record["anneal_moves"],
+                                       "restarts": record["restarts"]}))
+
+    try:
+        assigner = GroupAssign(*assign_args, metrics=SolverMetrics(callback=progress),
+                               **assign_kwargs)
+        cancelled = False
+        if strong:
+            try:
+                score = assigner.iterate_normal(visible=False)
+            except SolveCancelled:
+                cancelled = True
+                score = assigner.score_class_state()
+        else:
+            if mode == "Anneal":
+                score = assigner.anneal()
+            else:
+                score = assigner.anytime_run()
+            cancelled = cancel.is_set()
+    except Exception as err:
+        messages.put(("error", "{}: {}".format(type(err).__name__, err)))
+        return
+
+    # Only the groups are needed from here on
+    assigner.metrics = None
+    assigner.score_index = None
+    if assigner.score_cache is not None:
+        assigner.score_cache.clear()
+    messages.put(("done", (score, cancelled, assigner)))
+
+class BackgroundSolve:
+    '''
+    A GroupAssign solve running in a separate process
+
+    Attributes:
+        process: multiprocessing Process running the solve
+        messages: Queue of messages from the worker, see _solve_worker()
+        cancel_event: Event set by cancel()
+        cancel_time: Time cancel() was first called, None if not cancelled
+    '''
+    def __init__(self, assign_args: Tuple, assign_kwargs: Dict[str, Any],
+                 interval: Optional[float] = .25):
+        '''
+        Starts the solve
+        Args:
+            assign_args: Tuple, positional arguments of GroupAssign
+            assign_kwargs: Dict, keyword arguments of GroupAssign, except metrics
+            interval: Optional float, minimum seconds between progress messages
+        '''
+        # Spawned rather than forked, as forking a process running a GUI is unsafe
+        context = multiprocessing.get_context("spawn")
+        self.messages = context.Queue()
+        self.cancel_event = context.Event()
+        self.cancel_time = None
+        self.process = context.Process(target=_solve_worker, daemon=True,
+                                       args=(assign_args, assign_kwargs, self.messages,
+                                             self.cancel_event, interval))
+
+        # Spawned processes import the parent's main module again, which for a
+        # GUI script would open a second window. The worker needs nothing from it
+        main = sys.modules["__main__"]
+        sys.modules["__main__"] = types.ModuleType("__main__")
+        try:
+            self.process.start()
+        finally:
+            sys.modules["__main__"] = main
+
+    def poll(self) -> List[Tuple[str, Any]]:
+        '''
+        Gets every message the worker has sent since the last poll, without blocking
+        Returns:
+            List of (kind, value) messages, see _solve_worker()
+        '''
+        received = []
+        while True:
+            try:
+                received.append(self.messages.get_nowait())
+            except queue.Empty:
+                return received
+
+    def cancel(self):
+        '''
+        Asks the worker to stop at its next progress report and send the best groups so far
+        '''
+        if self.cancel_time is None:
+            self.cancel_time = time.time()
+        self.cancel_event.set()
+
+    def cancel_overdue(self, grace: Optional[float] = 5) -> bool:
+        '''
+        Checks whether the worker has ignored a cancellation for longer than
+        grace seconds, e.g. while still loading or initializing groups
+        '''
+        return self.cancel_time is not None and time.time() - self.cancel_time > grace
+
+    def terminate(self):
+        '''
+        Stops the worker immediately, discarding its progress
+        '''
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
@@ -0,0 +1,412 @@
+# Benchmark suite for the Group Assignment Tool
+# Classes are generated with gen_opt_groups(), so every run knows the optimal
+# score it is chasing. Each case records solver throughput, score quality and
+# peak memory, results are written as JSON, and two result files can be
+# compared to flag regressions
+#
+# Usage, from the repository root:
+#   python -m Group_Assignment.benchmarkSuite run -o baseline.json
+#   python -m Group_Assignment.benchmarkSuite run --preset full -o current.json
+#   python -m Group_Assignment.benchmarkSuite run --sizes 10000 50000 --group-sizes 4 --modes Random Sharded
+#   python -m Group_Assignment.benchmarkSuite compare baseline.json current.json
+
+import os.path
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import itertools
+import multiprocessing
+from typing import *
+
+try:
+    import resource
+except ImportError: # Not available on Windows, peak memory is then not recorded
+    resource = None
+
+from Group_Assignment.groupAssignmentTool import GroupAssign, read_question_file
+from Group_Assignment.solverMetrics import SolverMetrics
+from Group_Assignment.questionColumns import MULTIPLE_CHOICE, CHECKBOX, SCHEDULING, ISOLATION
+
+QUESTION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "qtypes.csv")
+IDENTIFICATION = "(Identification Question)"
+
+# Question types included by each question mix, on top of the identification question
+QUESTION_MIXES = {
+    "demo": [MULTIPLE_CHOICE, CHECKBOX, SCHEDULING, ISOLATION],
+    "choice": [MULTIPLE_CHOICE],
+    "sets": [CHECKBOX, SCHEDULING],
+}
+
+MODES = ["Strong", "Random", "Anneal", "Sharded"]
+
+PRESETS = {
+    "quick": {"sizes": [100, 1000], "group_sizes": [3, 4, 6],
+              "mixes": list(QUESTION_MIXES), "modes": ["Strong", "Random", "Anneal"]},
+    "full": {"sizes": [100, 1000, 10000, 50000], "group_sizes": [3, 4, 6, 12],
+             "mixes": list(QUESTION_MIXES), "modes": ["Strong", "Random", "Anneal"]},
+}
+
+# Compared metrics, and whether a higher value is better
+HIGHER_IS_BETTER = {
+    "swaps_per_second": True,
+    "score_calls_per_second": True,
+    "init_seconds": False,
+    "peak_rss_mb": False,
+}
+
+def load_questions(finame: str, q_types: List[str], seed: int) -> Tuple[Dict[str,float], Dict[str,str], Dict[str,List[str]]]:
+    '''
+    Reads question texts, types, and options from a question data file, keeping
+    the identification question and questions of the given types
+    Args:
+        finame: str, question data file, in the format of data/qtypes.csv
+        q_types: List[str], question types to keep
+        seed: int, seed for the random question weights
+    Returns:
+        Tuple of question weights, question types, and question options dictionaries
+    Raises:
+        ValueError: If the question data file is invalid
+    '''
+    (q_texts, q_type_list, q_opts) = read_question_file(finame)
+
+    rng = random.Random(seed)
+    weights = {}
+    types = {}
+    opts = {}
+    for (text, q_type, options) in zip(q_texts, q_type_list, q_opts):
+        if q_type != IDENTIFICATION and q_type not in q_types:
+            continue
+        types[text] = q_type
+        opts[text] = options
+        if q_type == IDENTIFICATION:
+            weights[text] = 0
+        else: # Mix of homogeneous (negative) and heterogeneous (positive) questions
+            weights[text] = rng.choice([-1, 1])*rng.uniform(.5, 3)
+    return (weights, types, opts)
+
+def case_id(case: Dict[str, Any]) -> str:
+    '''
+    Builds the identifier results are matched on when comparing
+    '''
+    if case["mode"] == "Sharded":
+        return "n{size}-g{group_size}-{mix}-{mode}{shard_size}x{processes}-{engine}".format(**case)
+    return "n{size}-g{group_size}-{mix}-{mode}-{engine}".format(**case)
+
+def peak_rss_mb() -> Optional[float]:
+    '''
+    Gets the peak resident set size of this process in MB, None where unsupported
+    '''
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin": # bytes on macOS, kilobytes elsewhere
+        return peak/2**20
+    return peak/2**10
+
+def class_score(groups) -> float:
+    '''
+    Averages the current group scores
+    '''
+    return sum(group.score for group in groups)/len(groups)
+
+def run_case(case: Dict[str, Any], iterations: int, targets: List[float], combos: int,
+             check_every: int, seed: int) -> Dict[str, Any]:
+    '''
+    Runs one benchmark case: generates a class with known optimal groups,
+    initializes it, and performs a fixed number of swap attempts. "Anneal"
+    cases instead make group_size**2 times as many anneal() moves, as each
+    move scores one student pairing where a swap attempt scores them all.
+    "Sharded" cases start from random groups like "Random" cases, then
+    spread the swap attempts over the shards of sharded_run(), so that they
+    compare with "Random" cases at an equal budget. Their targets are only
+    checked once sharded_run() returns
+    Args:
+        case: Dict with the size, group_size, mix, mode, and engine of the case,
+            and the shard_size and processes of "Sharded" cases
+        iterations: int, number of swap attempts
+        targets: List[float], fractions of the optimal score to time reaching
+        combos: int, number of combinations sampled per group by strong initialization
+        check_every: int, number of swap attempts between class score checks
+        seed: int, seed for question weights, generated data, and the solver
+    Returns:
+        Dict of the case parameters and its measurements
+    '''
+    (weights, types, opts) = load_questions(QUESTION_FILE, QUESTION_MIXES[case["mix"]], seed)
+    random.seed(seed)
+
+    start = time.perf_counter()
+    assigner = GroupAssign(None, weights, types, question_opts=opts,
+                           per_group=case["group_size"], combos=combos,
+                           mode="Random" if case["mode"] == "Sharded" else case["mode"],
+                           select_size=case["size"], optimal_comp=True, engine=case["engine"])
+    init_seconds = time.perf_counter() - start
+
+    groups = assigner.class_state.groups
+    opt_score = assigner.opt_score
+    initial_score = class_score(groups)
+
+    # Time to target counts swap search time only, excluding the score checks
+    thresholds = [(target, opt_score - (1 - target)*abs(opt_score)) for target in targets]
+    time_to = {str(target): None for target in targets}
+    for (target, threshold) in thresholds:
+        if initial_score >= threshold:
+            time_to[str(target)] = 0.0
+
+    if case["mode"] == "Anneal":
+        attempts = iterations*case["group_size"]**2
+
+        def reached(record: Dict[str, Any]):
+            for (target, threshold) in thresholds:
+                if time_to[str(target)] is None and record["score"] >= threshold:
+                    time_to[str(target)] = record["elapsed"]
+
+        assigner.metrics = SolverMetrics(callback=reached)
+        start = time.perf_counter()
+        assigner.anneal(moves=attempts, block=check_every)
+        swap_seconds = time.perf_counter() - start
+        successful = assigner.metrics.anneal_accepted
+        assigner.metrics = None
+    elif case["mode"] == "Sharded":
+        # Each shard gets its share of the attempts, and half of it again when refining
+        per_shard = max(3, case["shard_size"]//case["group_size"])
+        n_shards = len(assigner.split_shards(list(range(len(groups))), per_shard))
+        if len(groups) < 2*per_shard: # Not sharded
+            shard_iterations = iterations
+        else:
+            shard_iterations = max(1, int(iterations/(1.5*n_shards)))
+
+        assigner.metrics = SolverMetrics()
+        start = time.perf_counter()
+        assigner.sharded_run(shard_size=case["shard_size"], iterations=shard_iterations,
+                             processes=case["processes"], seed=seed)
+        swap_seconds = time.perf_counter() - start
+        attempts = assigner.metrics.greedy_swaps + assigner.metrics.random_swaps
+        successful = assigner.metrics.accepted_swaps
+        assigner.metrics = None
+
+        score = class_score(assigner.class_state.groups)
+        for (target, threshold) in thresholds:
+            if time_to[str(target)] is None and score >= threshold:
+                time_to[str(target)] = swap_seconds
+    else:
+        attempts = iterations
+        swap_seconds = 0
+        successful = 0
+        done = 0
+        while done < iterations:
+            batch = min(check_every, iterations - done)
+            start = time.perf_counter()
+            for _ in range(batch):
+                successful += assigner.swap_students_limited(groups)
+            swap_seconds += time.perf_counter() - start
+            done += batch
+
+            score = class_score(groups)
+            for (target, threshold) in thresholds:
+                if time_to[str(target)] is None and score >= threshold:
+                    time_to[str(target)] = swap_seconds
+    groups = assigner.class_state.groups # anneal() may have restored its best groups
+    final_score = assigner.score_class_state()
+
+    # score_group() throughput over the final groups, for at least a quarter second
+    calls = 0
+    start = time.perf_counter()
+    while calls == 0 or time.perf_counter() - start < .25:
+        for group in groups:
+            assigner.score_group(group)
+        calls += len(groups)
+    score_seconds = time.perf_counter() - start
+
+    result = dict(case)
+    result.update({
+        "id": case_id(case),
+        "init_seconds": init_seconds,
+        "opt_score": opt_score,
+        "initial_score": initial_score,
+        "final_score": final_score,
+        "final_ratio": final_score/opt_score if opt_score > 0 else None,
+        "swap_attempts": attempts,
+        "successful_swaps": successful,
+        "swaps_per_second": attempts/swap_seconds if swap_seconds > 0 else None,
+        "score_calls_per_second": calls/score_seconds,
+        "time_to": time_to,
+        "peak_rss_mb": peak_rss_mb(),
+    })
+    return result
+
+def build_cases(sizes: List[int], group_sizes: List[int], mixes: List[str], modes: List[str],
+                engine: str, shard_size: Optional[int] = 2000,
+                processes: Optional[int] = 1) -> List[Dict[str, Any]]:
+    '''
+    Builds the benchmark cases of a sweep, skipping groups larger than the class
+    Returns:
+        List of case dictionaries
+    Raises:
+        ValueError: If an unknown question mix or mode is given
+    '''
+    for mix in mixes:
+        if mix not in QUESTION_MIXES:
+            raise ValueError("Unknown question mix \"{}\".".format(mix))
+    for mode in modes:
+        if mode not in MODES:
+            raise ValueError("Unknown mode \"{}\".".format(mode))
+    cases = []
+    for (size, group_size, mix, mode) in itertools.product(sizes, group_sizes, mixes, modes):
+        if group_size > size:
+            continue
+        case = {"size": size, "group_size": group_size, "mix": mix, "mode": mode, "engine": engine}
+        if mode == "Sharded":
+            case.update({"shard_size": shard_size, "processes": processes})
+        cases.append(case)
+    return cases
+
+def run_suite(cases: List[Dict[str, Any]], iterations: int, targets: List[float], combos: int,
+              check_every: int, seed: int, isolate: Optional[bool] = True,
+              visible: Optional[bool] = False) -> Dict[str, Any]:
+    '''
+    Runs benchmark cases, each in a fresh process unless isolate is False so
+    that peak memory is measured per case
+    Returns:
+        Dict of run metadata and the list of case results
+    '''
+    results = []
+    for case in cases:
+        args = (case, iterations, targets, combos, check_every, seed)
+        if isolate:
+            with multiprocessing.get_context("spawn").Pool(1) as pool:
+                result = pool.apply(run_case, args)
+        else:
+            result = run_case(*args)
+        results.append(result)
+        if visible:
+            print("{:<40} {:>10.0f} swaps/s {:>10.0f} scores/s  score {:.3f} of {:.3f}".format(
+                result["id"], result["swaps_per_second"] or 0, result["score_calls_per_second"],
+                result["final_score"], result["opt_score"]))
+
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    meta = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+            "platform": platform.platform(), "numpy": numpy_version, "iterations": iterations,
+            "targets": targets, "combos": combos, "seed": seed}
+    return {"meta": meta, "results": results}
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float,
+                    score_tolerance: float) -> List[str]:
+    '''
+    Compares two result sets case by case
+    Args:
+        baseline: Dict, results loaded from the baseline file
+        current: Dict, results loaded from the file to check
+        tolerance: float, allowed relative slowdown or memory growth
+        score_tolerance: float, allowed drop in the final fraction of the optimal score
+    Returns:
+        List[str], one message per regression
+    '''
+    base_cases = {result["id"]: result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        base = base_cases.get(result["id"])
+        if base is None:
+            continue
+
+        for (metric, higher) in HIGHER_IS_BETTER.items():
+            (old, new) = (base.get(metric), result.get(metric))
+            if not old or new is None:
+                continue
+            change = (new - old)/old
+            if (higher and change < -tolerance) or (not higher and change > tolerance):
+                regressions.append("{}: {} {:.4g} -> {:.4g} ({:+.1%})".format(
+                    result["id"], metric, old, new, change))
+
+        if base.get("final_ratio") is not None and result.get("final_ratio") is not None \
+                and result["final_ratio"] < base["final_ratio"] - score_tolerance:
+            regressions.append("{}: final_ratio {:.4f} -> {:.4f}".format(
+                result["id"], base["final_ratio"], result["final_ratio"]))
+
+        for (target, old) in base["time_to"].items():
+            new = result["time_to"].get(target)
+            if old is None:
+                continue
+            if new is None:
+                regressions.append("{}: no longer reaches {} of the optimal score".format(
+                    result["id"], target))
+            elif new > old*(1 + tolerance) and new - old > .01: # ignore timer noise
+                regressions.append("{}: time to {} {:.4g}s -> {:.4g}s".format(
+                    result["id"], target, old, new))
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    '''
+    Command line entry point
+    Returns:
+        int, exit status, 1 if compare found regressions
+    '''
+    parser = argparse.ArgumentParser(prog="python -m Group_Assignment.benchmarkSuite",
+                                     description="Group Assignment Tool benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run a benchmark sweep")
+    run.add_argument("--preset", choices=list(PRESETS), default="quick")
+    run.add_argument("--sizes", type=int, nargs="+", help="class sizes, overrides the preset")
+    run.add_argument("--group-sizes", type=int, nargs="+", help="group sizes, overrides the preset")
+    run.add_argument("--mixes", nargs="+", choices=list(QUESTION_MIXES), help="question mixes")
+    run.add_argument("--modes", nargs="+", choices=MODES,
+                     help="solver modes, Anneal runs anneal() rather than swap attempts, "
+                          "Sharded spreads the swap attempts over sharded_run() shards")
+    run.add_argument("--engine", choices=["python", "numpy"], default="python")
+    run.add_argument("--shard-size", type=int, default=2000, help="students per shard of Sharded cases")
+    run.add_argument("--shard-processes", type=int, default=1,
+                     help="worker processes of Sharded cases, 0 for one per CPU")
+    run.add_argument("--iterations", type=int, default=5000, help="swap attempts per case")
+    run.add_argument("--targets", type=float, nargs="+", default=[.8, .9, .95],
+                     help="fractions of the optimal score to time reaching")
+    run.add_argument("--combos", type=int, default=1000,
+                     help="combinations sampled per group by strong initialization")
+    run.add_argument("--check-every", type=int, default=100,
+                     help="swap attempts between class score checks")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--no-isolate", action="store_true",
+                     help="run cases in this process (peak memory is then cumulative)")
+    run.add_argument("-o", "--output", default="benchmark_results.json")
+
+    compare = commands.add_parser("compare", help="flag regressions against a baseline")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--tolerance", type=float, default=.1,
+                         help="allowed relative slowdown or memory growth")
+    compare.add_argument("--score-tolerance", type=float, default=.02,
+                         help="allowed drop in the final fraction of the optimal score")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        if args.shard_processes != 1 and not args.no_isolate: # Pool workers cannot start workers
+            parser.error("--shard-processes other than 1 requires --no-isolate")
+        preset = PRESETS[args.preset]
+        cases = build_cases(args.sizes or preset["sizes"], args.group_sizes or preset["group_sizes"],
+                            args.mixes or preset["mixes"], args.modes or preset["modes"], args.engine,
+                            shard_size=args.shard_size, processes=args.shard_processes)
+        suite = run_suite(cases, args.iterations, args.targets, args.combos, args.check_every,
+                          args.seed, isolate=not args.no_isolate, visible=True)
+        with open(args.output, 'w') as outfile:
+            json.dump(suite, outfile, indent=2)
+        print("Wrote {} results to {}".format(len(suite["results"]), args.output))
+        return 0
+
+    with open(args.baseline, 'r') as infile:
+        baseline = json.load(infile)
+    with open(args.current, 'r') as infile:
+        current = json.load(infile)
+    regressions = compare_results(baseline, current, args.tolerance, args.score_tolerance)
+    for regression in regressions:
+        print(regression)
+    print("{} regression(s) found.".format(len(regressions)))
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
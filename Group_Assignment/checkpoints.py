@@ -0,0 +1,126 @@
+# Checkpoints of anytime_run() progress for the Group Assignment Tool
+# A checkpoint holds everything a random restart search depends on: the
+# current restart's groups and swap search position, the best groups so far,
+# epsilon, the random module's state, and the time and restarts spent. It is
+# written atomically, so that a run killed at any point can resume from its
+# latest checkpoint as if it had never stopped (see GroupAssign.anytime_run()).
+# Checkpoints are pickles, so loading one can run arbitrary code: only resume
+# from checkpoint files you wrote yourself, never from untrusted paths
+
+import os
+import pickle
+import hashlib
+import tempfile
+from typing import *
+
+FORMAT = b"GACKPT1\n"
+
+class Checkpoint:
+    '''
+    Saved progress of an anytime_run()
+
+    Attributes:
+        fingerprint: Identifies the students and settings of the run, see fingerprint()
+        elapsed: Seconds the run had been going
+        restarts: Number of restarts finished
+        average: Average seconds per restart, which anytime_run() stops short of its time limit by
+        best_score: Best class score of a finished restart, -inf before any
+        best_state: Snapshot of the best groups, None before any restart finished
+        state: Snapshot of the current restart's groups, None between restarts
+        total: Running total of the current restart's group scores, see ScoreIndex
+        iteration: Swap attempts made by the current restart
+        prev_score: Convergence reference score of the current restart, see iterate_normal()
+        conv_1: Whether the current restart had converged for one check, see iterate_normal()
+        epsilon: Current epsilon
+        rng: State of the random module
+        counters: Dict of SolverMetrics counter values, None without metrics
+    '''
+    __slots__ = ("fingerprint", "elapsed", "restarts", "average", "best_score", "best_state",
+                 "state", "total", "iteration", "prev_score", "conv_1", "epsilon", "rng",
+                 "counters")
+
+    def __init__(self):
+        self.fingerprint = ""
+        self.elapsed = 0.0
+        self.restarts = 0
+        self.average = 0.0
+        self.best_score = float('-inf')
+        self.best_state = None
+        self.state = None
+        self.total = 0.0
+        self.iteration = 0
+        self.prev_score = 0
+        self.conv_1 = False
+        self.epsilon = 0.0
+        self.rng = None
+        self.counters = None
+
+def fingerprint(assigner: Any) -> str:
+    '''
+    Identifies what a checkpoint's groups and scores mean: the students, in
+    row order, with their answers to every question, the questions with their
+    types and weights, the scheduling blocks, the group size, the scoring
+    engine, and the default number of swap attempts
+    Args:
+        assigner: GroupAssign
+    Returns:
+        str, hex digest
+    '''
+    settings = (assigner.per_group, assigner.engine, assigner.n_iter, assigner.blocks,
+                assigner.check_delimiter, sorted(assigner.majority_opt.items()),
+                sorted(assigner.restrictive_questions.items()),
+                [(question, assigner.question_types[question], assigner.question_weights[question])
+                 for question in assigner.questions], len(assigner.students))
+    digest = hashlib.sha256(repr(settings).encode())
+    questions = assigner.questions
+    for student in assigner.students:
+        # Answers are strings, or lists of selections in generated classes
+        digest.update(repr([student.answers[question] for question in questions]).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def write_checkpoint(path: str, checkpoint: Checkpoint):
+    '''
+    Writes a checkpoint, replacing any previous one only once it is fully on disk
+    Args:
+        path: str, checkpoint file
+        checkpoint: Checkpoint to write
+    Raises:
+        OSError: If the file cannot be written
+    '''
+    directory = os.path.dirname(path) or "."
+    (descriptor, temp_path) = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, 'wb') as checkpoint_file:
+            checkpoint_file.write(FORMAT)
+            pickle.dump(checkpoint, checkpoint_file, protocol=pickle.HIGHEST_PROTOCOL)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+def read_checkpoint(path: str) -> Optional[Checkpoint]:
+    '''
+    Reads a checkpoint written by write_checkpoint(). The file is unpickled,
+    so it must come from a trusted source
+    Args:
+        path: str, checkpoint file
+    Returns:
+        Checkpoint, or None if the file does not exist
+    Raises:
+        ValueError: If the file is not a checkpoint
+    '''
+    if not os.path.isfile(path):
+        return None
+    with open(path, 'rb') as checkpoint_file:
+        if checkpoint_file.read(len(FORMAT)) != FORMAT:
+            raise ValueError("\"{}\" is not a checkpoint file.".format(path))
+        try:
+            checkpoint = pickle.load(checkpoint_file)
+        except (pickle.UnpicklingError, EOFError, AttributeError) as err:
+            raise ValueError("Checkpoint \"{}\" is damaged: {}.".format(path, err))
+    if not isinstance(checkpoint, Checkpoint):
+        raise ValueError("\"{}\" is not a checkpoint file.".format(path))
+    return checkpoint
@@ -0,0 +1,29 @@
+# Cooling schedules for GroupAssign.anneal()
+# Each function builds a callable which takes the fraction of the annealing
+# budget used, from 0 to 1, and returns the temperature to anneal at
+
+import math
+from typing import *
+
+def geometric(start: float, end: float) -> Callable[[float], float]:
+    '''
+    Cools by a constant factor per unit of budget, from start to end
+    Raises:
+        ValueError: If either temperature is not positive
+    '''
+    if start <= 0 or end <= 0:
+        raise ValueError("Geometric cooling requires positive temperatures.")
+    ratio = end/start
+    return lambda fraction: start*math.pow(ratio, fraction)
+
+def linear(start: float, end: float) -> Callable[[float], float]:
+    '''
+    Cools by a constant amount per unit of budget, from start to end
+    '''
+    return lambda fraction: start + (end - start)*fraction
+
+def constant(temperature: float) -> Callable[[float], float]:
+    '''
+    Anneals at a fixed temperature, 0 to only keep swaps which do not lower the score
+    '''
+    return lambda fraction: temperature
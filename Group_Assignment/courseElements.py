@@ -1,23 +1,103 @@
+from array import array
+from collections.abc import Mapping
+
 class Student:
-    name = ""
-    answers = {}
-    group = 0
-    mutable = True
+    __slots__ = ("name", "answers", "group", "mutable", "index", "slot",
+                "has_dropped", "new_student")
+
+    def __init__(self):
+        self.name = ""
+        self.answers = {}
+        self.group = 0
+        self.mutable = True
+
+        #row of the student in the encoded question columns
+        self.index = 0
+
+        #position of the student in its group's list of students
+        self.slot = 0
+
+        #has_dropped and new_student value used only for add students mode
+        self.has_dropped = True
+        self.new_student = False
+
+#read-only view of a student's answers, indexed by question, over one row of the
+#response CSV so that loading students does not build a dict per row
+class RowAnswers(Mapping):
+    __slots__ = ("row", "positions")
+
+    def __init__(self, row: list, positions: dict):
+        self.row = row
+        #column of each header, shared by every row of the file
+        self.positions = positions
+
+    def __getitem__(self, question):
+        return self.row[self.positions[question]]
+
+    def __iter__(self):
+        return iter(self.positions)
 
-    #has_dropped and new_student value used only for add students mode
-    has_dropped = True
-    new_student = False
+    def __len__(self):
+        return len(self.positions)
 
 class Group:
-    number = 0
-    students = []
-    size = 0
-    score = 0
+    __slots__ = ("number", "students", "size", "score", "stats", "mutable")
 
-    #used for adding students, tracks if the group has a mutable student or has room
-    mutable = False
+    def __init__(self):
+        self.number = 0
+        self.students = []
+        self.size = 0
+        self.score = 0
+
+        #running per question statistics of the members, used for delta scoring
+        self.stats = None
+
+        #used for adding students, tracks if the group's members changed since the
+        #previous assignment, see GroupAssign.repair()
+        self.mutable = False
 
 
 class full_state:
-    groups = []
-    score = 0
+    __slots__ = ("groups", "score")
+
+    def __init__(self):
+        self.groups = []
+        self.score = 0
+
+#compact copy of a class state, taken and restored by GroupAssign.snapshot() and
+#GroupAssign.restore(). Group i holds students order[bounds[i]:bounds[i+1]]
+class Snapshot:
+    __slots__ = ("assignment", "order", "bounds", "numbers", "sizes", "scores")
+
+    def __init__(self, n_students: int):
+        #position of each student's group, indexed by student index
+        self.assignment = array('l', bytes(array('l').itemsize*n_students))
+        #student indices group by group, in member order
+        self.order = array('l')
+        self.bounds = array('l', [0])
+        self.numbers = array('l')
+        self.sizes = array('l')
+        self.scores = array('d')
+
+#progress record yielded by GroupAssign.solve_steps() after each step of swap attempts
+class Progress:
+    __slots__ = ("iteration", "score", "best", "elapsed", "restarts", "converged", "best_state")
+
+    def __init__(self, iteration: int, score: float, best: float, elapsed: float,
+                 restarts: int, converged: bool, best_state: Snapshot):
+        #swap attempts made so far
+        self.iteration = iteration
+        #current and best class scores
+        self.score = score
+        self.best = best
+        #seconds spent solving, excluding time paused between steps
+        self.elapsed = elapsed
+        self.restarts = restarts
+        #whether the current run's score has stopped improving
+        self.converged = converged
+        #Snapshot of the best class state, shared between progress records
+        self.best_state = best_state
+
+    def __repr__(self):
+        return "Progress(iteration={}, score={:.4f}, best={:.4f}, elapsed={:.2f})".format(
+            self.iteration, self.score, self.best, self.elapsed)
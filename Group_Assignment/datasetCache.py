@@ -0,0 +1,229 @@
+# On-disk cache of encoded student responses for the Group Assignment Tool
+# A cache file holds the question columns of a response CSV (see
+# questionColumns) and the students' answers, so that later runs on the same
+# CSV and question config map the file in rather than parsing the CSV again.
+#
+# File layout: an 8 byte format tag, the header length as a little-endian
+# 64 bit integer, a JSON header, then 8 byte aligned native integer arrays.
+# The header holds the dataset key, the distinct answers, each column's
+# fields, and the offset, length, and type code of every array. The file is
+# memory-mapped, and arrays such as multiple choice codes are used directly
+# as memoryviews over the mapping, without copying
+
+import os
+import sys
+import glob
+import json
+import mmap
+import struct
+import hashlib
+import tempfile
+from array import array
+from typing import *
+from collections.abc import Mapping
+
+from Group_Assignment.courseElements import Student, RowAnswers
+from Group_Assignment.questionColumns import ColumnEncoding
+
+FORMAT = b"GACACHE1"
+EXTENSION = ".gac"
+ALIGNMENT = 8
+
+class EncodedAnswers(Mapping):
+    '''
+    Read-only answers of a student in a cache file, indexed by question like
+    RowAnswers. The answer to a question is values[ids[start + positions[question]]],
+    so no row is built until an answer is read, and each student takes one
+    object besides itself
+    '''
+    __slots__ = ("ids", "start", "values", "positions")
+
+    def __init__(self, ids: memoryview, start: int, values: List[str], positions: Dict[str, int]):
+        self.ids = ids
+        self.start = start
+        self.values = values
+        self.positions = positions
+
+    def __getitem__(self, question: str) -> str:
+        return self.values[self.ids[self.start + self.positions[question]]]
+
+    def __iter__(self):
+        return iter(self.positions)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __reduce__(self):
+        # The ids are a view over the mapped file, so answers pickle as RowAnswers of a tuple
+        return (RowAnswers, (tuple(self[question] for question in self.positions), self.positions))
+
+def dataset_key(assigner: Any, max_rows: int) -> str:
+    '''
+    Hashes a response CSV's content together with everything its encoding
+    depends on: the questions, their types and column classes, scheduling
+    blocks, delimiters, majority and associated question settings, and the
+    number of rows loaded. Weights only scale scores, so are left out
+    Args:
+        assigner: GroupAssign, whose student_csv is hashed
+        max_rows: int, number of rows loaded, 0 for every row
+    Returns:
+        str, hex digest identifying the encoded dataset
+    Raises:
+        OSError: If the CSV cannot be read
+    '''
+    column_classes = {column.question: type(column).__name__
+                      for column in ColumnEncoding([], assigner).columns}
+    config = {"format": FORMAT.decode(), "byteorder": sys.byteorder,
+              "questions": [[question, assigner.question_types[question],
+                             column_classes.get(question)] for question in assigner.questions],
+              "name_question": assigner.name_question, "blocks": assigner.blocks,
+              "delimiter": assigner.check_delimiter, "majority": assigner.majority_opt,
+              "restrictive": assigner.restrictive_questions, "max_rows": max_rows}
+    digest = hashlib.sha256(json.dumps(config, sort_keys=True).encode())
+    with open(assigner.student_csv, 'rb') as csv_file:
+        for block in iter(lambda: csv_file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def cache_path(cache_dir: str, student_csv: str, key: str) -> str:
+    '''
+    Gets the cache file of a dataset, named after its CSV, a hash of the
+    CSV's full path, and the dataset key. write_dataset() replaces caches
+    sharing the first two, so CSVs of the same name in different
+    directories keep their own caches
+    '''
+    name = os.path.splitext(os.path.basename(student_csv))[0]
+    location = hashlib.sha256(os.path.realpath(student_csv).encode()).hexdigest()
+    return os.path.join(cache_dir, "{}-{}-{}{}".format(name, location[:12], key[:32], EXTENSION))
+
+def write_dataset(path: str, key: str, assigner: Any) -> bool:
+    '''
+    Saves an assigner's loaded students and question columns to a cache file,
+    replacing the file atomically, and removes the caches of earlier versions
+    of the same CSV, those named after the same CSV path hash
+    Args:
+        path: str, cache file, see cache_path()
+        key: str, dataset key, see dataset_key()
+        assigner: GroupAssign, with students loaded by process_students()
+    Returns:
+        bool, False if a question column cannot be cached, True otherwise
+    Raises:
+        OSError: If the file cannot be written
+    '''
+    cached = [column.cache_fields() for column in assigner.encoding.columns]
+    if any(fields is None for fields in cached):
+        return False
+
+    arrays = []
+    offset = 0
+    def place(values: Sequence[int], typecode: str) -> List[Any]:
+        # Appends an array to write, returning its offset, length, and type
+        nonlocal offset
+        data = array(typecode, values)
+        spec = [offset, len(data), typecode, data.itemsize]
+        offset += -(-len(data)*data.itemsize//ALIGNMENT)*ALIGNMENT
+        arrays.append(data)
+        return spec
+
+    # Answers to the questions, row by row, as positions in a table of distinct answers
+    questions = assigner.questions
+    table = {}
+    rows = place([table.setdefault(student.answers[question], len(table))
+                  for student in assigner.students for question in questions], 'i')
+    header = {"key": key, "n_students": len(assigner.students), "questions": questions,
+              "values": list(table), "rows": rows, "columns": []}
+    for (column, (fields, column_arrays)) in zip(assigner.encoding.columns, cached):
+        header["columns"].append({"question": column.question, "fields": fields,
+                                  "arrays": {name: place(values, 'q')
+                                             for (name, values) in column_arrays.items()}})
+    encoded = json.dumps(header).encode()
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    (descriptor, temp_path) = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, 'wb') as cache_file:
+            cache_file.write(FORMAT + struct.pack("<Q", len(encoded)) + encoded)
+            cache_file.write(bytes(-cache_file.tell() % ALIGNMENT))
+            for data in arrays:
+                cache_file.write(data.tobytes())
+                cache_file.write(bytes(-len(data)*data.itemsize % ALIGNMENT))
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+    prefix = path[:-len(EXTENSION)].rsplit("-", 1)[0] # Up to the CSV path hash
+    for stale in glob.glob(glob.escape(prefix) + "-*" + EXTENSION):
+        if stale != path and len(stale) == len(path):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+    return True
+
+def read_dataset(path: str, key: str, assigner: Any) -> bool:
+    '''
+    Loads students and question columns into an assigner from a cache file,
+    in place of process_students()
+    Args:
+        path: str, cache file, see cache_path()
+        key: str, dataset key, see dataset_key()
+        assigner: GroupAssign to load into
+    Returns:
+        bool, True if loaded, False if the file is missing, of another dataset
+        or format, or damaged, in which case the assigner is left untouched
+    '''
+    try:
+        with open(path, 'rb') as cache_file:
+            mapping = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError): # Missing or empty
+        return False
+
+    try:
+        if mapping[:len(FORMAT)] != FORMAT:
+            return False
+        start = len(FORMAT) + 8
+        (length,) = struct.unpack("<Q", mapping[len(FORMAT):start])
+        header = json.loads(mapping[start:start + length])
+        if header["key"] != key or header["questions"] != assigner.questions:
+            return False
+        base = start + length
+        base += -base % ALIGNMENT
+        view = memoryview(mapping)
+
+        def mapped(spec: List[Any]) -> memoryview:
+            (offset, count, typecode, itemsize) = spec
+            if array(typecode).itemsize != itemsize or base + offset + count*itemsize > len(mapping):
+                raise ValueError("Cache array out of bounds.")
+            return view[base + offset:base + offset + count*itemsize].cast(typecode)
+
+        encoding = ColumnEncoding([], assigner)
+        if [column.question for column in encoding.columns] != [column["question"] for column in header["columns"]]:
+            return False
+        for (column, cached) in zip(encoding.columns, header["columns"]):
+            column.load_cache(cached["fields"], {name: mapped(spec) for (name, spec)
+                                                 in cached["arrays"].items()})
+        ids = mapped(header["rows"])
+        n_students = header["n_students"]
+        width = len(assigner.questions)
+        if len(ids) != n_students*width:
+            return False
+    except (ValueError, KeyError, TypeError, struct.error):
+        return False
+
+    values = header["values"]
+    positions = {question: i for i, question in enumerate(assigner.questions)}
+    name_position = positions[assigner.name_question]
+    students = []
+    for index in range(n_students):
+        student = Student()
+        student.name = values[ids[index*width + name_position]]
+        student.answers = EncodedAnswers(ids, index*width, values, positions)
+        student.index = index
+        students.append(student)
+
+    encoding.n_students = n_students
+    assigner.students = students
+    assigner.encoding = encoding
+    return True
@@ -9,9 +9,102 @@ import random
 import math
 import time
 import itertools
+import multiprocessing
+from contextlib import nullcontext
 from typing import *
 
 from Group_Assignment.courseElements import *
+from Group_Assignment.questionColumns import ColumnEncoding
+from Group_Assignment.scoreCache import ScoreCache
+from Group_Assignment.scoreIndex import ScoreIndex
+from Group_Assignment import coolingSchedules
+from Group_Assignment import datasetCache
+from Group_Assignment import checkpoints
+from Group_Assignment.solverMetrics import SolverMetrics, SolveCancelled
+
+# Assigner used by anytime_run() worker processes. When workers are forked it
+# is set before the pool starts, so workers share the parent's student data
+# rather than receiving a pickled copy
+_worker_assigner = None
+
+def _init_worker(assigner):
+    '''
+    Pool initializer for anytime_run() workers
+    Args:
+        assigner: GroupAssign to run restarts on, or None if inherited by fork
+    '''
+    global _worker_assigner
+    if assigner is not None:
+        _worker_assigner = assigner
+
+def _anytime_worker(task: Tuple[int, float, int, str]):
+    '''
+    Runs restarts on the worker's assigner until a deadline
+    Args:
+        task: Tuple of RNG seed, deadline (seconds since the epoch), iterations
+            to supply to iterate_normal(), and restart strategy
+    Returns:
+        Tuple of the best class score, a Snapshot of its class state, and the
+        worker's SolverMetrics (None if metrics are disabled), or None if the
+        deadline had already passed
+    '''
+    (seed, deadline, iterations, strategy) = task
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        return None
+
+    random.seed(seed)
+    assigner = _worker_assigner
+    if assigner.metrics is not None: # Count only this worker's work
+        assigner.metrics = SolverMetrics()
+    score = assigner.anytime_run(timelimit=remaining, iterations=iterations, strategy=strategy)
+    return (score, assigner.snapshot(), assigner.metrics)
+
+def _shard_worker(task: Tuple[int, List[int], List[List[int]], int, float]) -> Tuple[List[Tuple[float, List[int]]], Optional[SolverMetrics]]:
+    '''
+    Runs the swap search on one shard of the worker's class state
+    Args:
+        task: Tuple of RNG seed, positions of the shard's groups in the class
+            state, current student indices of each of those groups,
+            iterations to supply to iterate_normal() and starting epsilon
+    Returns:
+        Tuple of a list of (score, student indices) tuples, one per shard group
+        after the search, and the worker's SolverMetrics (None if metrics are disabled)
+    '''
+    (seed, positions, members, iterations, epsilon) = task
+    random.seed(seed)
+    assigner = _worker_assigner
+    groups = [assigner.class_state.groups[position] for position in positions]
+    for group, rows in zip(groups, members):
+        group.students = [assigner.students[row] for row in rows]
+    if assigner.metrics is not None:
+        assigner.metrics = SolverMetrics()
+    assigner.optimize_shard(groups, iterations, epsilon)
+    return ([(group.score, [student.index for student in group.students]) for group in groups],
+            assigner.metrics)
+
+def read_question_file(finame: str) -> Tuple[List[str], List[str], List[List[str]]]:
+    '''
+    Reads question texts, types, and response options from a question data
+    file, which holds one row each of texts, types, and options, with the
+    options of a question separated by semicolons (see data/qtypes.csv)
+    Args:
+        finame: str, question data file
+    Returns:
+        Tuple of the list of question texts, list of question types, and list
+        of lists of question response options
+    Raises:
+        ValueError: If the file does not hold three rows of equal length
+    '''
+    with open(finame, 'r', newline='') as q_data:
+        rows = [row for row in csv.reader(q_data) if row]
+    if len(rows) != 3:
+        raise ValueError("Invalid question data file \"{}\", expected 3 rows.".format(finame))
+    if len(rows[0]) != len(rows[1]) or len(rows[0]) != len(rows[2]):
+        raise ValueError("Rows of question data file \"{}\" differ in length.".format(finame))
+
+    (q_texts, q_types, q_opts) = rows
+    return (q_texts, q_types, [options.split(";") for options in q_opts])
 
 class GroupAssign:
     '''
@@ -30,7 +123,10 @@ class GroupAssign:
                 per_group: Optional[int] = 4, n_iter: Optional[int] = 15000,
                 combos: Optional[int] = 10000, timelimit: Optional[int] = 10,
                 mode: Optional[str] = "Strong", select_size: Optional[int] = 0,
-                optimal_comp: Optional[bool] = False):
+                optimal_comp: Optional[bool] = False, engine: Optional[str] = "python",
+                blocks: Optional[List[str]] = None, cache_size: Optional[int] = 100000,
+                metrics: Optional[SolverMetrics] = None,
+                gap_tolerance: Optional[float] = None, cache_dir: Optional[str] = None):
         '''
         Initialization for the GroupAssign object
 
@@ -43,11 +139,26 @@ class GroupAssign:
             n_iter: Number of swap attempts to perform by default when calling iterate_normal()
             combos: Number of student combinations to sample for strong initializations
             timelimit: Number of seconds to run anytime_run() for
-            mode: Initialization style, "Strong" or "Random"
+            mode: Initialization style, "Strong" or "Random", "Anneal" for
+                random groups to be improved by anneal(), or "Repair" for no
+                groups until repair() loads a previous assignment
             select_size: Number of students to clip class size to (Used for demo only)
             optimal_comp: Whether or not to generate data with known optimal groups for comparison (Demo only)
+            engine: Scoring engine, "python" or "numpy" (vectorized scoring over encoded columns)
+            blocks: Scheduling blocks that scheduling answers select from, e.g. 168 hourly
+                slots of a week. Defaults to the 12 blocks of the demo course timetable
+            cache_size: Maximum number of group scores to cache, 0 to disable caching
+            metrics: SolverMetrics to record counters, phase times, and progress into,
+                None to disable instrumentation
+            gap_tolerance: Optimality gap (see optimality_gap()) at which searches
+                stop early, e.g. .01 to stop within 1% of the upper bound, None to
+                always use the full budget
+            cache_dir: Directory of encoded dataset caches (see datasetCache), from
+                which student responses load without parsing the CSV when it and
+                the question config are unchanged, None to always parse the CSV
         '''
         self.student_csv = student_csv
+        self.cache_dir = cache_dir
         self.check_delimiter = ";" # delimiter for checkbox questions
         self.per_group = per_group
 
@@ -65,6 +176,22 @@ class GroupAssign:
         # How many combinations to run in assign_strong_groups()
         self.combinationlimit = combos
 
+        # Group scores shared by strong initialization, swaps, and restarts
+        self.score_cache = ScoreCache(cache_size) if cache_size > 0 else None
+        self.metrics = metrics
+
+        # Lowest, highest, and total group score of the groups being swapped,
+        # see index_scores()
+        self.score_index = None
+
+        # Called by iterate_normal() every 500 swap attempts with its iteration
+        # and convergence state, set by anytime_run() to save checkpoints
+        self.checkpointer = None
+
+        # Member counts and sizes of the groups, and the upper_bound() of their class score
+        self.bound = None
+        self.gap_tolerance = gap_tolerance
+
         self.class_state = full_state()
         self.questions = list(question_weights.keys())
         self.question_weights = question_weights
@@ -73,7 +200,21 @@ class GroupAssign:
         self.students = []
         self.optimal_groups = []
 
-        self.blocks = ["9L", "9S", "10", "11", "12", "2", "10A", "2A", "3A", "3B", "6A", "6B"]
+        # Group number of each continuing student in the assignment loaded by repair()
+        self.previous_assignment = {}
+
+        if mode not in ["Strong", "Random", "Anneal", "Repair"]:
+            raise ValueError("Unknown mode \"{}\".".format(mode))
+        if engine not in ["python", "numpy"]:
+            raise ValueError("Unknown scoring engine \"{}\".".format(engine))
+        self.engine = engine
+        self.encoding = None
+        self.scorers = []
+
+        if blocks:
+            self.blocks = list(blocks)
+        else:
+            self.blocks = ["9L", "9S", "10", "11", "12", "2", "10A", "2A", "3A", "3B", "6A", "6B"]
         for question in self.questions:
             if self.question_types[question] == "(Identification Question)":
                 self.name_question = question
@@ -87,83 +228,227 @@ class GroupAssign:
         # Only hardcoded for demo purposes
         self.majority_opt = {"What gender do you identify with?":"Male", \
                             "What is your ethnicity?":"White or Caucasian"}
-        if optimal_comp:
-            self.opt_score = self.gen_opt_groups(select_size)
-        else:
-            self.opt_score = 0
-            self.process_students()
-            if select_size > 0: # Clip class size. For demo purposes only
-                self.students  = self.students[0:select_size]
+        with self.phase("load"):
+            if optimal_comp:
+                self.opt_score = self.gen_opt_groups(select_size)
+            else:
+                self.opt_score = 0
+                # Clip class size to select_size if given. For demo purposes only
+                self.load_students(max_rows=select_size)
+
+        self.initialized = False
+        self.default_init_mode = mode
+        with self.phase("init"):
+            if mode == "Strong":
+                self.assign_strong_groups()
+            elif mode != "Repair":
+                self.assign_initial_groups()
 
-        if mode == "Strong":
-            self.assign_strong_groups()
-        else:
-            self.assign_initial_groups()
+    def phase(self, name: str):
+        '''
+        Times a block into the named phase of the attached metrics
+        Args:
+            name: str, phase name ("load", "init", "search", or "output")
+        Returns:
+            Context manager, which does nothing if metrics are disabled
+        '''
+        if self.metrics is None:
+            return nullcontext()
+        return self.metrics.phase(name)
 
 #===============================================================================
 #=========================== DATA PROCESSING / SETUP ===========================
 #===============================================================================
 
-    def process_students(self):
+    def load_students(self, max_rows: Optional[int] = 0):
         '''
-        Processes student response CSV, builds list of students,
-        sets each student's name and response dictionary
+        Loads students from the encoded dataset cache if cache_dir is set and
+        holds an up to date cache of the response CSV, and otherwise processes
+        the CSV with process_students(), caching the result
         Args:
-            None
+            max_rows: Optional int, number of rows to load, 0 for every row
         Returns:
             None
         Raises:
             ValueError: If a question in the question list is not found in student CSV
         '''
-        response_data = self.read_csv_data(self.student_csv)
-
-        # Validate that all questions in the master question list are present
-        student_qlist = set(response_data[0].keys())
-        for question in self.questions:
-            if question not in student_qlist:
-                print(student_qlist)
-                raise ValueError("Provided question \"{}\" not found in student data CSV.".format(question))
-
-        #Creates an empty student object for each student
-        self.students = [Student() for i in range(len(response_data))]
-        counter = 0
-
-        #Populates list of students
-        for student in self.students:
-            student.name = (response_data[counter])[self.name_question]
-            student.answers = response_data[counter]
-            counter += 1
+        if self.cache_dir is None:
+            self.process_students(max_rows=max_rows)
+            return
+
+        assert (os.path.isfile(self.student_csv)), "Input CSV file \"" + \
+                                            str(self.student_csv) + "\" not found."
+        key = datasetCache.dataset_key(self, max_rows)
+        path = datasetCache.cache_path(self.cache_dir, self.student_csv, key)
+        if datasetCache.read_dataset(path, key, self):
+            self.compile_encoding()
+            return
+
+        self.process_students(max_rows=max_rows)
+        try:
+            datasetCache.write_dataset(path, key, self)
+        except OSError:
+            pass # Only later loads are slower without the cache
+
+    def process_students(self, max_rows: Optional[int] = 0, chunk_size: Optional[int] = 10000):
+        '''
+        Processes student response CSV, builds list of students, sets each
+        student's name and answers, and encodes the answers into question columns
 
-    def read_csv_data(self, input_csv_file: str) -> List[Dict[str,str]]:
+        The CSV is streamed in chunks of rows, each chunk encoded straight into
+        the question columns. Students' answers are views over their CSV row,
+        so no dictionary is built per row. Loads around 60,000 rows per second
+        of the 10 question demo survey, see README.
+        Args:
+            max_rows: Optional int, number of rows to load, 0 for every row
+            chunk_size: Optional int, number of rows to read and encode at a time
+        Returns:
+            None
+        Raises:
+            ValueError: If a question in the question list is not found in student CSV
         '''
-        Reads a CSV file and returns a list of dictionaries indexed by column headers
-        read_csv_data function was originally written by Mark Franklin (Thayer IT), 9/29/17
+        self.students = []
+        self.encoding = ColumnEncoding([], self)
+        # Answers repeat heavily across rows, so rows share one copy of each distinct value
+        values = {}
+        for (positions, rows) in self.read_csv_chunks(self.student_csv, self.questions,
+                                                    chunk_size, max_rows):
+            name_position = positions[self.name_question]
+            chunk = []
+            for row in rows:
+                row = tuple([values.setdefault(value, value) for value in row])
+                student = Student()
+                student.name = row[name_position]
+                student.answers = RowAnswers(row, positions)
+                student.index = len(self.students) + len(chunk)
+                chunk.append(student)
+            self.encoding.extend(chunk)
+            self.students.extend(chunk)
+
+        self.compile_encoding()
+
+    def read_csv_chunks(self, input_csv_file: str, required: List[str], chunk_size: int,
+                        max_rows: Optional[int] = 0) -> Iterator[Tuple[Dict[str,int], List[List[str]]]]:
+        '''
+        Streams a CSV file in chunks of rows, validating its headers before any row is read
         Args:
             input_csv_file: str, filename for data CSV
+            required: List[str], column headers which must be present
+            chunk_size: int, number of rows per chunk
+            max_rows: Optional int, number of rows to read, 0 for every row
         Returns:
-            List[Dict[str,str]], a list of dictionaries (one per row) indexed by column header
+            Iterator of (positions, rows) tuples, where positions links each
+            column header to its column, and rows is a list of up to chunk_size
+            rows, each a list of fields. Blank lines are skipped
         Raises:
             AssertionError: CSV File does not exist
+            ValueError: If a required header is missing or a row is missing fields
         '''
-        headers = ""
-        csv_data = []
         assert (os.path.isfile(input_csv_file)), "Input CSV file \"" + \
                                             str(input_csv_file) + "\" not found."
 
-        with open(input_csv_file, 'rU') as csv_file:
+        with open(input_csv_file, 'r', newline='') as csv_file:
             csv_reader = csv.reader(csv_file, delimiter=',', quotechar='|')
-            for row in csv_reader:    # headers row is a special case
-                if headers == "":
-                    headers = row
-                else:
-                    row_data = {}
-                    i = 0  # used to iterate through the columns
-                    for item in row:  # stash each row element
-                        row_data[headers[i]] = item  # keyed by column header
-                        i = i + 1
+            headers = next(csv_reader, [])
+            positions = {header: i for i, header in enumerate(headers)}
+            for question in required:
+                if question not in positions:
+                    raise ValueError("Provided question \"{}\" not found in student data CSV.".format(question))
+
+            n_rows = 0
+            rows = []
+            for row in csv_reader:
+                if not row:
+                    continue
+                if len(row) < len(headers):
+                    raise ValueError("Row {} of \"{}\" has {} fields, expected {}.".format(
+                                    n_rows + 1, input_csv_file, len(row), len(headers)))
+                rows.append(row)
+                n_rows += 1
+                if n_rows == max_rows:
+                    break
+                if len(rows) == chunk_size:
+                    yield (positions, rows)
+                    rows = []
+            if rows:
+                yield (positions, rows)
+
+    def encode_students(self):
+        '''
+        Indexes students and encodes their responses into question columns
+        Args:
+            None
+        Returns:
+            None
+        '''
+        for index, student in enumerate(self.students):
+            student.index = index
+
+        self.encoding = ColumnEncoding(self.students, self)
+        self.compile_encoding()
+
+    def compile_encoding(self):
+        '''
+        Vectorizes the question columns when using the numpy engine, and
+        compiles them into the list of scorers used by score_group()
+        Args:
+            None
+        Returns:
+            None
+        '''
+        if self.engine == "numpy":
+            self.encoding.vectorize()
+
+        # Bound scorers of every scored question, in question order
+        self.scorers = [column.score for column in self.encoding.columns]
+
+        # Swaps are scored from running group statistics when every question supports it
+        self.delta_scoring = self.encoding.incremental
 
-                    csv_data.append(row_data)  # save this row in the list
-        return(csv_data)
+    def index_class_state(self):
+        '''
+        Records each student's group number and slot in its group, and builds
+        running statistics for every group in the class state for delta scoring.
+        Called whenever groups are assigned other than by swap()
+        Args:
+            None
+        Returns:
+            None
+        '''
+        self.index_groups(self.class_state.groups)
+
+    def index_groups(self, groups: List[Group]):
+        '''
+        Records group numbers and slots, and builds running statistics, for the given groups
+        Args:
+            groups: List[Group], groups to index
+        Returns:
+            None
+        '''
+        for group in groups:
+            for slot, student in enumerate(group.students):
+                student.group = group.number
+                student.slot = slot
+            if self.delta_scoring:
+                group.stats = self.encoding.group_stats([student.index for student in group.students])
+            else:
+                group.stats = None
+        # Any indexed scores may have been set without updating the index
+        self.score_index = None
+
+    def index_scores(self, groups: List[Group]) -> ScoreIndex:
+        '''
+        Gets the score index of the given groups, building it if the groups are
+        not the ones indexed. swap_students_limited() keeps it up to date, so
+        group scores set by anything else must be followed by index_groups()
+        Args:
+            groups: List[Group], groups to index
+        Returns:
+            ScoreIndex of the groups
+        '''
+        if self.score_index is None or self.score_index.groups is not groups:
+            self.score_index = ScoreIndex(groups)
+        return self.score_index
 
 #===============================================================================
 #========================== Assignment Initialization ==========================
@@ -206,7 +491,7 @@ class GroupAssign:
                 new_group = Group()
                 new_group.size = remainder
                 new_group.students = rand_students[i:]
-                new_group.number = num_groups
+                new_group.number = num_groups + 1
                 self.class_state.groups.append(new_group)
 
 
@@ -222,6 +507,9 @@ class GroupAssign:
                     if (j == len(self.class_state.groups)):
                         j = 0
 
+        for group, gscore in zip(self.class_state.groups, self.score_groups(self.class_state.groups)):
+            group.score = gscore
+        self.index_class_state()
         self.initialized = True
 
         return self.score_class_state()
@@ -247,9 +535,6 @@ class GroupAssign:
 
         self.class_state.groups = [Group() for i in range(num_groups)]
 
-        scores = {}
-
-        s = time.time()
         for group_num in range(num_groups):
             max_group = None
             max_score = float('-inf')
@@ -258,21 +543,24 @@ class GroupAssign:
 
             potentials = self.get_potentials(students, per_group)
 
+            if self.engine == "numpy": # Score every potential in one batch
+                potentials = list(potentials)
+                pscores = self.encoding.score_batch([[student.index for student in potential]
+                                                    for potential in potentials], per_group)
+                if self.metrics is not None:
+                    self.metrics.score_evaluations += len(potentials)
+                best = int(pscores.argmax())
+                max_score = float(pscores[best])
+                max_group = potentials[best]
+                potentials = []
+
+            # Few potentials recur, so they are scored directly rather than
+            # through the score cache, whose keys cost more than the hits save
+            temp_group = self.class_state.groups[group_num]
             for potential in potentials:
-                hash = []
-                for student in potential:
-                    hash.append(student.name)
-                hash = sorted(hash)
-                hashstring = str(hash)
-
-                if hashstring in scores.keys(): # We've scored this before
-                    cscore = scores[hashstring]
-                else:
-                    temp_group = self.class_state.groups[group_num]
-                    temp_group.students = list(potential)
-                    temp_group.size = len(potential)
-                    cscore = self.score_group(temp_group)
-                    scores[hashstring] = cscore
+                temp_group.students = list(potential)
+                temp_group.size = len(potential)
+                cscore = self.score_group(temp_group)
 
                 if cscore > max_score:
                     max_score = cscore
@@ -289,13 +577,12 @@ class GroupAssign:
         if remainder:
             self.strong_remainder(students)
 
-        e = time.time()
-
         sum = 0
-        for group in self.class_state.groups:
-            group.score = self.score_group(group)
+        for group, gscore in zip(self.class_state.groups, self.score_groups(self.class_state.groups)):
+            group.score = gscore
             sum += group.score
 
+        self.index_class_state()
         self.initialized = True
 
         return sum/len(self.class_state.groups)
@@ -324,7 +611,7 @@ class GroupAssign:
                 if len(group.students) < self.per_group:
                     init_score = group.score
                     group.students.append(student)
-                    fin_score = self.score_group(group)
+                    fin_score = self.cached_score(group)
                     score_delta = (fin_score - init_score)
 
                     if score_delta > max_improve:
@@ -337,23 +624,41 @@ class GroupAssign:
 
     def get_potentials(self, students: List[Student], per_group: int) -> Iterator[Tuple[Student]]:
         '''
-        Gets group score for checkbox questions
+        Gets student combinations to consider as a group, sampling uniformly
+        at random if there are more than combinationlimit of them
         Args:
             students: List[Student], list of students to generate combinations from
             per_group: int, number of students to include in each combination
         Returns:
             Iterator[Tuple[Student]], an iterator of unique student combinations
         '''
-
-        students = random.sample(students, len(students))
-        potentials = itertools.combinations(students, per_group)
+        if math.comb(len(students), per_group) <= self.combinationlimit:
+            students = random.sample(students, len(students))
+            return itertools.combinations(students, per_group)
 
         # If there are too many combos, randomly sample
-        if (math.factorial(len(students))/(math.factorial(per_group)*
-            math.factorial(len(students) - per_group)) > self.combinationlimit):
-            potentials = itertools.islice(potentials, self.combinationlimit)
+        return self.sample_combinations(students, per_group, self.combinationlimit)
 
-        return potentials
+    def sample_combinations(self, students: List[Student], per_group: int,
+                            n_samples: int) -> Iterator[Tuple[Student]]:
+        '''
+        Lazily draws distinct student combinations uniformly at random, without
+        replacement. Draws are rejected if already seen, so n_samples should be
+        well below the number of combinations
+        Args:
+            students: List[Student], list of students to generate combinations from
+            per_group: int, number of students to include in each combination
+            n_samples: int, number of combinations to draw
+        Returns:
+            Iterator[Tuple[Student]], an iterator of unique student combinations
+        '''
+        positions = range(len(students))
+        seen = set()
+        while len(seen) < n_samples:
+            combination = tuple(sorted(random.sample(positions, per_group)))
+            if combination not in seen:
+                seen.add(combination)
+                yield tuple(students[position] for position in combination)
 
 
 #===============================================================================
@@ -368,193 +673,191 @@ class GroupAssign:
         Returns:
             float, score for group
         '''
-        scores = 0
+        if self.metrics is not None:
+            self.metrics.score_evaluations += 1
+        if self.engine == "numpy" and self.encoding:
+            return self.encoding.score_members([student.index for student in group.students], group.size)
 
-        for question in self.questions:
-            # Scoring multiple choice question type
-            if self.question_types[question] == "(Multiple Choice Question)":
-                sm = self.score_m(group, question)
-                scores += sm
-
-            # Scheduling question scoring mode
-            elif self.question_types[question] == "(Scheduling Question)":
-                sm = self.score_scheduling(group, question)
-                scores += sm
-
-            # Scoring for checkbox style questions
-            elif self.question_types[question] == "(Checkbox Question)":
-                sm = self.score_c(group, question)
-                scores += sm
-
-            # Scoring for restrictive style questions
-            elif self.question_types[question] == "(Restrictive Question)":
-                sm = self.get_restrictive_penalty(group, question)
-                scores += sm
-
-            elif self.question_types[question] == "(Isolation Question)":
-                sm = self.get_isolation_penalty(group, question)
-                scores += sm
+        scores = 0
+        for scorer in self.scorers:
+            scores += scorer(group)
         return scores
 
-    def score_scheduling(self, group: Group, question: str) -> float:
+    def score_class_state(self):
         '''
-        Gets group score for scheduling questions
+        Scores a class state by averaging the scores of each group in the state
         Args:
-            group: Group, the group to score
-            question: str, the question to reference when scoring
+            None
         Returns:
-            float, score for group with regard to question
+            float, average group score in the class state
         '''
-        max_scheduling = len(self.blocks)
-
-        #Lists all scheduling blocks
-        scheduling_blocks = set(self.blocks.copy())
-
-        for student in group.students:
-            #Goes though every student's classes and removes them from the list
-            #since those blocks are unavailable now
-            for block in student.answers[question]:
-                if block in scheduling_blocks:
-                    scheduling_blocks.remove(block)
-
-        #scheduling is now the remaining number of blocks that all members have free
-        scheduling = len(scheduling_blocks)
-
-        if scheduling>max_scheduling:
-            scheduling = max_scheduling
+        sum_scores = 0
+        num_groups = len(self.class_state.groups)
+        if self.engine == "numpy":
+            for gscore in self.score_groups(self.class_state.groups):
+                sum_scores += gscore
+            return (sum_scores/num_groups)
 
-        return abs(self.question_weights[question])*(scheduling/max_scheduling)
+        for group in self.class_state.groups:
+            gscore = self.cached_score(group)
+            sum_scores += gscore
+        return (sum_scores/num_groups)
 
-    def score_m(self, group: Group, question: str) -> float:
+    def upper_bound(self) -> Optional[float]:
         '''
-        Gets group score for multiple choice questions
+        Bounds the class score from above, summing the bound of each question
+        on its own (see Column.upper_bound()) for groups of the current class
+        state's member counts and sizes, which swaps never change
         Args:
-            group: Group, the group to score
-            question: str, the question to reference when scoring
+            None
         Returns:
-            float, score for group with regard to question
+            float, no assignment of the grouped students scores higher, or None
+            if a question type gives no bound
         '''
-        sum_values = 0
-        selected_choices = {}
-
-        # Sets all selected answers in the group to 1
-        for student in group.students:
-            selected_choices[student.answers[question]] = 1
-
-        #
-        for value in selected_choices.values():
-            if value == 1:
-                sum_values += 1
-
-        return (sum_values/group.size) * self.question_weights[question]
-
-    def score_c(self, group: Group, question: str) -> float:
+        groups = self.class_state.groups
+        shapes = [(len(group.students), group.size) for group in groups]
+        if self.bound is not None and self.bound[0] == shapes:
+            return self.bound[1]
+
+        rows = [student.index for group in groups for student in group.students]
+        total = 0
+        for column in self.encoding.columns:
+            column_bound = column.upper_bound(rows, shapes)
+            if column_bound is None:
+                total = None
+                break
+            total += column_bound
+        bound = total/len(groups) if total is not None else None
+        self.bound = (shapes, bound)
+        return bound
+
+    def optimality_gap(self, score: float) -> Optional[float]:
         '''
-        Gets group score for checkbox questions
+        Gets how far a class score could still be from optimal
         Args:
-            group: Group, the group to score
-            question: str, the question to reference when scoring
+            score: float, class score
         Returns:
-            float, score for group with regard to question
+            float, upper_bound() less the score, relative to the bound's magnitude
+            (absolute if the bound is 0), None if there is no bound
         '''
+        bound = self.upper_bound()
+        if bound is None:
+            return None
+        return max(0, bound - score)/(abs(bound) or 1)
 
-        responses_set = {}
-        n_total_responses = 0
-
-        for student in group.students:
-            for selection in student.answers[question]:
-                if selection not in responses_set.keys():
-                    responses_set[selection] = 1
-                else:
-                    responses_set[selection] += 1
-                n_total_responses += 1
-        squared_sum = 0
-        for response_count in responses_set.values():
-            if response_count > 1: # We're only interested if more than one person selected it
-                squared_sum += response_count*response_count
-
-        n_options = len(responses_set.keys())
-        res = max(0, 1 - (1/(n_options*n_total_responses))*squared_sum)
-
-        return res*self.question_weights[question]
-
-    def get_restrictive_penalty(self, group: Group, question: str) -> float:
+    def within_gap(self, score: float) -> bool:
         '''
-        Implements penalties for restrictive questions
+        Checks whether a class score is close enough to the upper bound to stop searching
         Args:
-            group: Group, the group to score
-            question: str, the question to reference when scoring
+            score: float, class score
         Returns:
-            float, restrictive penalty value
+            bool, True if gap_tolerance is set and the score's optimality gap is within it
         '''
-        student_choices = set()
-        penalty = 0
-        for student in group.students:
-            for choice in student.answers[question].split(self.check_delimiter):
-                student_choices.add(choice)
-
-        associated_question = self.restrictive_questions[question]
-        for student in group.students:
-            for item in student.answers[associated_question].split(self.check_delimiter):
-                if item in student_choices:
-                    penalty -= self.question_weights[question]
+        if self.gap_tolerance is None:
+            return False
+        gap = self.optimality_gap(score)
+        # Allows for rounding, so that a tolerance of 0 stops at a proven optimum
+        return gap is not None and gap <= self.gap_tolerance + 1e-9
 
-        return penalty
-
-    def get_isolation_penalty(self, group: Group, question: str) -> float:
+    def cached_score(self, group: Group) -> float:
         '''
-        Implements penalties for students isolated by non-majority status
+        Gets group score, looking it up in the score cache first
         Args:
             group: Group, the group to score
-            question: str, the question to reference when scoring
         Returns:
-            float, isolation penalty value
+            float, score for group
         '''
-
-        iso_counter = 0
-
-        for student in group.students:
-            if student.answers[question] != self.majority_opt[question]:
-                iso_counter += 1
-        if iso_counter == 1:
-            return -self.question_weights[question]
-        elif len(group.students) > 4 and iso_counter == 2:
-            return -self.question_weights[question]/3
-        else:
-            return 0
-
-    def score_class_state(self):
+        if self.score_cache is None:
+            return self.score_group(group)
+
+        key = ScoreCache.key([student.index for student in group.students], group.size)
+        score = self.score_cache.get(key)
+        if score is None:
+            if self.metrics is not None:
+                self.metrics.cache_misses += 1
+            score = self.score_group(group)
+            self.score_cache.put(key, score)
+        elif self.metrics is not None:
+            self.metrics.cache_hits += 1
+        return score
+
+    def score_groups(self, groups: List[Group]) -> List[float]:
         '''
-        Scores a class state by averaging the scores of each group in the state
+        Scores a list of groups, batching groups of equal member count when
+        using the numpy engine
         Args:
-            None
+            groups: List[Group], the groups to score
         Returns:
-            float, average group score in the class state
+            List[float], score for each group
         '''
-        sum_scores = 0
-        num_groups = len(self.class_state.groups)
-        for group in self.class_state.groups:
-            gscore = self.score_group(group)
-            sum_scores += gscore
-        return (sum_scores/num_groups)
+        if self.engine != "numpy":
+            return [self.cached_score(group) for group in groups]
+
+        by_count = {}
+        for i, group in enumerate(groups):
+            by_count.setdefault(len(group.students), []).append(i)
+
+        scores = [0.0]*len(groups)
+        for indices in by_count.values():
+            batch = self.encoding.score_batch([[student.index for student in groups[i].students]
+                                            for i in indices], [groups[i].size for i in indices])
+            if self.metrics is not None:
+                self.metrics.score_evaluations += len(indices)
+            for i, gscore in zip(indices, batch):
+                scores[i] = float(gscore)
+        return scores
 
 #===============================================================================
 #=============================== Group Assignment ==============================
 #===============================================================================
 
-    def anytime_run(self, timelimit: Optional[int] = 0, iterations: Optional[int] = 0) -> float:
+    def anytime_run(self, timelimit: Optional[int] = 0, iterations: Optional[int] = 0,
+                    processes: Optional[int] = 1, seed: Optional[int] = None,
+                    strategy: Optional[str] = "fixed", checkpoint: Optional[str] = None,
+                    checkpoint_every: Optional[float] = 30, resume: Optional[bool] = False) -> float:
         '''
-        Repeatedly calls iterate_normal up to a time limit
+        Repeatedly calls iterate_normal up to a time limit. A metrics progress
+        callback may raise SolveCancelled to stop early, keeping the best state so far
+
+        With a checkpoint file, the search's progress (see checkpoints.Checkpoint)
+        is saved to it at most every checkpoint_every seconds, at iterate_normal()'s
+        500 swap attempt checks, and once more at the end. Resuming from the file
+        restores that progress and continues the interrupted restart from the same
+        swap attempt, random state, and time spent, so that the search goes on as
+        if it had never stopped. Checkpoints need the fixed strategy in one process
         Args:
             timelimit: Optional int, number of seconds to run for before returning
             iterations: Optional int, number of iterations to supply to iterate_normal()
+            processes: Optional int, number of worker processes to spread restarts
+                across, 0 for one per CPU
+            seed: Optional int, base seed for the worker RNGs (worker i uses seed + i)
+            strategy: Optional str, "fixed" to give every restart the full iterations,
+                or "halving" to race restarts with successive halving (see halving_run())
+            checkpoint: Optional str, file to save checkpoints to, None for none
+            checkpoint_every: Optional float, least seconds between checkpoints
+            resume: Optional bool, if true, continues from the checkpoint file
+                if it exists, rather than starting afresh
         Returns:
             Best class score found
+        Raises:
+            ValueError: If strategy is unknown, checkpoints are asked of the halving
+                strategy or several processes, or the checkpoint to resume from
+                is damaged or of other students or settings
         '''
+        if strategy not in ["fixed", "halving"]:
+            raise ValueError("Unknown restart strategy \"{}\".".format(strategy))
+        if checkpoint is not None and (strategy != "fixed" or processes != 1):
+            raise ValueError("Checkpoints require the fixed restart strategy in one process.")
         if iterations == 0:
             iterations = self.n_iter
         if timelimit == 0:
             timelimit = self.timelimit
+        if processes == 0:
+            processes = os.cpu_count() or 1
+        if processes > 1:
+            return self.parallel_anytime_run(timelimit, iterations, processes, seed, strategy)
+        if strategy == "halving":
+            return self.halving_run(timelimit, iterations)
 
         stime = time.time()
         mscore = float('-inf')
@@ -562,76 +865,975 @@ class GroupAssign:
         sumtime = 0
         avgtime = 0
         nruns = 0
+        cancelled = False
+
+        resumed = None
+        if checkpoint is not None:
+            fingerprint = checkpoints.fingerprint(self)
+            if resume:
+                resumed = checkpoints.read_checkpoint(checkpoint)
+            if resumed is not None:
+                if resumed.fingerprint != fingerprint:
+                    raise ValueError("Checkpoint \"{}\" is of other students or settings.".format(checkpoint))
+                # Saved scores are rescored rather than trusted, so that groups
+                # scored under other answers are never carried on
+                for state in [resumed.best_state, resumed.state]:
+                    if state is None:
+                        continue
+                    self.restore(state)
+                    for group in self.class_state.groups:
+                        if not math.isclose(group.score, self.score_group(group), rel_tol=1e-9, abs_tol=1e-9):
+                            raise ValueError("Checkpoint \"{}\" does not match the loaded responses.".format(checkpoint))
+                    if state is resumed.state and not math.isclose(
+                            resumed.total, sum(group.score for group in self.class_state.groups),
+                            rel_tol=1e-9, abs_tol=1e-9):
+                        raise ValueError("Checkpoint \"{}\" does not match the loaded responses.".format(checkpoint))
+                if resumed.best_state is not None:
+                    self.restore(resumed.best_state)
+                    mscore = self.score_class_state()
+                stime -= resumed.elapsed
+                (mstate, nruns, avgtime) = (resumed.best_state, resumed.restarts, resumed.average)
+                if self.metrics is not None and resumed.counters is not None:
+                    for (counter, value) in resumed.counters.items():
+                        setattr(self.metrics, counter, value)
+                if resumed.state is None: # Saved between restarts
+                    random.setstate(resumed.rng)
+                    resumed = None
+
+            def save(iteration: Optional[int], prev_score: float, conv_1: bool):
+                saved = checkpoints.Checkpoint()
+                saved.fingerprint = fingerprint
+                saved.elapsed = time.time() - stime
+                (saved.restarts, saved.average) = (nruns, avgtime)
+                (saved.best_score, saved.best_state) = (mscore, mstate)
+                if iteration is not None:
+                    saved.state = self.snapshot()
+                    saved.total = self.score_index.total
+                    (saved.iteration, saved.prev_score, saved.conv_1) = (iteration, prev_score, conv_1)
+                saved.epsilon = self.epsilon
+                saved.rng = random.getstate()
+                if self.metrics is not None:
+                    saved.counters = self.metrics.counters()
+                checkpoints.write_checkpoint(checkpoint, saved)
+
+            last_saved = time.time()
+            def checkpointer(iteration: int, prev_score: float, conv_1: bool):
+                nonlocal last_saved
+                if time.time() - last_saved >= checkpoint_every:
+                    save(iteration, prev_score, conv_1)
+                    last_saved = time.time()
+            self.checkpointer = checkpointer
+
         ctime = time.time()
-        while ((ctime - stime) < timelimit - avgtime):
-            self.epsilon = self.initial_ep # reset epsilon
-            self.assign_initial_groups()
-            cscore = self.iterate_normal(iterations=iterations, visible = False)
+        try:
+            while not cancelled and (resumed is not None or
+                    ((ctime - stime) < timelimit - avgtime and not self.within_gap(mscore))):
+                if resumed is None:
+                    self.epsilon = self.initial_ep # reset epsilon
+                    with self.phase("init"):
+                        self.assign_initial_groups()
+                else: # Continues the interrupted restart
+                    self.restore(resumed.state)
+                    self.initialized = True
+                    self.epsilon = resumed.epsilon
+                    random.setstate(resumed.rng)
+                try:
+                    cscore = self.iterate_normal(iterations=iterations, visible = False,
+                                                 resume=resumed)
+                except SolveCancelled: # The interrupted restart's groups may still be the best
+                    cancelled = True
+                    cscore = self.score_class_state()
+                resumed = None
+
+                if cscore > mscore:
+                    mstate = self.snapshot()
+                    mscore = cscore
+
+                ctime = time.time()
+                nruns += 1
+                if self.metrics is not None:
+                    self.metrics.restarts += 1
+                    try:
+                        if not cancelled:
+                            self.metrics.report("restart", restart=nruns, score=cscore, best=mscore,
+                                                gap=self.optimality_gap(mscore))
+                    except SolveCancelled:
+                        cancelled = True
+                sumtime = ctime - stime
+                avgtime = sumtime / nruns
+        finally:
+            self.checkpointer = None
+        if checkpoint is not None:
+            save(None, 0, False)
+
+        if mstate is not None:
+            self.restore(mstate)
+        return mscore
+
+    def parallel_anytime_run(self, timelimit: float, iterations: int, processes: int,
+                            seed: Optional[int] = None, strategy: Optional[str] = "fixed") -> float:
+        '''
+        Runs independent restarts in a pool of worker processes up to a time limit,
+        then keeps the best class state found by any worker
+        Args:
+            timelimit: float, number of seconds to run for before returning
+            iterations: int, number of iterations to supply to iterate_normal()
+            processes: int, number of worker processes
+            seed: Optional int, base seed for the worker RNGs (worker i uses seed + i)
+            strategy: Optional str, restart strategy of each worker, see anytime_run()
+        Returns:
+            Best class score found
+        '''
+        if seed is None:
+            seed = random.randrange(2**32)
+        deadline = time.time() + timelimit
+
+        results = self.map_workers(_anytime_worker,
+                                [(seed + worker, deadline, iterations, strategy)
+                                    for worker in range(processes)],
+                                processes)
+
+        mscore = float('-inf')
+        mstate = None
+        for result in results:
+            if result is None:
+                continue
+            if self.metrics is not None:
+                self.metrics.merge(result[2])
+            if result[0] > mscore:
+                (mscore, mstate) = result[:2]
+
+        if mstate is not None:
+            self.restore(mstate)
+        return mscore
 
-            if cscore > mscore:
-                mstate = copy.deepcopy(self.class_state)
-                mscore = cscore
+    def halving_run(self, timelimit: float, iterations: int, population: Optional[int] = 8,
+                    step: Optional[int] = 500) -> float:
+        '''
+        Random restarts raced with successive halving up to a time limit. Each
+        bracket starts a population of random restarts with iterations/population
+        swap attempts each, then repeatedly keeps the better half of the runs
+        by current score and doubles their swap attempts, until one run is
+        left. Runs that converge stop receiving swap attempts but stay in the
+        race. Poor restarts are thus dropped early, and the remaining time goes
+        to the most promising ones.
+
+        A bracket costs about log2(population) + 1 full runs, so the population
+        shrinks, down to a single run as in anytime_run(), when the remaining
+        time fits fewer runs, and fewer runs survive a rung when the remaining
+        time cannot finish the bracket with half of them
+        Args:
+            timelimit: float, number of seconds to run for before returning
+            iterations: int, swap attempts the final run of a bracket receives
+            population: Optional int, largest number of restarts per bracket
+            step: Optional int, swap attempts between convergence and time checks
+        Returns:
+            Best class score found
+        '''
+        deadline = time.time() + timelimit
+        mscore = float('-inf')
+        mstate = None
+        attempt_time = None # Seconds per swap attempt, measured as runs advance
+
+        def finished() -> bool:
+            return time.time() >= deadline or self.within_gap(mscore)
 
-            ctime = time.time()
-            nruns += 1
-            sumtime = ctime - stime
-            avgtime = sumtime / nruns
+        def start_run() -> list:
+            # A run holds its search, its current state and epsilon, and its latest progress
+            self.epsilon = self.initial_ep # reset epsilon
+            with self.phase("init"):
+                self.assign_initial_groups()
+            if self.metrics is not None:
+                self.metrics.restarts += 1
+            return [self.solve_steps(step=step), self.snapshot(), self.epsilon, None]
+
+        def advance(run: list, budget: int) -> int:
+            # Gives a run up to budget swap attempts, returns the number made
+            (steps, state, epsilon, progress) = run
+            start = progress.iteration if progress is not None else 0
+            for progress in steps:
+                if progress.converged or progress.iteration - start >= budget \
+                        or time.time() >= deadline or self.within_gap(progress.best):
+                    break
+            run[1:] = [self.snapshot(), self.epsilon, progress]
+            return progress.iteration - start
+
+        try:
+            while not finished():
+                runs = [start_run()]
+                current = runs[0]
+                if attempt_time is None: # Measures the swap attempt time on the first run
+                    probe_start = time.time()
+                    attempts = advance(runs[0], step)
+                    attempt_time = (time.time() - probe_start)/attempts
+                    if runs[0][3].best > mscore:
+                        mscore = runs[0][3].best
+                        mstate = runs[0][3].best_state
+
+                size = population
+                full_runs = (deadline - time.time())/(attempt_time*iterations)
+                while size > 1 and math.log2(size) + 1 > full_runs:
+                    size //= 2
+                runs += [start_run() for i in range(size - 1)]
+                current = runs[-1] # Its groups are the ones last initialized
+
+                budget = max(step, iterations//size)
+                while not finished():
+                    rung_start = time.time()
+                    rung_attempts = 0
+                    for run in runs:
+                        if run[3] is not None and run[3].converged:
+                            continue
+                        if current is not run:
+                            self.restore(run[1])
+                            self.epsilon = run[2]
+                            current = run
+
+                        rung_attempts += advance(run, budget)
+                        if run[3].best > mscore:
+                            mscore = run[3].best
+                            mstate = run[3].best_state
+                        if finished():
+                            break
+                    if rung_attempts > 0:
+                        attempt_time = (time.time() - rung_start)/rung_attempts
+
+                    if finished() or len(runs) == 1 \
+                            or all(run[3].converged for run in runs):
+                        break
 
-        self.class_state = mstate
+                    # Every later rung costs survivors*budget attempts, so keeps only as
+                    # many runs as lets the bracket finish within the remaining time
+                    budget *= 2
+                    survivors = len(runs)//2
+                    capacity = (deadline - time.time())/attempt_time
+                    while survivors > 1 and \
+                            survivors*budget*(math.log2(survivors) + 1) > capacity:
+                        survivors //= 2
+                    runs.sort(key=lambda run: run[3].score, reverse=True)
+                    runs = runs[:survivors]
+        except SolveCancelled: # Stopped by a progress callback, keeps the best state so far
+            pass
+
+        if mstate is not None:
+            self.restore(mstate)
         return mscore
 
-    def iterate_normal(self, iterations: Optional[int] = 0, visible: Optional[bool] = False) -> float:
+    def map_workers(self, worker: Callable, tasks: List[Any], processes: int) -> List[Any]:
+        '''
+        Maps a worker function over tasks in a pool of processes which share this assigner
+        Args:
+            worker: Module-level function of one task, which reads the assigner
+                from _worker_assigner
+            tasks: List of tasks
+            processes: int, number of worker processes
+        Returns:
+            List of worker results, in task order
+        '''
+        global _worker_assigner
+
+        # Forked workers inherit the assigner, others receive one pickled copy each
+        if "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+            _worker_assigner = self
+            init_assigner = None
+        else:
+            context = multiprocessing.get_context()
+            init_assigner = self
+
+        try:
+            with context.Pool(processes, initializer=_init_worker, initargs=(init_assigner,)) as pool:
+                return pool.map(worker, tasks)
+        finally:
+            _worker_assigner = None
+
+    def sharded_run(self, shard_size: Optional[int] = 2000, iterations: Optional[int] = 0,
+                    refine_iterations: Optional[int] = 0, processes: Optional[int] = 1,
+                    seed: Optional[int] = None) -> float:
+        '''
+        Optimizes very large classes by splitting the current groups into
+        shards and running the swap search on each shard independently, then
+        refining across shard boundaries with shards offset by half a shard
+        Args:
+            shard_size: Optional int, approximate number of students per shard
+            iterations: Optional int, number of iterations to supply to iterate_normal() per shard
+            refine_iterations: Optional int, number of iterations per shard in the
+                refinement phase, half of iterations by default
+            processes: Optional int, number of worker processes to spread shards
+                across, 0 for one per CPU
+            seed: Optional int, base seed for the worker RNGs (shard i uses seed + i)
+        Returns:
+            Final class score
+        '''
+        if iterations == 0:
+            iterations = self.n_iter
+        if refine_iterations == 0:
+            refine_iterations = max(1, iterations//2)
+        if processes == 0:
+            processes = os.cpu_count() or 1
+        if seed is None:
+            seed = random.randrange(2**32)
+
+        n_groups = len(self.class_state.groups)
+        per_shard = max(3, shard_size//self.per_group)
+        if n_groups < 2*per_shard: # Too small to shard
+            return self.iterate_normal(iterations=iterations)
+
+        order = random.sample(range(n_groups), n_groups)
+        self.run_shards(self.split_shards(order, per_shard), iterations, processes, seed,
+                        self.initial_ep)
+
+        # Refinement, each shard straddling the boundary between two previous shards.
+        # Groups are already optimized here, so random swaps would only undo work
+        offset = per_shard//2
+        order = order[offset:] + order[:offset]
+        self.run_shards(self.split_shards(order, per_shard), refine_iterations, processes,
+                        seed + n_groups, 0)
+
+        self.index_class_state()
+        return self.score_class_state()
+
+    def split_shards(self, order: List[int], per_shard: int) -> List[List[int]]:
+        '''
+        Splits group positions into shards, merging a short final shard into the one before
+        Args:
+            order: List[int], positions of groups in the class state
+            per_shard: int, number of groups per shard
+        Returns:
+            List of shards, each a list of group positions
+        '''
+        shards = [order[i:i + per_shard] for i in range(0, len(order), per_shard)]
+        if len(shards) > 1 and len(shards[-1]) < per_shard//2 + 1:
+            shards[-2].extend(shards.pop())
+        return shards
+
+    def run_shards(self, shards: List[List[int]], iterations: int, processes: int, seed: int,
+                   epsilon: float):
+        '''
+        Runs the swap search on each shard, in worker processes if processes > 1
+        Args:
+            shards: List of shards, each a list of group positions in the class state
+            iterations: int, number of iterations to supply to iterate_normal() per shard
+            processes: int, number of worker processes
+            seed: int, base seed for the shard RNGs in worker processes
+            epsilon: float, starting epsilon of each shard's search
+        Returns:
+            None
+        '''
+        groups = self.class_state.groups
+        if processes <= 1:
+            for shard in shards:
+                self.optimize_shard([groups[position] for position in shard], iterations,
+                                    epsilon)
+            return
+
+        tasks = [(seed + i, shard, [[student.index for student in groups[position].students]
+                                    for position in shard], iterations, epsilon)
+                    for i, shard in enumerate(shards)]
+        for shard, (result, metrics) in zip(shards, self.map_workers(_shard_worker, tasks, processes)):
+            if self.metrics is not None:
+                self.metrics.merge(metrics)
+            for position, (score, rows) in zip(shard, result):
+                groups[position].students = [self.students[row] for row in rows]
+                groups[position].score = score
+        self.index_class_state()
+
+    def optimize_shard(self, groups: List[Group], iterations: int, epsilon: float) -> float:
+        '''
+        Runs the swap search between the given groups only
+        Args:
+            groups: List[Group], groups of the shard (at least 3)
+            iterations: int, number of iterations to supply to iterate_normal()
+            epsilon: float, starting epsilon of the search
+        Returns:
+            float, average score of the shard's groups
+        '''
+        self.epsilon = epsilon
+        for group, gscore in zip(groups, self.score_groups(groups)):
+            group.score = gscore
+        self.index_groups(groups)
+        return self.iterate_normal(iterations=iterations, groups=groups)
+
+    def snapshot(self) -> Snapshot:
+        '''
+        Takes a compact copy of the class state, holding student indices and
+        group scores rather than copies of the group and student objects
+        Args:
+            None
+        Returns:
+            Snapshot of the class state
+        '''
+        snapshot = Snapshot(len(self.students))
+        assignment = snapshot.assignment
+        for position, group in enumerate(self.class_state.groups):
+            for student in group.students:
+                assignment[student.index] = position
+                snapshot.order.append(student.index)
+            snapshot.bounds.append(len(snapshot.order))
+            snapshot.numbers.append(group.number)
+            snapshot.sizes.append(group.size)
+            snapshot.scores.append(group.score)
+        return snapshot
+
+    def restore(self, snapshot: Snapshot):
+        '''
+        Restores the class state from a snapshot
+        Args:
+            snapshot: Snapshot, taken by snapshot()
+        Returns:
+            None
+        '''
+        students = self.students
+        order = snapshot.order
+        bounds = snapshot.bounds
+        self.class_state = full_state()
+        for position in range(len(snapshot.numbers)):
+            group = Group()
+            group.number = snapshot.numbers[position]
+            group.size = snapshot.sizes[position]
+            group.score = snapshot.scores[position]
+            group.students = [students[row] for row in order[bounds[position]:bounds[position + 1]]]
+            self.class_state.groups.append(group)
+        self.index_class_state()
+
+    def snapshot_groups(self, snapshot: Snapshot) -> Iterator[Tuple[int, float, List[Student]]]:
+        '''
+        Lists the groups held in a snapshot without restoring it
+        Args:
+            snapshot: Snapshot, taken by snapshot()
+        Returns:
+            Iterator of (group number, group score, group members) tuples
+        '''
+        for position in range(len(snapshot.numbers)):
+            rows = snapshot.order[snapshot.bounds[position]:snapshot.bounds[position + 1]]
+            yield (snapshot.numbers[position], snapshot.scores[position],
+                    [self.students[row] for row in rows])
+
+    def iterate_normal(self, iterations: Optional[int] = 0, visible: Optional[bool] = False,
+                        groups: Optional[List[Group]] = None,
+                        resume: Optional[checkpoints.Checkpoint] = None) -> float:
         '''
         Handles swapping and convergence detection
         Args:
             iterations: Optional int, number of swap attempts to make
             visible: Optional boolean, reports progress if true
+            groups: Optional list of groups to swap between (at least 3), all groups if not given
+            resume: Optional Checkpoint whose search to continue, from its
+                iteration and convergence state, once its groups are restored
         Returns:
-            Final class score
+            Final class score, or average score of the given groups
         '''
         if not self.initialized:
-            if self.default_init_mode == "Strong":
-                self.assign_strong_groups()
-            else:
-                self.assign_initial_groups()
+            with self.phase("init"):
+                if self.default_init_mode == "Strong":
+                    self.assign_strong_groups()
+                else:
+                    self.assign_initial_groups()
         if(iterations == 0):
             iterations = self.n_iter
-
-        failure = 0
-        prev_score = 0
-        conv_1 = False
-        ms=float('-inf')
-        for i in range(iterations):
-            scoresum = 0
-            for group in self.class_state.groups:
-                scoresum += group.score
-            if scoresum/len(self.class_state.groups) > ms:
-                ms = scoresum/len(self.class_state.groups)
-            if i%500 == 0:
-                if visible:
-                    print("At iteration " + str(i))
-                    print(str(scoresum/len(self.class_state.groups)))
-
-                if prev_score != 0 and \
-                        (scoresum - prev_score)/abs(prev_score) < self.conv_thresh:
-                    if conv_1: # Ensures that convergence is stable for at least two 500 rounds
+        if groups is None:
+            groups = self.class_state.groups
+
+        with self.phase("search"):
+            self.score_index = None # scores may have been set since the last search
+            failure = 0
+            prev_score = 0
+            conv_1 = False
+            ms=float('-inf')
+            start = 0
+            if resume is not None:
+                (start, prev_score, conv_1) = (resume.iteration, resume.prev_score, resume.conv_1)
+                # Continues the running total, which rounds differently from a fresh sum
+                self.index_scores(groups).total = resume.total
+            for i in range(start, iterations):
+                scoresum = self.index_scores(groups).total
+                if scoresum/len(groups) > ms:
+                    ms = scoresum/len(groups)
+                if i%500 == 0:
+                    if self.checkpointer is not None and groups is self.class_state.groups:
+                        self.checkpointer(i, prev_score, conv_1)
+                    if visible:
+                        print("At iteration " + str(i))
+                        print(str(scoresum/len(groups)))
+                    if self.metrics is not None:
+                        self.metrics.report("search", iteration=i, score=scoresum/len(groups))
+                    if groups is self.class_state.groups and self.within_gap(scoresum/len(groups)):
                         if visible:
-                            print("Score converged.")
+                            print("Score within gap tolerance.")
                         break
+
+                    if prev_score != 0 and \
+                            (scoresum - prev_score)/abs(prev_score) < self.conv_thresh:
+                        if conv_1: # Ensures that convergence is stable for at least two 500 rounds
+                            if visible:
+                                print("Score converged.")
+                            break
+                        else:
+                            conv_1 = True
+                    elif conv_1: # if it escaped convergence, reset flag
+                        conv_1 = False
+
+                    if not conv_1:
+                        prev_score = scoresum
+
+                self.swap_students_limited(groups)
+
+            # Scores and prints the final class state
+            if groups is not self.class_state.groups:
+                return sum(self.score_groups(groups))/len(groups)
+            end_score = self.score_class_state()
+            return end_score
+
+    def solve_steps(self, step: Optional[int] = 500, restarts: Optional[bool] = False,
+                    iterations: Optional[int] = 0) -> Iterator[Progress]:
+        '''
+        Resumable swap search, yielding a Progress record after every step of
+        swap attempts. The search only advances while the caller pulls records,
+        so it can be paused, stopped on any condition (see stopConditions and
+        run_until()), and resumed later from the same state. It never ends on its
+        own. The class state is left at the current search state, restore
+        progress.best_state to keep the best groups found
+        Args:
+            step: Optional int, number of swap attempts per progress record
+            restarts: Optional bool, if true, starts a new random initialization
+                whenever a run converges or reaches iterations swap attempts, as
+                anytime_run() does, otherwise keeps improving the current groups
+            iterations: Optional int, maximum swap attempts per run when restarting
+        Returns:
+            Iterator of Progress records
+        '''
+        if not self.initialized:
+            with self.phase("init"):
+                if self.default_init_mode == "Strong":
+                    self.assign_strong_groups()
+                else:
+                    self.assign_initial_groups()
+        if iterations == 0:
+            iterations = self.n_iter
+
+        elapsed = 0
+        total = 0
+        nruns = 0
+        run_iterations = 0
+        best = self.score_class_state()
+        best_state = self.snapshot()
+        prev_score = None
+        conv_1 = False
+        converged = False
+        while True:
+            start = time.perf_counter()
+            if restarts and (converged or run_iterations >= iterations):
+                self.epsilon = self.initial_ep # reset epsilon
+                with self.phase("init"):
+                    self.assign_initial_groups()
+                nruns += 1
+                if self.metrics is not None:
+                    self.metrics.restarts += 1
+                run_iterations = 0
+                prev_score = None
+                conv_1 = False
+                converged = False
+
+            groups = self.class_state.groups
+            with self.phase("search"):
+                for i in range(step):
+                    self.swap_students_limited(groups)
+            total += step
+            run_iterations += step
+
+            score = self.index_scores(groups).total/len(groups)
+            if score > best:
+                best = score
+                best_state = self.snapshot()
+
+            # Converged once the score is stable for two consecutive steps, as in iterate_normal()
+            if prev_score is not None and \
+                    (score - prev_score)/abs(prev_score or 1) < self.conv_thresh:
+                converged = conv_1
+                conv_1 = True
+            else:
+                conv_1 = False
+                converged = False
+            if not conv_1:
+                prev_score = score
+
+            elapsed += time.perf_counter() - start
+            if self.metrics is not None:
+                self.metrics.report("search", iteration=total, score=score)
+            yield Progress(total, score, best, elapsed, nruns, converged, best_state)
+
+    def run_until(self, steps: Iterator[Progress],
+                  *conditions: Callable[[Progress], bool]) -> Progress:
+        '''
+        Pulls progress records from a solve_steps() search until any stop condition holds
+        Args:
+            steps: Iterator of Progress records from solve_steps(), which can be
+                passed to run_until() again to resume the search
+            conditions: Callables taking a Progress record and returning True to stop,
+                see stopConditions
+        Returns:
+            The last Progress record
+        Raises:
+            ValueError: If no stop condition is given
+        '''
+        if not conditions:
+            raise ValueError('run_until() requires at least one stop condition.')
+        for progress in steps:
+            # Every condition sees every record, as some track state across records
+            if any([condition(progress) for condition in conditions]):
+                return progress
+
+    def anneal(self, timelimit: Optional[float] = 0, moves: Optional[int] = 0,
+               schedule: Optional[Callable[[float], float]] = None,
+               block: Optional[int] = 1000) -> float:
+        '''
+        Simulated annealing search. Each move swaps two random students between
+        two random groups, kept if it does not lower the class score, and
+        otherwise kept with probability exp(change/temperature) (Metropolis
+        acceptance). Moves score only the two changed groups, from their running
+        statistics where every question supports it, so each is far cheaper than
+        a swap_students_limited() search over every pairing of two groups. The
+        best groups found are restored at the end
+        Args:
+            timelimit: Optional float, seconds to anneal for
+            moves: Optional int, number of moves to make, instead of a time limit.
+                If neither is given, anneals for the timelimit given at construction
+            schedule: Optional callable taking the fraction of the budget used,
+                from 0 to 1, and returning the temperature, see coolingSchedules.
+                Defaults to geometric cooling from estimate_temperature() down
+                to a thousandth of it
+            block: Optional int, moves between temperature updates, best state
+                checks, and progress reports
+        Returns:
+            float, final class score
+        Raises:
+            ValueError: If the budget is negative or there are fewer than 2 groups
+        '''
+        if timelimit < 0 or moves < 0:
+            raise ValueError('anneal() requires a non-negative time limit and move count.')
+        if moves == 0 and timelimit == 0:
+            timelimit = self.timelimit
+        groups = self.class_state.groups
+        n_groups = len(groups)
+        if n_groups < 2:
+            raise ValueError('Too few groups to anneal (minimum 2).')
+        if schedule is None:
+            start_temp = self.estimate_temperature(groups)
+            if start_temp > 0:
+                schedule = coolingSchedules.geometric(start_temp, start_temp/1000)
+            else:
+                schedule = coolingSchedules.constant(0)
+
+        delta_scoring = all(group.stats is not None for group in groups)
+        swap_score = self.encoding.swap_score
+        rand = random.random
+        randrange = random.randrange
+        exp = math.exp
+
+        total = 0
+        for group in groups:
+            total += group.score
+        best = total
+        best_state = self.snapshot()
+        done = 0
+        start = time.perf_counter()
+        try:
+            with self.phase("search"):
+                while True:
+                    if moves:
+                        fraction = done/moves
                     else:
-                        conv_1 = True
-                elif conv_1: # if it escaped convergence, reset flag
-                    conv_1 = False
+                        fraction = (time.perf_counter() - start)/timelimit
+                    if fraction >= 1:
+                        break
+                    temperature = schedule(fraction)
+                    count = min(block, moves - done) if moves else block
+                    accepted = 0
+
+                    for _ in range(count):
+                        one = randrange(n_groups)
+                        two = randrange(n_groups - 1)
+                        if two >= one:
+                            two += 1
+                        g1 = groups[one]
+                        g2 = groups[two]
+                        s1 = g1.students[randrange(len(g1.students))]
+                        s2 = g2.students[randrange(len(g2.students))]
+
+                        if delta_scoring:
+                            g1_score = swap_score(g1.stats, s1.index, s2.index, g1.size, len(g1.students))
+                            g2_score = swap_score(g2.stats, s2.index, s1.index, g2.size, len(g2.students))
+                            change = (g1_score + g2_score) - (g1.score + g2.score)
+                            if change < 0 and (temperature <= 0 or rand() >= exp(change/temperature)):
+                                continue
+                            self.swap(g1, s1, g2, s2)
+                        else: # Swap, score, and swap back if rejected
+                            self.swap(g1, s1, g2, s2)
+                            g1_score = self.cached_score(g1)
+                            g2_score = self.cached_score(g2)
+                            change = (g1_score + g2_score) - (g1.score + g2.score)
+                            if change < 0 and (temperature <= 0 or rand() >= exp(change/temperature)):
+                                self.swap(g1, s2, g2, s1)
+                                continue
+
+                        g1.score = g1_score
+                        g2.score = g2_score
+                        total += change
+                        accepted += 1
+                    done += count
+
+                    if total > best:
+                        best = total
+                        best_state = self.snapshot()
+                    if self.metrics is not None:
+                        self.metrics.score_evaluations += 2*count
+                        self.metrics.anneal_moves += count
+                        self.metrics.anneal_accepted += accepted
+                        self.metrics.report("search", iteration=done, score=total/n_groups,
+                                            best=best/n_groups, temperature=temperature)
+                    if self.within_gap(best/n_groups):
+                        break
+        except SolveCancelled:
+            pass
+
+        # Scores were set without updating the score index
+        self.score_index = None
+        if best > total:
+            self.restore(best_state)
+        return self.score_class_state()
 
-                if not conv_1:
-                    prev_score = scoresum
+    def estimate_temperature(self, groups: List[Group], samples: Optional[int] = 200,
+                             acceptance: Optional[float] = .5) -> float:
+        '''
+        Estimates a starting temperature for anneal() at which an average
+        worsening move between the given groups is kept with probability acceptance
+        Args:
+            groups: List[Group], groups to sample random moves between (at least 2)
+            samples: Optional int, number of random moves to score, none of which are kept
+            acceptance: Optional float, between 0 and 1
+        Returns:
+            float, temperature, 0 if no sampled move lowered the score
+        '''
+        losses = []
+        for _ in range(samples):
+            (g1, g2) = random.sample(groups, 2)
+            s1 = random.choice(g1.students)
+            s2 = random.choice(g2.students)
+            if g1.stats is not None and g2.stats is not None:
+                g1_score = self.encoding.swap_score(g1.stats, s1.index, s2.index, g1.size, len(g1.students))
+                g2_score = self.encoding.swap_score(g2.stats, s2.index, s1.index, g2.size, len(g2.students))
+            else:
+                self.swap(g1, s1, g2, s2)
+                g1_score = self.cached_score(g1)
+                g2_score = self.cached_score(g2)
+                self.swap(g1, s2, g2, s1)
+            change = (g1_score + g2_score) - (g1.score + g2.score)
+            if change < 0:
+                losses.append(-change)
+        if not losses:
+            return 0
+        return (sum(losses)/len(losses))/-math.log(acceptance)
 
-            self.swap_students_limited(self.class_state.groups)
+    def polish(self, timelimit: Optional[float] = 0, rounds: Optional[int] = 0,
+               tenure: Optional[int] = 10, patience: Optional[int] = 20,
+               chain_length: Optional[int] = 4, width: Optional[int] = 3) -> float:
+        '''
+        Local search over compound moves, to run once iterate_normal() or anneal()
+        has plateaued. Each round takes an anchor group, the lowest scoring with
+        probability 1 - epsilon_b as in swap_students_limited() and a random one
+        otherwise, and two other random groups, then scores:
+            every swap of two students between the anchor and the first group,
+            every rotation of three students between the anchor and both groups,
+                in both directions,
+            greedy ejection chains, in which a student of the anchor displaces a
+                student of another group, who displaces one in a third group,
+                and so on, until the last displaced student takes the first's place
+        The best move is made if it raises the score. After patience rounds in a
+        row without such a move, the best move is made even though it lowers the
+        score, to leave the local optimum. Students moved in the last tenure
+        rounds are tabu and may not move again unless the move gives the best
+        score yet, so the search does not undo such moves and cycle. The best
+        groups found are restored at the end
+        Args:
+            timelimit: Optional float, seconds to search for
+            rounds: Optional int, number of rounds to search for, instead of a
+                time limit. If neither is given, searches for the timelimit
+                given at construction
+            tenure: Optional int, rounds for which moved students stay tabu
+            patience: Optional int, rounds without an improving move before
+                making a move which lowers the score
+            chain_length: Optional int, most groups in an ejection chain
+            width: Optional int, random groups considered at each link of an ejection chain
+        Returns:
+            float, final class score
+        Raises:
+            ValueError: If the budget is negative or there are fewer than 3 groups
+        '''
+        if timelimit < 0 or rounds < 0:
+            raise ValueError('polish() requires a non-negative time limit and round count.')
+        if rounds == 0 and timelimit == 0:
+            timelimit = self.timelimit
+        groups = self.class_state.groups
+        if len(groups) < 3:
+            raise ValueError('Too few groups to polish (minimum 3).')
+
+        self.score_index = None # scores may have been set since the last search
+        index = self.index_scores(groups)
+        best = index.total
+        best_state = self.snapshot()
+        tabu = {} # student index to the last round the student is tabu for
+        stalled = 0
+        start = time.perf_counter()
+        done = 0
+        try:
+            with self.phase("polish"):
+                while (done < rounds) if rounds else (time.perf_counter() - start < timelimit):
+                    done += 1
+                    if random.random() > self.epsilon_b:
+                        anchor = index.min_group()
+                    else:
+                        anchor = random.choice(groups)
+                    others = [group for group in random.sample(groups, 3) if group is not anchor][:2]
+
+                    def allowed(cycle: List[Tuple[Group, Student]]) -> bool:
+                        return all(tabu.get(student.index, 0) < done for (group, student) in cycle)
+
+                    best_move = None
+                    best_scores = None
+                    best_gain = float('-inf')
+                    for cycle in self.compound_moves(anchor, others, chain_length, width, allowed):
+                        scores = self.cycle_scores(cycle)
+                        gain = sum(scores) - sum(group.score for (group, student) in cycle)
+                        if gain > best_gain and (allowed(cycle) or index.total + gain > best):
+                            best_move = cycle
+                            best_scores = scores
+                            best_gain = gain
+                    if best_move is None:
+                        continue
+                    if best_gain <= 0:
+                        stalled += 1
+                        if stalled < patience:
+                            continue
+                    stalled = 0
+
+                    self.rotate(best_move, best_scores)
+                    for (group, student) in best_move:
+                        index.update(group)
+                        tabu[student.index] = done + tenure
+                    if index.total > best:
+                        best = index.total
+                        best_state = self.snapshot()
+
+                    if self.metrics is not None:
+                        self.metrics.polish_moves += 1
+                        self.metrics.report("polish", iteration=done,
+                                            score=index.total/len(groups), best=best/len(groups))
+                    if self.within_gap(best/len(groups)):
+                        break
+        except SolveCancelled:
+            pass
+
+        if best > index.total:
+            self.restore(best_state)
+        return self.score_class_state()
 
+    def compound_moves(self, anchor: Group, others: List[Group], chain_length: int, width: int,
+                       allowed: Callable[[List[Tuple[Group, Student]]], bool]) -> Iterator[List[Tuple[Group, Student]]]:
+        '''
+        Lists the moves polish() scores in one round, as cycles (see rotate())
+        Args:
+            anchor: Group, group every move involves
+            others: List[Group], two other groups to swap and rotate with
+            chain_length: int, most groups in an ejection chain
+            width: int, random groups considered at each link of an ejection chain
+            allowed: Callable taking a cycle and returning False if it moves a tabu student
+        Returns:
+            Iterator of cycles
+        '''
+        (group_one, group_two) = others
+        for a in anchor.students:
+            for b in group_one.students:
+                yield [(anchor, a), (group_one, b)]
+                for c in group_two.students:
+                    yield [(anchor, a), (group_one, b), (group_two, c)]
+                    yield [(anchor, a), (group_two, c), (group_one, b)]
+
+        # Ejection chains extend by the displacement gaining the most, so only
+        # the chains through students which may move are worth building
+        groups = self.class_state.groups
+        for a in anchor.students:
+            chain = [(anchor, a)]
+            if not allowed(chain):
+                continue
+            carried = a
+            for _ in range(chain_length - 1):
+                best_link = None
+                best_gain = float('-inf')
+                for group in random.sample(groups, min(width + len(chain), len(groups))):
+                    if any(group is linked for (linked, student) in chain):
+                        continue
+                    for student in group.students:
+                        if not allowed([(group, student)]):
+                            continue
+                        gain = self.replaced_score(group, student, carried) - group.score
+                        if gain > best_gain:
+                            best_link = (group, student)
+                            best_gain = gain
+                if best_link is None:
+                    break
+                chain.append(best_link)
+                carried = best_link[1]
+                if len(chain) > 3: # Shorter chains are swaps or rotations listed above
+                    yield list(chain)
+
+    def replaced_score(self, group: Group, out_student: Student, in_student: Student) -> float:
+        '''
+        Scores a group as if one member were replaced by another student, leaving the group untouched
+        Args:
+            group: Group, the group to score
+            out_student: Student, member to replace
+            in_student: Student, student to replace them with
+        Returns:
+            float, score of the group after the replacement
+        '''
+        if self.metrics is not None:
+            self.metrics.score_evaluations += 1
+        if group.stats is not None:
+            return self.encoding.swap_score(group.stats, out_student.index, in_student.index,
+                                            group.size, len(group.students))
+        trial = Group()
+        trial.number = group.number
+        trial.size = group.size
+        trial.students = [in_student if student is out_student else student for student in group.students]
+        return self.cached_score(trial)
+
+    def cycle_scores(self, cycle: List[Tuple[Group, Student]]) -> List[float]:
+        '''
+        Scores the groups of a cycle as if it were rotated, see rotate()
+        Args:
+            cycle: List of (group, student) pairs
+        Returns:
+            List of the score of each group of the cycle after rotating it
+        '''
+        return [self.replaced_score(group, student, cycle[i - 1][1])
+                for i, (group, student) in enumerate(cycle)]
 
-        # Scores and prints the final class state
-        end_score = self.score_class_state()
-        return end_score
+    def rotate(self, cycle: List[Tuple[Group, Student]], scores: List[float]):
+        '''
+        Moves each student of a cycle to the next pair's group, the last student
+        to the first pair's group, by swaps with the first group
+        Args:
+            cycle: List of (group, student) pairs, each group distinct and
+                holding its student
+            scores: List of the score of each group after the rotation
+        Returns:
+            None
+        '''
+        (first_group, first_student) = cycle[0]
+        for i in range(1, len(cycle)):
+            self.swap(first_group, cycle[i - 1][1], cycle[i][0], cycle[i][1])
+        for (group, student), score in zip(cycle, scores):
+            group.score = score
 
     def get_rand_index(self, max_num: int) -> Tuple[int, int]:
         '''
@@ -661,21 +1863,13 @@ class GroupAssign:
         if swap_size < 3:
             raise ValueError('Too few groups provided to swap_students_limited (minimum 3).')
 
+        index = self.index_scores(swappable_groups)
         g1 = None
         g2 = None
         avoid = None
         if random.random() > self.epsilon_b:
-            min_group_score = float('inf')
-            max_group_score = float('-inf')
-            for group in swappable_groups:
-                if group.score < min_group_score:
-                    min_group_score = group.score
-                    g1 = group
-                if group.score > max_group_score:
-                    max_group_score = group.score
-                    avoid = group
-            if len(swappable_groups) < 3:
-                avoid = None
+            g1 = index.min_group()
+            avoid = index.max_group()
         else:
             g1 = random.choice(swappable_groups)
 
@@ -687,34 +1881,18 @@ class GroupAssign:
         if random.random() > self.epsilon: # Greedy search
             group_one = g1
             group_two = g2
-            total_score = group_one.score + group_two.score
-
-            best_from_one = None
-            best_from_two = None
-            best_g1 = group_one.score
-            best_g2 = group_two.score
-            best_score = total_score
-
-            # For each student pairing, swap, test, and swap back
-            for i in group_one.students:
-                for j in group_two.students:
-                    self.swap(group_one, i, group_two, j)
-                    g1_score = self.score_group(group_one)
-                    g2_score = self.score_group(group_two)
-                    candidate_score = (g1_score + g2_score)
-                    self.swap(group_one, j, group_two, i)
-
-                    if candidate_score > best_score: # Improvement
-                        best_from_one = i
-                        best_from_two = j
-                        best_g1 = g1_score
-                        best_g2 = g2_score
-                        best_score = candidate_score
+            (best_from_one, best_from_two, best_g1, best_g2) = self.best_swap(group_one, group_two)
+            if self.metrics is not None:
+                self.metrics.greedy_swaps += 1
 
             if best_from_one is not None: # Do the permanent swap, this is the best
                 self.swap(group_one, best_from_one, group_two, best_from_two)
                 group_one.score = best_g1
                 group_two.score = best_g2
+                index.update(group_one)
+                index.update(group_two)
+                if self.metrics is not None:
+                    self.metrics.accepted_swaps += 1
 
                 return 1
 
@@ -722,17 +1900,133 @@ class GroupAssign:
                 return 0
 
         else: # Random swap
+            if self.metrics is not None:
+                self.metrics.random_swaps += 1
             s1 = random.choice(g1.students)
             s2 = random.choice(g2.students)
             self.swap(g1, s1, g2, s2)
-            g1.score = self.score_group(g1)
-            g2.score = self.score_group(g2)
+            g1.score = self.cached_score(g1)
+            g2.score = self.cached_score(g2)
+            index.update(g1)
+            index.update(g2)
 
             return 0
 
+    def best_swap(self, group_one: Group, group_two: Group) -> Tuple[Optional[Student], Optional[Student], float, float]:
+        '''
+        Finds the student pairing whose swap most improves the combined score of two groups
+        Args:
+            group_one: Group, the first group to swap from
+            group_two: Group, the second group to swap from
+        Returns:
+            Tuple of the student from group_one and the student from group_two
+            to swap (both None if no swap improves the combined score), and the
+            scores of group_one and group_two after that swap
+        '''
+        best_from_one = None
+        best_from_two = None
+        best_g1 = group_one.score
+        best_g2 = group_two.score
+        best_score = group_one.score + group_two.score
+
+        if self.engine == "numpy" and group_one.stats is not None and group_two.stats is not None:
+            (g1_scores, g2_scores) = self.swap_candidates(group_one, group_two)
+            candidate_scores = g1_scores + g2_scores
+            if self.metrics is not None:
+                self.metrics.score_evaluations += 2*candidate_scores.size
+            # argmax picks the first best pairing, as the sequential search does
+            (i, j) = divmod(int(candidate_scores.argmax()), candidate_scores.shape[1])
+            if candidate_scores[i, j] > best_score: # Improvement
+                best_from_one = group_one.students[i]
+                best_from_two = group_two.students[j]
+                best_g1 = float(g1_scores[i, j])
+                best_g2 = float(g2_scores[i, j])
+
+            return (best_from_one, best_from_two, best_g1, best_g2)
+
+        if group_one.stats is not None and group_two.stats is not None:
+            # Score each student pairing from group statistics, leaving the groups untouched
+            encoding = self.encoding
+            n_one = len(group_one.students)
+            n_two = len(group_two.students)
+            if self.metrics is not None:
+                self.metrics.score_evaluations += 2*n_one*n_two
+            for i in group_one.students:
+                for j in group_two.students:
+                    g1_score = encoding.swap_score(group_one.stats, i.index, j.index, group_one.size, n_one)
+                    g2_score = encoding.swap_score(group_two.stats, j.index, i.index, group_two.size, n_two)
+                    candidate_score = (g1_score + g2_score)
+
+                    if candidate_score > best_score: # Improvement
+                        best_from_one = i
+                        best_from_two = j
+                        best_g1 = g1_score
+                        best_g2 = g2_score
+                        best_score = candidate_score
+
+            return (best_from_one, best_from_two, best_g1, best_g2)
+
+        # For each student pairing, swap, test, and swap back
+        for i in list(group_one.students):
+            for j in list(group_two.students):
+                self.swap(group_one, i, group_two, j)
+                g1_score = self.cached_score(group_one)
+                g2_score = self.cached_score(group_two)
+                candidate_score = (g1_score + g2_score)
+                self.swap(group_one, j, group_two, i)
+
+                if candidate_score > best_score: # Improvement
+                    best_from_one = i
+                    best_from_two = j
+                    best_g1 = g1_score
+                    best_g2 = g2_score
+                    best_score = candidate_score
+
+        return (best_from_one, best_from_two, best_g1, best_g2)
+
+    def swap_candidates(self, group_one: Group, group_two: Group):
+        '''
+        Scores every student pairing between two groups in one batch
+        Requires the numpy engine
+        Args:
+            group_one: Group, the first group to swap from
+            group_two: Group, the second group to swap from
+        Returns:
+            Tuple of two ndarrays of shape (len(group_one.students), len(group_two.students)),
+            where entry (i, j) holds the score of group_one, respectively group_two,
+            after swapping group_one.students[i] with group_two.students[j]
+        '''
+        rows_one = [student.index for student in group_one.students]
+        rows_two = [student.index for student in group_two.students]
+        stats_one = group_one.stats
+        if stats_one is None:
+            stats_one = self.encoding.group_stats(rows_one)
+        stats_two = group_two.stats
+        if stats_two is None:
+            stats_two = self.encoding.group_stats(rows_two)
+
+        g1_scores = self.encoding.swap_matrix(stats_one, rows_one, rows_two, group_one.size, len(rows_one))
+        g2_scores = self.encoding.swap_matrix(stats_two, rows_two, rows_one, group_two.size, len(rows_two))
+        return (g1_scores, g2_scores.T)
+
+    def swap_deltas(self, group_one: Group, group_two: Group):
+        '''
+        Gets the change in combined score of two groups for every student pairing
+        Requires the numpy engine
+        Args:
+            group_one: Group, the first group to swap from
+            group_two: Group, the second group to swap from
+        Returns:
+            ndarray of shape (len(group_one.students), len(group_two.students)),
+            where entry (i, j) is the combined score change from swapping
+            group_one.students[i] with group_two.students[j]
+        '''
+        (g1_scores, g2_scores) = self.swap_candidates(group_one, group_two)
+        return (g1_scores + g2_scores) - (group_one.score + group_two.score)
+
     def swap(self, group_one: Group, student_one: Student, group_two: Group, student_two: Student):
         '''
-        Swaps two students between groups
+        Swaps two students between groups, each taking the other's slot
         Args:
             group_one: Group, the first group to swap from
             student_one: Student, the student to move from the first group
@@ -743,71 +2037,402 @@ class GroupAssign:
         Raises:
             ValueError: If either student is not present in the group
         '''
-        if student_one not in group_one.students or student_two not in group_two.students:
-            raise ValueError('Swapped student not present.')
+        slot_one = self.find_slot(group_one, student_one)
+        slot_two = self.find_slot(group_two, student_two)
 
         student_one.group = group_two.number
         student_two.group = group_one.number
 
-        group_one.students.append(student_two)
-        group_two.students.append(student_one)
+        group_one.students[slot_one] = student_two
+        group_two.students[slot_two] = student_one
+        student_one.slot = slot_two
+        student_two.slot = slot_one
+
+        if group_one.stats is not None:
+            self.encoding.move(group_one.stats, student_one.index, student_two.index)
+        if group_two.stats is not None:
+            self.encoding.move(group_two.stats, student_two.index, student_one.index)
+
+    def find_slot(self, group: Group, student: Student) -> int:
+        '''
+        Gets a student's position in a group's list of students, checking the
+        recorded slot before searching the list
+        Args:
+            group: Group, the group to search
+            student: Student, the student to find
+        Returns:
+            int, index of the student in group.students
+        Raises:
+            ValueError: If the student is not present in the group
+        '''
+        slot = student.slot
+        if slot < len(group.students) and group.students[slot] is student:
+            return slot
+        if student not in group.students:
+            raise ValueError('Swapped student not present.')
+        return group.students.index(student)
+
+#===============================================================================
+#================================ Roster Changes ===============================
+#===============================================================================
+
+    def repair(self, previous_csv: str, dropped: Optional[List[str]] = None,
+               locked: Optional[List[str]] = None, iterations: Optional[int] = 0,
+               candidates: Optional[int] = 25) -> float:
+        '''
+        Carries a previous assignment over to the current roster, e.g. after
+        students add or drop the course mid-term, moving as few students as it can.
+        Continuing students start in their previous groups. Students of the
+        previous assignment missing from the roster, or named in dropped, leave
+        their groups; students of the roster missing from the previous
+        assignment join the groups they raise the score of most. Groups are then
+        rebalanced to the sizes assign_initial_groups() would make, and swaps
+        between the groups which changed and any others are made where they
+        raise the score. Locked students are never moved
+        Args:
+            previous_csv: str, CSV of the previous assignment, as written by
+                output_state(), with a "Group Number" column and the
+                identification question. Students are matched by name
+            dropped: Optional list of names of students to leave out even though
+                they are in the roster
+            locked: Optional list of names of students to keep in their groups
+            iterations: Optional int, number of swap attempts, 10 per changed
+                group if not given
+            candidates: Optional int, most groups to consider when placing or
+                moving a student
+        Returns:
+            float, final class score
+        Raises:
+            AssertionError: CSV File does not exist
+            ValueError: If the previous assignment is malformed or no students remain
+        '''
+        with self.phase("load"):
+            previous = self.read_assignment(previous_csv)
+        with self.phase("init"):
+            self.carry_over(previous, dropped or [], locked or [], candidates)
+        with self.phase("search"):
+            attempts = self.repair_swaps(iterations)
+        score = self.score_class_state()
+        if self.metrics is not None:
+            self.metrics.report("search", iteration=attempts, score=score)
+        return score
+
+    def read_assignment(self, input_csv_file: str) -> Dict[int, List[str]]:
+        '''
+        Reads an assignment CSV written by output_state()
+        Args:
+            input_csv_file: str, filename for assignment CSV
+        Returns:
+            Dict of group numbers to the names of their students, in file order
+        Raises:
+            AssertionError: CSV File does not exist
+            ValueError: If a header is missing or a group number is not an integer
+        '''
+        groups = {}
+        for (positions, rows) in self.read_csv_chunks(input_csv_file,
+                                                    ["Group Number", self.name_question], 10000):
+            number_position = positions["Group Number"]
+            name_position = positions[self.name_question]
+            for row in rows:
+                try:
+                    number = int(row[number_position])
+                except ValueError:
+                    raise ValueError("Group number \"{}\" of \"{}\" is not an integer.".format(
+                                    row[number_position], input_csv_file))
+                groups.setdefault(number, []).append(row[name_position])
+        return groups
+
+    def carry_over(self, previous: Dict[int, List[str]], dropped: List[str], locked: List[str],
+                   candidates: int):
+        '''
+        Builds the class state from a previous assignment and the current
+        roster, marking each student's has_dropped, new_student, and mutable,
+        and each group's mutable if its members changed (see repair())
+        Args:
+            previous: Dict of group numbers to student names, see read_assignment()
+            dropped: List of names of students to leave out
+            locked: List of names of students to keep in their groups
+            candidates: int, most groups to consider when placing or moving a student
+        Returns:
+            None
+        Raises:
+            ValueError: If no students remain
+        '''
+        by_name = {}
+        for student in self.students:
+            student.has_dropped = False
+            student.new_student = True
+            student.mutable = True
+            by_name.setdefault(student.name, []).append(student)
+        for name in locked:
+            for student in by_name.get(name, []):
+                student.mutable = False
+        for name in dropped:
+            for student in by_name.pop(name, []):
+                student.has_dropped = True
+
+        # Students of the previous assignment are matched to the roster by name,
+        # in order, so that repeated names each keep one place
+        groups = []
+        self.previous_assignment = {}
+        for number in sorted(previous):
+            group = Group()
+            group.number = number
+            for name in previous[number]:
+                matches = by_name.get(name)
+                if matches:
+                    student = matches.pop(0)
+                    student.new_student = False
+                    group.students.append(student)
+                    self.previous_assignment[student.index] = number
+                else:
+                    group.mutable = True # A member has dropped
+            groups.append(group)
+        unplaced = [student for student in self.students
+                    if student.new_student and not student.has_dropped]
+
+        n_students = len(self.previous_assignment) + len(unplaced)
+        if not n_students:
+            raise ValueError("No students remain to assign.")
+
+        # As many groups as assign_initial_groups() would make
+        num_groups = n_students//self.per_group
+        remainder = n_students%self.per_group
+        if remainder + 1 == self.per_group and remainder != 1 and self.per_group >= 3:
+            num_groups += 1
+        num_groups = max(num_groups, 1)
+
+        # Dissolves the smallest groups without locked students, or adds empty ones
+        groups = [group for group in groups if group.students]
+        while len(groups) > num_groups:
+            dissolvable = [group for group in groups
+                           if all(student.mutable for student in group.students)]
+            if not dissolvable:
+                break
+            smallest = min(dissolvable, key=lambda group: len(group.students))
+            groups.remove(smallest)
+            unplaced.extend(smallest.students)
+        number = max([group.number for group in groups], default=0)
+        while len(groups) < num_groups:
+            number += 1
+            group = Group()
+            group.number = number
+            group.mutable = True
+            groups.append(group)
+
+        for group in groups:
+            group.size = len(group.students)
+        filled = [group for group in groups if group.students]
+        for group, gscore in zip(filled, self.score_groups(filled)):
+            group.score = gscore
+
+        low = n_students//len(groups)
+        high = -(-n_students//len(groups))
+
+        # Overfull groups shed the students they lose least by
+        for group in groups:
+            while len(group.students) > high:
+                movable = [student for student in group.students if student.mutable]
+                if not movable:
+                    break
+                scores = [self.resized_score(group, student, -1) for student in movable]
+                best = max(range(len(movable)), key=lambda i: scores[i])
+                self.leave(group, movable[best], scores[best])
+                unplaced.append(movable[best])
+
+        # Unplaced students fill the emptiest groups, each joining the one it
+        # raises the score of most
+        for student in unplaced:
+            room = [group for group in groups if len(group.students) < low]
+            if not room:
+                room = [group for group in groups if len(group.students) < high] or groups
+            room = self.sample_groups(room, candidates)
+            scores = [self.resized_score(group, student, 1) for group in room]
+            best = max(range(len(room)), key=lambda i: scores[i] - room[i].score)
+            self.join(room[best], student, scores[best])
+
+        # Underfull groups take students from groups with more than enough
+        for group in groups:
+            while len(group.students) < low:
+                donors = self.sample_groups([donor for donor in groups
+                                             if len(donor.students) > low], candidates)
+                best_move = None
+                best_gain = float('-inf')
+                for donor in donors:
+                    for student in donor.students:
+                        if not student.mutable:
+                            continue
+                        scores = (self.resized_score(donor, student, -1),
+                                  self.resized_score(group, student, 1))
+                        gain = sum(scores) - donor.score - group.score
+                        if gain > best_gain:
+                            best_move = (donor, student, scores)
+                            best_gain = gain
+                if best_move is None:
+                    break
+                (donor, student, scores) = best_move
+                self.leave(donor, student, scores[0])
+                self.join(group, student, scores[1])
+
+        self.class_state.groups = [group for group in groups if group.students]
+        self.index_class_state()
+        self.initialized = True
+
+    def repair_swaps(self, iterations: int) -> int:
+        '''
+        Swaps unlocked students between a random group whose members changed and
+        another random group, taking the best swap of the pair if it raises
+        their combined score
+        Args:
+            iterations: int, number of swap attempts, 10 per changed group if 0
+        Returns:
+            int, number of swap attempts made
+        '''
+        groups = self.class_state.groups
+        changed = [group for group in groups if group.mutable]
+        if not changed or len(groups) < 2:
+            return 0
+        if iterations == 0:
+            iterations = 10*len(changed)
+
+        for _ in range(iterations):
+            group_one = random.choice(changed)
+            group_two = random.choice(groups)
+            if group_two is group_one:
+                continue
+            if self.metrics is not None:
+                self.metrics.greedy_swaps += 1
+
+            best_swap = None
+            best_score = group_one.score + group_two.score
+            for i in group_one.students:
+                if not i.mutable:
+                    continue
+                for j in group_two.students:
+                    if not j.mutable:
+                        continue
+                    g1_score = self.replaced_score(group_one, i, j)
+                    g2_score = self.replaced_score(group_two, j, i)
+                    if g1_score + g2_score > best_score:
+                        best_swap = (i, j, g1_score, g2_score)
+                        best_score = g1_score + g2_score
+            if best_swap is None:
+                continue
+
+            (i, j, g1_score, g2_score) = best_swap
+            self.swap(group_one, i, group_two, j)
+            group_one.score = g1_score
+            group_two.score = g2_score
+            group_two.mutable = True
+            if self.metrics is not None:
+                self.metrics.accepted_swaps += 1
+        return iterations
+
+    def resized_score(self, group: Group, student: Student, change: int) -> float:
+        '''
+        Scores a group as if a student joined or left it, leaving the group untouched
+        Args:
+            group: Group, the group to score
+            student: Student, student to add, or member to remove
+            change: int, 1 to add the student, -1 to remove them
+        Returns:
+            float, score of the group after the change, 0 if it would be empty
+        '''
+        trial = Group()
+        trial.number = group.number
+        if change > 0:
+            trial.students = group.students + [student]
+        else:
+            trial.students = [member for member in group.students if member is not student]
+        trial.size = len(trial.students)
+        if not trial.students:
+            return 0
+        return self.cached_score(trial)
+
+    def join(self, group: Group, student: Student, score: float):
+        '''
+        Adds a student to a group, see resized_score()
+        '''
+        group.students.append(student)
+        group.size = len(group.students)
+        group.score = score
+        group.mutable = True
 
-        group_one.students.remove(student_one)
-        group_two.students.remove(student_two)
+    def leave(self, group: Group, student: Student, score: float):
+        '''
+        Removes a student from a group, see resized_score()
+        '''
+        group.students.remove(student)
+        group.size = len(group.students)
+        group.score = score
+        group.mutable = True
+
+    def sample_groups(self, groups: List[Group], limit: int) -> List[Group]:
+        '''
+        Gets at most limit groups, at random if there are more
+        '''
+        if len(groups) <= limit:
+            return groups
+        return random.sample(groups, limit)
 
 #===============================================================================
 #============================== Output & Comparison ============================
 #===============================================================================
 
-    def output_state(self, output_type: str, output_filename: Optional[str] = None):
+    def output_state(self, output_type: str, output_filename: Optional[str] = None,
+                    snapshot: Optional[Snapshot] = None):
         '''
         Outputs groups, scores, and students in each group
         Args:
             output_type: str, p, c, b, or u (Print/CSV/Both/User-defined)
             output_filename: str, if not included, will prompt user for output filename
+            snapshot: Snapshot, if included, outputs its groups rather than the current class state
         Returns:
             None
         '''
+        if snapshot is None:
+            snapshot = self.snapshot()
 
         if output_type == 'u':
             output_type = input("Please indicate the type of output you would like (C for CSV, P for Print, B for both)")
         output_type = output_type.lower()
 
 
-        if output_type == 'c' or output_type == 'b':
-            if not output_filename:
-                output_filename = input("Please enter a filename for the output: ")
-
-            # Verification of overwrite is done on the UI side
-            with open(output_filename, 'w') as output_file:
-                output_file.write("Group Number")
-                for question in self.questions:
-                    output_file.write("," + question)
-                output_file.write("\n")
-                for group in self.class_state.groups:
-                    for student in group.students:
-                        output_file.write(str(group.number))
-                        for question in self.questions:
-                            to_write = student.answers[question]
-                            if to_write.__class__.__name__ == 'list' and to_write:
-                                to_write = str(to_write[0])
-                                for ans in student.answers[question][1:]:
-                                    to_write += self.check_delimiter + str(ans)
-                            output_file.write("," + str(to_write))
-                        output_file.write("\n")
-
-
-        if output_type == 'p' or output_type == 'b':
-            for group in self.class_state.groups:
-                print("-----------------------------")
-                print("Group number: " + str(group.number))
-                print("Group score: " + str(group.score))
-                print("Group members:")
-                for student in group.students:
-                    print(student.name)
+        with self.phase("output"):
+            if output_type == 'c' or output_type == 'b':
+                if not output_filename:
+                    output_filename = input("Please enter a filename for the output: ")
+
+                # Verification of overwrite is done on the UI side
+                with open(output_filename, 'w') as output_file:
+                    output_file.write("Group Number")
+                    for question in self.questions:
+                        output_file.write("," + question)
+                    output_file.write("\n")
+                    for (number, score, members) in self.snapshot_groups(snapshot):
+                        for student in members:
+                            output_file.write(str(number))
+                            for question in self.questions:
+                                to_write = student.answers[question]
+                                if to_write.__class__.__name__ == 'list' and to_write:
+                                    to_write = str(to_write[0])
+                                    for ans in student.answers[question][1:]:
+                                        to_write += self.check_delimiter + str(ans)
+                                output_file.write("," + str(to_write))
+                            output_file.write("\n")
+
+
+            if output_type == 'p' or output_type == 'b':
+                for (number, score, members) in self.snapshot_groups(snapshot):
+                    print("-----------------------------")
+                    print("Group number: " + str(number))
+                    print("Group score: " + str(score))
+                    print("Group members:")
+                    for student in members:
+                        print(student.name)
         if output_type not in ['c', 'p', 'b']:
             print("Invalid output type.")
-            self.output_state('u')
+            self.output_state('u', output_filename, snapshot)
 
     def gen_opt_groups(self, select_size: int):
         '''
@@ -839,7 +2464,6 @@ class GroupAssign:
         # for valid comparison
         random.shuffle(self.students)
 
-        scoresum = 0
         for group in self.optimal_groups:
             for question in self.questions:
                 opts = None
@@ -881,6 +2505,10 @@ class GroupAssign:
                     for student in group.students:
                         student.answers[question] = blocks
 
+        self.encode_students()
+
+        scoresum = 0
+        for group in self.optimal_groups:
             group.score = self.score_group(group)
             scoresum += group.score
 
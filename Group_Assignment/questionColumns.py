@@ -0,0 +1,873 @@
+# Columnar encoding of student responses for the Group Assignment Tool
+# Each question is encoded once into integer or bitmask columns, one row per
+# student, so that groups can be scored from their member row indices alone
+# Question types map to their column classes through a registry, see
+# register_question_type()
+
+import itertools
+from typing import *
+
+try:
+    import numpy as np
+except ImportError: # numpy is only required for the vectorized engine
+    np = None
+
+MULTIPLE_CHOICE = "(Multiple Choice Question)"
+CHECKBOX = "(Checkbox Question)"
+SCHEDULING = "(Scheduling Question)"
+ISOLATION = "(Isolation Question)"
+RESTRICTIVE = "(Restrictive Question)"
+
+def popcount(mask: int) -> int:
+    '''
+    Counts the set bits of a non-negative integer
+    '''
+    return bin(mask).count("1")
+
+def block_bits(blocks: List[str]) -> Dict[str,int]:
+    '''
+    Assigns each scheduling block its bit in a schedule bitmask
+    Args:
+        blocks: List of scheduling blocks, e.g. one per hour of the week
+    Returns:
+        Dict linking each block to its bit
+    '''
+    return {block: 1 << i for i, block in enumerate(blocks)}
+
+def split_answer(answer: Union[str, List[str]], delimiter: str) -> List[str]:
+    '''
+    Splits a multiple selection answer into its selections
+    Args:
+        answer: List of selections, or delimited string of selections such as "Sports;Music"
+        delimiter: Delimiter between selections in string answers
+    Returns:
+        List of selections, empty for an empty answer
+    '''
+    if isinstance(answer, str):
+        return [selection.strip() for selection in answer.split(delimiter) if selection.strip()]
+    return answer
+
+def block_mask(answer: Union[str, List[str]], bits: Dict[str,int], delimiter: str) -> int:
+    '''
+    Parses a scheduling answer into a bitmask of the blocks it lists
+    Args:
+        answer: List of blocks, or delimited string of blocks such as "10;11;12"
+        bits: Dict linking each block to its bit, from block_bits()
+        delimiter: Delimiter between blocks in string answers
+    Returns:
+        int, bitmask of the known blocks in the answer
+    '''
+    mask = 0
+    for block in split_answer(answer, delimiter):
+        mask |= bits.get(block, 0)
+    return mask
+
+class Column:
+    '''
+    Base class for a single encoded question, which also serves as the scorer
+    for the question
+
+    Subclasses encode the answers of the students passed to extend(), which
+    may be called repeatedly as students are loaded, and implement score(). Columns
+    which set incremental also let groups keep running statistics (see
+    new_stats()), from which the score of the group, or of the group with one
+    member traded for another student, is computed without rescanning its
+    members. Columns which set vectorizable implement the numpy methods.
+
+    Attributes:
+        question: Question text the column was encoded from
+        weight: Question weight
+        incremental: True if the column implements the running statistics methods
+        vectorizable: True if the column implements vectorize(), score_batch() and swap_matrix()
+    '''
+    incremental = False
+    vectorizable = False
+
+    def __init__(self, question: str, weight: float, assigner: Any):
+        '''
+        Creates an empty column for a question
+        Args:
+            question: str, question text
+            weight: float, question weight
+            assigner: GroupAssign, the assigner the question belongs to, for
+                settings such as scheduling blocks or majority options
+        '''
+        self.question = question
+        self.weight = weight
+
+    def extend(self, students: List[Any]):
+        '''
+        Encodes the answers of the next students in row order
+        Args:
+            students: List[Student], students whose rows follow those already encoded
+        '''
+        raise NotImplementedError
+
+    def score(self, group: Any) -> float:
+        '''
+        Gets group score with regard to the question
+        Args:
+            group: Group, the group to score
+        Returns:
+            float, score for group with regard to the question
+        '''
+        raise NotImplementedError
+
+    def new_stats(self) -> List[Any]:
+        '''
+        Returns:
+            Running statistics of an empty group
+        '''
+        raise NotImplementedError
+
+    def add(self, stats: List[Any], row: int):
+        '''
+        Updates statistics for a student joining the group
+        Args:
+            stats: Running statistics of the group
+            row: Row index of the student
+        '''
+        raise NotImplementedError
+
+    def remove(self, stats: List[Any], row: int):
+        '''
+        Updates statistics for a student leaving the group
+        Args:
+            stats: Running statistics of the group
+            row: Row index of the student
+        '''
+        raise NotImplementedError
+
+    def swap_score(self, stats: List[Any], out_row: int, in_row: int, size: int, n_members: int) -> float:
+        '''
+        Scores the group as if one member were replaced, without updating statistics
+        Args:
+            stats: Running statistics of the group
+            out_row: Row index of the member leaving the group
+            in_row: Row index of the student joining the group
+            size: Group.size of the group
+            n_members: Number of students in the group
+        Returns:
+            float, score for the resulting group with regard to the question
+        '''
+        raise NotImplementedError
+
+    def upper_bound(self, rows: List[int], shapes: List[Tuple[int, int]]) -> Optional[float]:
+        '''
+        Bounds the column's contribution to the class score from a relaxation of
+        the question alone, ignoring how other questions constrain the groups
+        Args:
+            rows: Row indices of the students being grouped
+            shapes: List of the number of members and Group.size of each group
+        Returns:
+            float, at least the highest sum of the column's scores over the
+            groups of any assignment of the students, None if unknown
+        '''
+        return None
+
+    def cache_fields(self) -> Optional[Tuple[Dict[str, Any], Dict[str, Sequence[int]]]]:
+        '''
+        Gets the column's encoding to save in a dataset cache, see datasetCache
+        Returns:
+            Tuple of a dict of JSON serializable fields and a dict of integer
+            sequences, or None if the column cannot be cached
+        '''
+        return None
+
+    def load_cache(self, fields: Dict[str, Any], arrays: Dict[str, memoryview]):
+        '''
+        Restores the encoding saved from cache_fields(), in place of extend()
+        Args:
+            fields: Dict of the fields from cache_fields()
+            arrays: Dict of the integer sequences from cache_fields(), as
+                memoryviews over the mapped cache file
+        '''
+        raise NotImplementedError
+
+    def __getstate__(self):
+        # Encodings mapped from a dataset cache are memoryviews, which do not
+        # pickle, so copies are sent to worker processes instead
+        state = self.__dict__.copy()
+        for (name, value) in state.items():
+            if isinstance(value, memoryview):
+                state[name] = value.tolist()
+        return state
+
+    def vectorize(self):
+        '''
+        Builds the numpy arrays used by score_batch() and swap_matrix()
+        '''
+        raise NotImplementedError
+
+    def swap_matrix(self, stats: List[Any], out_rows, in_rows, size: int, n_members: int):
+        '''
+        Vectorized swap_score() over every pairing of a leaving member and a joining student
+        Args:
+            stats: Running statistics of the group
+            out_rows: ndarray, row indices of the members that may leave the group
+            in_rows: ndarray, row indices of the students that may join the group
+            size: Group.size of the group
+            n_members: Number of students in the group
+        Returns:
+            ndarray of shape (len(out_rows), len(in_rows)), score for each resulting group
+        '''
+        raise NotImplementedError
+
+    def score_batch(self, members, sizes):
+        '''
+        Scores many groups of equal member count at once
+        Args:
+            members: ndarray of shape (n_groups, n_members), student row indices
+            sizes: ndarray of shape (n_groups,), Group.size of each group
+        Returns:
+            ndarray of shape (n_groups,), score for each group with regard to the question
+        '''
+        raise NotImplementedError
+
+class ChoiceColumn(Column):
+    '''
+    Multiple choice question, encoded as one choice id per student
+    Scores the number of distinct choices in a group over its size
+    '''
+    incremental = True
+    vectorizable = True
+
+    def __init__(self, question, weight, assigner):
+        super(ChoiceColumn, self).__init__(question, weight, assigner)
+        self.options = {}
+        self.codes = []
+
+    def extend(self, students):
+        options = self.options
+        question = self.question
+        self.codes.extend([options.setdefault(student.answers[question], len(options))
+                            for student in students])
+
+    def score(self, group):
+        codes = self.codes
+        sum_values = len({codes[student.index] for student in group.students})
+        return (sum_values/group.size) * self.weight
+
+    # Statistics: [count of each choice, number of distinct choices]
+    def new_stats(self):
+        return [[0]*len(self.options), 0]
+
+    def add(self, stats, row):
+        code = self.codes[row]
+        if stats[0][code] == 0:
+            stats[1] += 1
+        stats[0][code] += 1
+
+    def remove(self, stats, row):
+        code = self.codes[row]
+        stats[0][code] -= 1
+        if stats[0][code] == 0:
+            stats[1] -= 1
+
+    def swap_score(self, stats, out_row, in_row, size, n_members):
+        out_code = self.codes[out_row]
+        in_code = self.codes[in_row]
+        sum_values = stats[1]
+        if out_code != in_code:
+            if stats[0][out_code] == 1:
+                sum_values -= 1
+            if stats[0][in_code] == 0:
+                sum_values += 1
+        return (sum_values/size) * self.weight
+
+    def upper_bound(self, rows, shapes):
+        counts = {}
+        for row in rows:
+            counts[self.codes[row]] = counts.get(self.codes[row], 0) + 1
+        n_choices = len(counts)
+        # A group holds at most one of each choice and at least one choice, and
+        # a choice can be in at most as many groups as students chose it, and in
+        # at least as many as it takes groups of the largest member count to hold them
+        limits = [(min(n_members, n_choices), size) for (n_members, size) in shapes if n_members]
+        if self.weight >= 0:
+            available = sum(min(count, len(limits)) for count in counts.values())
+            order = sorted(limits, key=lambda limit: limit[1])
+        else:
+            most = max(n_members for (n_members, size) in shapes)
+            available = max(len(limits), sum(-(-count//most) for count in counts.values()))
+            order = sorted(limits, key=lambda limit: -limit[1])
+        # Fills the groups where a distinct choice counts most first, each with
+        # at least one choice and at most its limit
+        bound = sum(1/size for (limit, size) in limits)
+        available -= len(limits)
+        for (limit, size) in order:
+            extra = max(0, min(limit - 1, available))
+            bound += extra/size
+            available -= extra
+        return bound*self.weight
+
+    def cache_fields(self):
+        return ({"options": list(self.options)}, {"codes": self.codes})
+
+    def load_cache(self, fields, arrays):
+        self.options = {option: code for code, option in enumerate(fields["options"])}
+        self.codes = arrays["codes"]
+
+    def vectorize(self):
+        self.code_array = np.array(self.codes, dtype=np.int64)
+
+    def score_batch(self, members, sizes):
+        choices = np.sort(self.code_array[members], axis=1)
+        distinct = 1 + np.count_nonzero(np.diff(choices, axis=1), axis=1)
+        return (distinct/sizes) * self.weight
+
+    def swap_matrix(self, stats, out_rows, in_rows, size, n_members):
+        counts = np.asarray(stats[0], dtype=np.int64)
+        out_codes = self.code_array[out_rows]
+        in_codes = self.code_array[in_rows]
+        differ = out_codes[:, None] != in_codes[None, :]
+        sum_values = stats[1] - ((counts[out_codes] == 1)[:, None] & differ) \
+                    + ((counts[in_codes] == 0)[None, :] & differ)
+        return (sum_values/size) * self.weight
+
+class CheckboxColumn(Column):
+    '''
+    Checkbox question, encoded as the option ids each student selected
+    Scores how spread a group's selections are over the options, one minus
+    the squared counts of options selected more than once over the options
+    selected times the total selections
+    '''
+    incremental = True
+    vectorizable = True
+
+    def __init__(self, question, weight, assigner):
+        super(CheckboxColumn, self).__init__(question, weight, assigner)
+        self.delimiter = assigner.check_delimiter
+        self.options = {}
+        self.selections = []
+
+    def extend(self, students):
+        options = self.options
+        question = self.question
+        delimiter = self.delimiter
+        self.selections.extend([tuple(options.setdefault(selection, len(options))
+                                    for selection in split_answer(student.answers[question], delimiter))
+                                for student in students])
+
+    def score(self, group):
+        responses_set = {}
+        n_total_responses = 0
+        for student in group.students:
+            for option in self.selections[student.index]:
+                responses_set[option] = responses_set.get(option, 0) + 1
+                n_total_responses += 1
+        squared_sum = 0
+        for response_count in responses_set.values():
+            if response_count > 1:
+                squared_sum += response_count*response_count
+
+        n_options = len(responses_set)
+        res = max(0, 1 - (1/(n_options*n_total_responses))*squared_sum)
+        return res*self.weight
+
+    # Statistics: [count of each option, total selections, options selected,
+    #              sum of squared counts over options selected more than once]
+    def new_stats(self):
+        return [[0]*len(self.options), 0, 0, 0]
+
+    def add(self, stats, row):
+        counts = stats[0]
+        for option in self.selections[row]:
+            count = counts[option]
+            if count == 0:
+                stats[2] += 1
+            elif count == 1:
+                stats[3] += 4
+            else:
+                stats[3] += 2*count + 1
+            counts[option] = count + 1
+        stats[1] += len(self.selections[row])
+
+    def remove(self, stats, row):
+        counts = stats[0]
+        for option in self.selections[row]:
+            count = counts[option]
+            if count == 1:
+                stats[2] -= 1
+            elif count == 2:
+                stats[3] -= 4
+            else:
+                stats[3] -= 2*count - 1
+            counts[option] = count - 1
+        stats[1] -= len(self.selections[row])
+
+    def swap_score(self, stats, out_row, in_row, size, n_members):
+        changes = {}
+        for option in self.selections[out_row]:
+            changes[option] = changes.get(option, 0) - 1
+        for option in self.selections[in_row]:
+            changes[option] = changes.get(option, 0) + 1
+
+        counts = stats[0]
+        n_options = stats[2]
+        squared_sum = stats[3]
+        for option, change in changes.items():
+            if change:
+                old = counts[option]
+                new = old + change
+                n_options += (new > 0) - (old > 0)
+                squared_sum += (new*new if new > 1 else 0) - (old*old if old > 1 else 0)
+        n_total_responses = stats[1] - len(self.selections[out_row]) + len(self.selections[in_row])
+
+        res = max(0, 1 - (1/(n_options*n_total_responses))*squared_sum)
+        return res*self.weight
+
+    def upper_bound(self, rows, shapes):
+        # Scores lie between 0 and the weight
+        return max(0, self.weight)*sum(1 for (n_members, size) in shapes if n_members)
+
+    # Cached as a table of the distinct selections, flattened, and the
+    # position of each student's selection in the table
+    def cache_fields(self):
+        table = {}
+        ids = [table.setdefault(selection, len(table)) for selection in self.selections]
+        offsets = [0]
+        for selection in table:
+            offsets.append(offsets[-1] + len(selection))
+        flat = [option for selection in table for option in selection]
+        return ({"options": list(self.options)}, {"ids": ids, "offsets": offsets, "flat": flat})
+
+    def load_cache(self, fields, arrays):
+        self.options = {option: code for code, option in enumerate(fields["options"])}
+        (offsets, flat) = (arrays["offsets"], arrays["flat"])
+        table = [tuple(flat[offsets[i]:offsets[i + 1]]) for i in range(len(offsets) - 1)]
+        self.selections = [table[i] for i in arrays["ids"]]
+
+    def vectorize(self):
+        # Option counts rather than bitmasks, since a selection repeated in an
+        # answer counts once per repetition in score()
+        self.count_array = np.zeros((len(self.selections), max(1, len(self.options))), dtype=np.int64)
+        lengths = np.fromiter(map(len, self.selections), dtype=np.int64, count=len(self.selections))
+        rows = np.repeat(np.arange(len(self.selections)), lengths)
+        options = np.fromiter(itertools.chain.from_iterable(self.selections), dtype=np.int64,
+                            count=int(lengths.sum()))
+        np.add.at(self.count_array, (rows, options), 1)
+
+    def score_batch(self, members, sizes):
+        counts = self.count_array[members].sum(axis=1)
+        n_total_responses = counts.sum(axis=1)
+        n_options = np.count_nonzero(counts, axis=1)
+        squared_sum = np.where(counts > 1, counts*counts, 0).sum(axis=1)
+        res = np.maximum(0, 1 - (1/(n_options*n_total_responses))*squared_sum)
+        return res*self.weight
+
+    def swap_matrix(self, stats, out_rows, in_rows, size, n_members):
+        out_counts = self.count_array[out_rows]
+        in_counts = self.count_array[in_rows]
+        counts = np.asarray(stats[0], dtype=np.int64).reshape(-1)[None, None, :] \
+                - out_counts[:, None, :] + in_counts[None, :, :]
+        n_total_responses = stats[1] - out_counts.sum(axis=1)[:, None] + in_counts.sum(axis=1)[None, :]
+        n_options = np.count_nonzero(counts, axis=2)
+        squared_sum = np.where(counts > 1, counts*counts, 0).sum(axis=2)
+        res = np.maximum(0, 1 - (1/(n_options*n_total_responses))*squared_sum)
+        return res*self.weight
+
+class SchedulingColumn(Column):
+    '''
+    Scheduling question, encoded as a bitmask of the blocks each student is busy
+    Scores the share of blocks every member of a group has free
+    '''
+    incremental = True
+    vectorizable = True
+
+    def __init__(self, question, weight, assigner):
+        super(SchedulingColumn, self).__init__(question, weight, assigner)
+        self.n_blocks = len(assigner.blocks)
+        self.bits = block_bits(assigner.blocks)
+        self.delimiter = assigner.check_delimiter
+        self.masks = []
+
+    def extend(self, students):
+        question = self.question
+        self.masks.extend([block_mask(student.answers[question], self.bits, self.delimiter)
+                            for student in students])
+
+    def score(self, group):
+        busy = 0
+        for student in group.students:
+            busy |= self.masks[student.index]
+        scheduling = self.n_blocks - popcount(busy)
+        return abs(self.weight)*(scheduling/self.n_blocks)
+
+    # Statistics: [number of members busy in each block, mask of blocks with
+    #              at least one busy member, mask of blocks with exactly one]
+    def new_stats(self):
+        return [[0]*self.n_blocks, 0, 0]
+
+    def add(self, stats, row):
+        tally = stats[0]
+        mask = self.masks[row]
+        while mask:
+            bit = mask & -mask
+            mask ^= bit
+            block = bit.bit_length() - 1
+            tally[block] += 1
+            if tally[block] == 1:
+                stats[1] |= bit
+                stats[2] |= bit
+            elif tally[block] == 2:
+                stats[2] &= ~bit
+
+    def remove(self, stats, row):
+        tally = stats[0]
+        mask = self.masks[row]
+        while mask:
+            bit = mask & -mask
+            mask ^= bit
+            block = bit.bit_length() - 1
+            tally[block] -= 1
+            if tally[block] == 0:
+                stats[1] &= ~bit
+                stats[2] &= ~bit
+            elif tally[block] == 1:
+                stats[2] |= bit
+
+    def swap_score(self, stats, out_row, in_row, size, n_members):
+        # Blocks only the leaving member was busy in become free
+        busy = (stats[1] & ~(self.masks[out_row] & stats[2])) | self.masks[in_row]
+        scheduling = self.n_blocks - popcount(busy)
+        return abs(self.weight)*(scheduling/self.n_blocks)
+
+    def upper_bound(self, rows, shapes):
+        # A group is busy at least whenever its busiest member is. Taking the
+        # busiest students in turn, the first group gets the busiest and each
+        # next group's busiest member comes after the previous group's members,
+        # which sets as late a member as possible busiest when larger groups go first
+        busy = sorted((popcount(self.masks[row]) for row in rows), reverse=True)
+        position = 0
+        free = 0
+        for n_members in sorted((n_members for (n_members, size) in shapes if n_members), reverse=True):
+            free += self.n_blocks - busy[position]
+            position += n_members
+        return abs(self.weight)*(free/self.n_blocks)
+
+    # Cached as a table of the distinct masks, which may be wider than 64
+    # bits, and the position of each student's mask in the table
+    def cache_fields(self):
+        table = {}
+        ids = [table.setdefault(mask, len(table)) for mask in self.masks]
+        return ({"masks": list(table)}, {"ids": ids})
+
+    def load_cache(self, fields, arrays):
+        table = fields["masks"]
+        self.masks = [table[i] for i in arrays["ids"]]
+
+    def vectorize(self):
+        # Unpacks the masks 63 blocks at a time
+        self.busy_array = np.zeros((len(self.masks), self.n_blocks), dtype=bool)
+        for start in range(0, self.n_blocks, 63):
+            words = np.fromiter(((mask >> start) & (2**63 - 1) for mask in self.masks),
+                                dtype=np.int64, count=len(self.masks))
+            bits = np.arange(min(63, self.n_blocks - start), dtype=np.int64)
+            self.busy_array[:, start:start + len(bits)] = (words[:, None] >> bits[None, :]) & 1
+        # Bitmasks packed into bytes, so a group's busy blocks are the OR of its members' rows
+        self.packed_array = np.packbits(self.busy_array, axis=1)
+        self.byte_popcount = np.array([popcount(byte) for byte in range(256)], dtype=np.int64)
+
+    def score_batch(self, members, sizes):
+        busy = np.bitwise_or.reduce(self.packed_array[members], axis=1)
+        scheduling = self.n_blocks - self.byte_popcount[busy].sum(axis=1)
+        return abs(self.weight)*(scheduling/self.n_blocks)
+
+    def swap_matrix(self, stats, out_rows, in_rows, size, n_members):
+        tally = np.asarray(stats[0], dtype=np.int64)[None, None, :] \
+                - self.busy_array[out_rows][:, None, :] + self.busy_array[in_rows][None, :, :]
+        scheduling = self.n_blocks - np.count_nonzero(tally, axis=2)
+        return abs(self.weight)*(scheduling/self.n_blocks)
+
+class IsolationColumn(Column):
+    '''
+    Isolation question, encoded as whether each student holds a non-majority answer
+    Penalizes a group with exactly one non-majority member, and a third as
+    much for exactly two in a group of more than four
+    '''
+    incremental = True
+    vectorizable = True
+
+    def __init__(self, question, weight, assigner):
+        super(IsolationColumn, self).__init__(question, weight, assigner)
+        self.majority = assigner.majority_opt[question]
+        self.minority = []
+
+    def extend(self, students):
+        question = self.question
+        majority = self.majority
+        self.minority.extend([int(student.answers[question] != majority) for student in students])
+
+    def score(self, group):
+        iso_counter = 0
+        for student in group.students:
+            iso_counter += self.minority[student.index]
+        if iso_counter == 1:
+            return -self.weight
+        elif len(group.students) > 4 and iso_counter == 2:
+            return -self.weight/3
+        else:
+            return 0
+
+    # Statistics: [number of non-majority members]
+    def new_stats(self):
+        return [0]
+
+    def add(self, stats, row):
+        stats[0] += self.minority[row]
+
+    def remove(self, stats, row):
+        stats[0] -= self.minority[row]
+
+    def swap_score(self, stats, out_row, in_row, size, n_members):
+        iso_counter = stats[0] - self.minority[out_row] + self.minority[in_row]
+        if iso_counter == 1:
+            return -self.weight
+        elif n_members > 4 and iso_counter == 2:
+            return -self.weight/3
+        else:
+            return 0
+
+    def upper_bound(self, rows, shapes):
+        if self.weight >= 0: # Only penalties
+            return 0
+        # A bonus for a negative weight, at most -weight per group with a non-majority member
+        groups = sum(1 for (n_members, size) in shapes if n_members)
+        return -self.weight*min(groups, sum(self.minority[row] for row in rows))
+
+    def cache_fields(self):
+        return ({}, {"minority": self.minority})
+
+    def load_cache(self, fields, arrays):
+        self.minority = arrays["minority"]
+
+    def vectorize(self):
+        self.minority_array = np.array(self.minority, dtype=np.int64)
+
+    def score_batch(self, members, sizes):
+        iso_counter = self.minority_array[members].sum(axis=1)
+        n_members = members.shape[1]
+        penalty = np.zeros(len(members))
+        if n_members > 4:
+            penalty[iso_counter == 2] = -self.weight/3
+        penalty[iso_counter == 1] = -self.weight
+        return penalty
+
+    def swap_matrix(self, stats, out_rows, in_rows, size, n_members):
+        iso_counter = stats[0] - self.minority_array[out_rows][:, None] + self.minority_array[in_rows][None, :]
+        penalty = np.zeros(iso_counter.shape)
+        if n_members > 4:
+            penalty[iso_counter == 2] = -self.weight/3
+        penalty[iso_counter == 1] = -self.weight
+        return penalty
+
+class RestrictiveColumn(Column):
+    '''
+    Restrictive question, encoded as the choices each student selected and the
+    answers each student gave to the associated question
+    Penalizes a group once for each associated answer of a member that a
+    member of the group selected
+    '''
+    def __init__(self, question, weight, assigner):
+        super(RestrictiveColumn, self).__init__(question, weight, assigner)
+        if question not in assigner.restrictive_questions:
+            raise ValueError("No associated question provided for restrictive question \"{}\".".format(question))
+        self.associated_question = assigner.restrictive_questions[question]
+        self.delimiter = assigner.check_delimiter
+        self.choices = []
+        self.items = []
+
+    def extend(self, students):
+        delimiter = self.delimiter
+        self.choices.extend([student.answers[self.question].split(delimiter) for student in students])
+        self.items.extend([student.answers[self.associated_question].split(delimiter)
+                            for student in students])
+
+    def score(self, group):
+        student_choices = set()
+        for student in group.students:
+            student_choices.update(self.choices[student.index])
+
+        penalty = 0
+        for student in group.students:
+            for item in self.items[student.index]:
+                if item in student_choices:
+                    penalty -= self.weight
+        return penalty
+
+    def upper_bound(self, rows, shapes):
+        if self.weight >= 0: # Only penalties
+            return 0
+        # A bonus for a negative weight, at most -weight per associated answer
+        return -self.weight*sum(len(self.items[row]) for row in rows)
+
+# Registry linking each question type to the column class which encodes and scores it
+QUESTION_TYPES = {}
+
+def register_question_type(q_type: str, column_class: Type[Column]):
+    '''
+    Registers the column class used to encode and score a question type,
+    replacing any class previously registered for the type. Questions of
+    unregistered types are not scored.
+    Args:
+        q_type: str, question type as given in question_types, e.g. "(Checkbox Question)"
+        column_class: Subclass of Column
+    '''
+    QUESTION_TYPES[q_type] = column_class
+
+register_question_type(MULTIPLE_CHOICE, ChoiceColumn)
+register_question_type(CHECKBOX, CheckboxColumn)
+register_question_type(SCHEDULING, SchedulingColumn)
+register_question_type(ISOLATION, IsolationColumn)
+register_question_type(RESTRICTIVE, RestrictiveColumn)
+
+class ColumnEncoding:
+    '''
+    Columnar encoding of every scored question for a list of students
+
+    Attributes:
+        columns: List of encoded columns, in question order
+        by_question: Dict linking each encoded question to its column
+        incremental: True if every column supports running group statistics
+        vectorized: True once numpy arrays have been built
+    '''
+    def __init__(self, students: List[Any], assigner: Any):
+        '''
+        Encodes student responses to every question of a registered type.
+        Students must be ordered by their row index.
+        Args:
+            students: List[Student], students to encode, more may be added with extend()
+            assigner: GroupAssign, provides the questions, their types and weights
+        '''
+        self.n_students = 0
+        self.columns = []
+        self.vectorized = False
+
+        for question in assigner.questions:
+            column_class = QUESTION_TYPES.get(assigner.question_types[question])
+            if column_class is not None:
+                self.columns.append(column_class(question, assigner.question_weights[question], assigner))
+        self.by_question = {column.question: column for column in self.columns}
+        self.incremental = all(column.incremental for column in self.columns)
+        self.extend(students)
+
+    def extend(self, students: List[Any]):
+        '''
+        Encodes the responses of the next students in row order
+        Args:
+            students: List[Student], students whose rows follow those already encoded
+        '''
+        for column in self.columns:
+            column.extend(students)
+        self.n_students += len(students)
+
+    def group_stats(self, rows: List[int]) -> List[List[Any]]:
+        '''
+        Builds running statistics for a group
+        Args:
+            rows: Student row indices of the group members
+        Returns:
+            List of statistics, one per column
+        '''
+        stats = []
+        for column in self.columns:
+            column_stats = column.new_stats()
+            for row in rows:
+                column.add(column_stats, row)
+            stats.append(column_stats)
+        return stats
+
+    def move(self, stats: List[List[Any]], out_row: int, in_row: int):
+        '''
+        Updates a group's statistics for one member being replaced by another student
+        Args:
+            stats: Running statistics of the group
+            out_row: Row index of the member leaving the group
+            in_row: Row index of the student joining the group
+        '''
+        for column, column_stats in zip(self.columns, stats):
+            column.remove(column_stats, out_row)
+            column.add(column_stats, in_row)
+
+    def swap_score(self, stats: List[List[Any]], out_row: int, in_row: int, size: int, n_members: int) -> float:
+        '''
+        Scores a group as if one member were replaced by another student
+        Args:
+            stats: Running statistics of the group
+            out_row: Row index of the member leaving the group
+            in_row: Row index of the student joining the group
+            size: Group.size of the group
+            n_members: Number of students in the group
+        Returns:
+            float, score of the resulting group, equal to GroupAssign.score_group()
+        '''
+        scores = 0
+        for column, column_stats in zip(self.columns, stats):
+            scores += column.swap_score(column_stats, out_row, in_row, size, n_members)
+        return scores
+
+    def swap_matrix(self, stats: List[List[Any]], out_rows: List[int], in_rows: List[int],
+                    size: int, n_members: int):
+        '''
+        Scores a group for every pairing of a leaving member and a joining student
+        Requires vectorize()
+        Args:
+            stats: Running statistics of the group
+            out_rows: Row indices of the members that may leave the group
+            in_rows: Row indices of the students that may join the group
+            size: Group.size of the group
+            n_members: Number of students in the group
+        Returns:
+            ndarray of shape (len(out_rows), len(in_rows)), where entry (i, j)
+            equals swap_score(stats, out_rows[i], in_rows[j], size, n_members)
+        '''
+        out_rows = np.asarray(out_rows, dtype=np.int64)
+        in_rows = np.asarray(in_rows, dtype=np.int64)
+        scores = np.zeros((len(out_rows), len(in_rows)))
+        for column, column_stats in zip(self.columns, stats):
+            scores += column.swap_matrix(column_stats, out_rows, in_rows, size, n_members)
+        return scores
+
+    def vectorize(self):
+        '''
+        Builds numpy arrays for every column
+        Raises:
+            ImportError: If numpy is not installed
+            ValueError: If a scored question type cannot be encoded
+        '''
+        if np is None:
+            raise ImportError("The numpy engine requires numpy to be installed.")
+        for column in self.columns:
+            if not (column.vectorizable and column.incremental):
+                raise ValueError("Question \"{}\" is not supported by the numpy engine.".format(column.question))
+        for column in self.columns:
+            column.vectorize()
+        self.vectorized = True
+
+    def score_batch(self, members: List[List[int]], sizes: Union[int, List[int]]):
+        '''
+        Scores many groups with the same number of members
+        Args:
+            members: Student row indices of each group, one row per group
+            sizes: Group.size of each group, or one size shared by all groups
+        Returns:
+            ndarray, score of each group, equal to GroupAssign.score_group()
+        '''
+        members = np.asarray(members, dtype=np.int64).reshape(len(members), -1)
+        sizes = np.broadcast_to(np.asarray(sizes, dtype=np.int64), (len(members),))
+        scores = np.zeros(len(members))
+        for column in self.columns:
+            scores += column.score_batch(members, sizes)
+        return scores
+
+    def score_members(self, members: List[int], size: int) -> float:
+        '''
+        Scores a single group
+        Args:
+            members: Student row indices of the group
+            size: Group.size of the group
+        Returns:
+            float, score for the group
+        '''
+        return float(self.score_batch([members], size)[0])
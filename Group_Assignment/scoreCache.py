@@ -0,0 +1,82 @@
+# Bounded least-recently-used cache of group scores for the Group Assignment Tool
+
+from collections import OrderedDict
+from typing import *
+
+class ScoreCache:
+    '''
+    Size-bounded cache of group scores with least-recently-used eviction
+
+    Attributes:
+        maxsize: Maximum number of scores held, the least recently used are evicted beyond it
+        hits: Number of lookups which found a score
+        misses: Number of lookups which did not
+    '''
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.scores = OrderedDict()
+
+    @staticmethod
+    def key(rows: Iterable[int], size: int) -> Tuple[int, ...]:
+        '''
+        Builds the cache key of a group
+        Args:
+            rows: Student row indices of the group members
+            size: Group.size of the group, which multiple choice scores depend on
+        Returns:
+            Hashable key for the group, its sorted rows followed by its size.
+            A tuple of ints takes under a third of the memory of a frozenset, and is
+            untracked by the garbage collector once it has been checked
+        '''
+        key = sorted(rows)
+        key.append(size)
+        return tuple(key)
+
+    def get(self, key: Hashable) -> Optional[float]:
+        '''
+        Looks up a score, marking it as most recently used
+        Args:
+            key: Group key, from key()
+        Returns:
+            float, the cached score, or None if not cached
+        '''
+        score = self.scores.get(key)
+        if score is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.scores.move_to_end(key)
+        return score
+
+    def put(self, key: Hashable, score: float):
+        '''
+        Stores the score of a group not yet cached, evicting the least
+        recently used score if full
+        Args:
+            key: Group key, from key()
+            score: float, score of the group
+        '''
+        self.scores[key] = score # New keys go last, as the most recently used
+        if len(self.scores) > self.maxsize:
+            self.scores.popitem(last=False)
+
+    def clear(self):
+        '''
+        Removes every score and resets hit and miss counts
+        '''
+        self.scores.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def hit_rate(self) -> float:
+        '''
+        Returns:
+            float, fraction of lookups which found a score, 0 if none were made
+        '''
+        lookups = self.hits + self.misses
+        return self.hits/lookups if lookups else 0
+
+    def __len__(self) -> int:
+        return len(self.scores)
@@ -0,0 +1,92 @@
+# Indexed group scores for the Group Assignment Tool
+# Tournament trees over a list of groups give the lowest and highest scoring
+# groups, and a running total gives the class score, each kept up to date in
+# O(log G) per changed group rather than rescanning every group per swap
+
+from typing import *
+
+from Group_Assignment.courseElements import Group
+
+class ScoreIndex:
+    '''
+    Minimum and maximum tournament trees and running total over group scores.
+    Ties go to the group earliest in the list, as in a linear scan
+
+    Attributes:
+        groups: List of indexed groups
+        positions: Dict of each group to its position in groups
+        scores: List of the indexed score of each group
+        total: Sum of the indexed scores
+    '''
+    def __init__(self, groups: List[Group]):
+        self.groups = groups
+        self.positions = {group: position for position, group in enumerate(groups)}
+        self.scores = [group.score for group in groups]
+
+        # Summed in list order, as iterate_normal() always has
+        self.total = 0
+        for score in self.scores:
+            self.total += score
+
+        # Leaves hold group positions, -1 past the last group; each internal node
+        # holds the winning position of its subtree, node 1 the overall winner
+        size = 1
+        while size < len(groups):
+            size *= 2
+        self.size = size
+        leaves = list(range(len(groups))) + [-1]*(size - len(groups))
+        self.min_tree = [-1]*size + leaves
+        self.max_tree = [-1]*size + leaves
+        for node in range(size - 1, 0, -1):
+            self.min_tree[node] = self.lower(self.min_tree[2*node], self.min_tree[2*node + 1])
+            self.max_tree[node] = self.higher(self.max_tree[2*node], self.max_tree[2*node + 1])
+
+    def lower(self, left: int, right: int) -> int:
+        '''
+        Gets the position with the lower score, left on ties, ignoring -1
+        '''
+        if right < 0:
+            return left
+        if left < 0:
+            return right
+        return left if self.scores[left] <= self.scores[right] else right
+
+    def higher(self, left: int, right: int) -> int:
+        '''
+        Gets the position with the higher score, left on ties, ignoring -1
+        '''
+        if right < 0:
+            return left
+        if left < 0:
+            return right
+        return left if self.scores[left] >= self.scores[right] else right
+
+    def update(self, group: Group):
+        '''
+        Re-indexes a group after its score changed
+        Args:
+            group: Group, an indexed group
+        '''
+        position = self.positions[group]
+        self.total += group.score - self.scores[position]
+        self.scores[position] = group.score
+
+        min_tree = self.min_tree
+        max_tree = self.max_tree
+        node = (self.size + position)//2
+        while node:
+            min_tree[node] = self.lower(min_tree[2*node], min_tree[2*node + 1])
+            max_tree[node] = self.higher(max_tree[2*node], max_tree[2*node + 1])
+            node //= 2
+
+    def min_group(self) -> Group:
+        '''
+        Gets the lowest scoring group, the earliest in the list on ties
+        '''
+        return self.groups[self.min_tree[1]]
+
+    def max_group(self) -> Group:
+        '''
+        Gets the highest scoring group, the earliest in the list on ties
+        '''
+        return self.groups[self.max_tree[1]]
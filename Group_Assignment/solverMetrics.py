@@ -0,0 +1,118 @@
+# Solver instrumentation for the Group Assignment Tool
+# A SolverMetrics attached to a GroupAssign counts score evaluations, swaps,
+# cache lookups, and restarts, times each solver phase, and streams progress
+# records to an optional callback. Without one attached, the solver only pays
+# for a None check at each instrumented point
+
+import time
+from contextlib import contextmanager
+from typing import *
+
+# Counter attributes, in the order they are reported
+COUNTERS = ("score_evaluations", "greedy_swaps", "random_swaps", "accepted_swaps",
+            "cache_hits", "cache_misses", "restarts", "anneal_moves", "anneal_accepted",
+            "polish_moves")
+
+class SolveCancelled(Exception):
+    '''
+    Raised by a progress callback to stop the solve in progress
+    '''
+
+class SolverMetrics:
+    '''
+    Counters, phase timers, and progress callback of a GroupAssign
+
+    Attributes:
+        score_evaluations: Number of group scores computed, including the
+            candidate scores of swap searches
+        greedy_swaps: Number of greedy swap attempts
+        random_swaps: Number of random swaps
+        accepted_swaps: Number of greedy swap attempts which improved the score
+        cache_hits: Number of group scores found in the score cache
+        cache_misses: Number of group scores not found in the score cache
+        restarts: Number of anytime_run() restarts
+        anneal_moves: Number of anneal() moves
+        anneal_accepted: Number of anneal() moves which were kept
+        polish_moves: Number of polish() moves made
+        phases: Dict of seconds spent in each phase ("load", "init", "search", "polish", "output")
+        callback: Optional callable, receives a progress record (see report()),
+            and may raise SolveCancelled to stop the solve
+    '''
+    def __init__(self, callback: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.callback = callback
+        self.reset()
+
+    def reset(self):
+        '''
+        Zeroes every counter and phase timer
+        '''
+        for counter in COUNTERS:
+            setattr(self, counter, 0)
+        self.phases = {}
+        self.start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        '''
+        Times a block, adding its duration to the named phase
+        Args:
+            name: str, phase name
+        '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + time.perf_counter() - start
+
+    def counters(self) -> Dict[str, int]:
+        '''
+        Gets the current counter values
+        Returns:
+            Dict of counter names to values
+        '''
+        return {counter: getattr(self, counter) for counter in COUNTERS}
+
+    def merge(self, other: 'SolverMetrics'):
+        '''
+        Adds the counters and phase times of another SolverMetrics, e.g. from a worker process
+        Args:
+            other: SolverMetrics to add
+        '''
+        for counter in COUNTERS:
+            setattr(self, counter, getattr(self, counter) + getattr(other, counter))
+        for (name, seconds) in other.phases.items():
+            self.phases[name] = self.phases.get(name, 0) + seconds
+
+    def report(self, event: str, **fields):
+        '''
+        Sends a progress record to the callback, if one is set. The record
+        holds the event name, seconds since the metrics were reset, the given
+        fields (e.g. iteration and score), and the current counter values
+        Args:
+            event: str, what the record reports, e.g. "search" or "restart"
+            fields: Additional values of the record
+        '''
+        if self.callback is None:
+            return
+        record = {"event": event, "elapsed": time.perf_counter() - self.start}
+        record.update(fields)
+        record.update(self.counters())
+        self.callback(record)
+
+    def summary(self) -> Dict[str, Any]:
+        '''
+        Gets counters, phase times, and derived rates
+        Returns:
+            Dict of counter values, "phases", and "cache_hit_rate"
+        '''
+        summary = self.counters()
+        summary["phases"] = dict(self.phases)
+        lookups = self.cache_hits + self.cache_misses
+        summary["cache_hit_rate"] = self.cache_hits/lookups if lookups else 0.0
+        return summary
+
+    def __getstate__(self):
+        # Callbacks are often closures or bound to GUI objects, which do not pickle
+        state = self.__dict__.copy()
+        state["callback"] = None
+        return state
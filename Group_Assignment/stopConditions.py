@@ -0,0 +1,71 @@
+# Stop conditions for GroupAssign.run_until()
+# Each function builds a callable which takes a Progress record from
+# GroupAssign.solve_steps() and returns True once the search should stop
+
+import time
+from typing import *
+
+from Group_Assignment.courseElements import Progress
+
+def target_score(score: float) -> Callable[[Progress], bool]:
+    '''
+    Stops once the best class score reaches score
+    '''
+    return lambda progress: progress.best >= score
+
+def plateau(steps: int, min_gain: Optional[float] = 0) -> Callable[[Progress], bool]:
+    '''
+    Stops once the best class score has not improved by more than min_gain
+    over steps consecutive progress records
+    Args:
+        steps: int, number of progress records without improvement to allow
+        min_gain: Optional float, smallest improvement which counts
+    '''
+    state = {"best": None, "since": 0}
+
+    def stalled(progress: Progress) -> bool:
+        if state["best"] is None or progress.best > state["best"] + min_gain:
+            state["best"] = progress.best
+            state["since"] = 0
+        else:
+            state["since"] += 1
+        return state["since"] >= steps
+    return stalled
+
+def deadline(seconds: float) -> Callable[[Progress], bool]:
+    '''
+    Stops once seconds of wall-clock time have passed since the condition was built
+    '''
+    end = time.time() + seconds
+    return lambda progress: time.time() >= end
+
+def solve_time(seconds: float) -> Callable[[Progress], bool]:
+    '''
+    Stops once the search has spent seconds solving in total, excluding pauses
+    '''
+    return lambda progress: progress.elapsed >= seconds
+
+def max_iterations(iterations: int) -> Callable[[Progress], bool]:
+    '''
+    Stops once iterations swap attempts have been made in total
+    '''
+    return lambda progress: progress.iteration >= iterations
+
+def converged() -> Callable[[Progress], bool]:
+    '''
+    Stops once the current run's score has stopped improving, as iterate_normal() does
+    '''
+    return lambda progress: progress.converged
+
+def within_gap(assigner: Any, tolerance: float) -> Callable[[Progress], bool]:
+    '''
+    Stops once the best class score is within tolerance of the assigner's upper
+    bound, see GroupAssign.optimality_gap(). Never stops if there is no bound
+    Args:
+        assigner: GroupAssign running the search
+        tolerance: float, relative gap to stop at, e.g. .01 for 1%
+    '''
+    def close(progress: Progress) -> bool:
+        gap = assigner.optimality_gap(progress.best)
+        return gap is not None and gap <= tolerance + 1e-9 # allows for rounding
+    return close
@@ -7,4 +7,5 @@ pip install -q --upgrade pip
 pip install -q -I Cython==0.28.2
 pip install -q kivy==1.10.1
 pip install -q typing
+pip install -q numpy
 echo "Ready to go!"
@@ -4,6 +4,7 @@
 # For submission to the Kemeny Prize
 
 from Group_Assignment.groupAssignmentTool import GroupAssign
+from Group_Assignment.backgroundSolve import BackgroundSolve
 import csv
 import os
 from typing import *
@@ -127,6 +128,9 @@ class ResultScreen(Screen):
         assigner: Holds the GroupAssign object
         dest_csv: Holds the CSV to write to
         last_overwrite: Tracks if a user wishes to overwrite an existing file
+        solve: Holds the BackgroundSolve in progress, None when not solving
+        poll_event: Clock event polling the solve in progress
+        opt_comp: Whether the solve in progress compares against optimal groups
 
     '''
     def __init__(self, q_list: List[Question], param_screen: ParamScreen, **kwargs):
@@ -136,12 +140,16 @@ class ResultScreen(Screen):
         self.assigner = None
         self.dest_csv = None
         self.last_overwrite = None
+        self.solve = None
+        self.poll_event = None
+        self.opt_comp = False
 
 
     def process_dataset(self, dt: float):
         '''
         Evaluates question parameters and assignment parameters
-        Creates and uses a GroupAssign object to assign groups
+        Starts assigning groups with a GroupAssign object in a background
+        process, which poll_solve() then follows
 
         Args:
             dt: seconds since call was scheduled, required by kivy clock scheduling
@@ -169,17 +177,87 @@ class ResultScreen(Screen):
             dataset_file = 'data/c6_s_117.csv'
             assert (os.path.isfile(dataset_file)), "File " + dataset_file + " not found!"
 
-        assigner = GroupAssign(dataset_file, q_weights, q_types, question_opts = q_opts,
-                            per_group = per_group, n_iter=n_iter, combos=combos,
-                            timelimit=timelimit, mode = mode, select_size = c_size,
-                            optimal_comp = opt_comp)
+        if self.solve: # Discard a previous solve still in progress
+            self.stop_solve()
+        self.assigner = None
+        self.opt_comp = opt_comp
+        self.ids.result_label.text = "Processing results..."
+        self.ids.opt_label.text = ''
+        self.ids.result_box.text = ''
+
+        self.solve = BackgroundSolve((dataset_file, q_weights, q_types),
+                                    dict(question_opts = q_opts, per_group = per_group,
+                                        n_iter=n_iter, combos=combos, timelimit=timelimit,
+                                        mode = mode, select_size = c_size,
+                                        optimal_comp = opt_comp, cache_dir = 'data/cache'))
+        self.ids.cancel_button.disabled = False
+        self.poll_event = Clock.schedule_interval(self.poll_solve, .1)
+
+    def poll_solve(self, dt: float):
+        '''
+        Shows progress messages of the solve in progress, and its results once done
+        Args:
+            dt: seconds since call was scheduled, required by kivy clock scheduling
+        '''
+        if not self.solve:
+            return
+
+        for (kind, value) in self.solve.poll():
+            if kind == "progress":
+                text = "Current class score: {:.2f}".format(value["score"])
+                if value["best"] is not None:
+                    text += " (best {:.2f})".format(value["best"])
+                text += "\n{} swaps, {:.0f}s elapsed".format(value["swaps"], value["elapsed"])
+                if self.solve.cancel_time is not None:
+                    text += "\nCancelling..."
+                self.ids.result_label.text = text
+            elif kind == "done":
+                self.stop_solve()
+                (sc, cancelled, assigner) = value
+                self.show_results(sc, cancelled, assigner)
+                return
+            elif kind == "error":
+                self.stop_solve()
+                self.ids.result_label.text = "Assignment failed: " + value
+                return
+
+        if self.solve.cancel_overdue(): # Still loading or initializing, so nothing to keep
+            self.stop_solve()
+            self.ids.result_label.text = "Cancelled before any groups were formed."
+
+    def cancel_solve(self):
+        '''
+        Stops the solve in progress, keeping the best groups found so far
+        '''
+        if self.solve:
+            self.solve.cancel()
+            self.ids.result_label.text += "\nCancelling..."
+            self.ids.cancel_button.disabled = True
 
-        if mode == "Strong":
-            sc = assigner.iterate_normal(visible=False)
+    def stop_solve(self):
+        '''
+        Stops following the solve in progress and ends its process
+        '''
+        if self.poll_event:
+            self.poll_event.cancel()
+            self.poll_event = None
+        if self.solve:
+            self.solve.terminate()
+            self.solve = None
+        self.ids.cancel_button.disabled = True
+
+    def show_results(self, sc: float, cancelled: bool, assigner: GroupAssign):
+        '''
+        Displays the groups of a finished or cancelled solve
+        Args:
+            sc: Final class score
+            cancelled: Whether the solve was cancelled
+            assigner: GroupAssign object holding the resulting groups
+        '''
+        if cancelled:
+            self.ids.result_label.text = "Cancelled, best class score: {:.2f}".format(sc)
         else:
-            sc = assigner.anytime_run()
-
-        self.ids.result_label.text = "Final class score: {:.2f}".format(sc)
+            self.ids.result_label.text = "Final class score: {:.2f}".format(sc)
 
         result_groups = ""
         for group in assigner.class_state.groups:
@@ -191,7 +269,7 @@ class ResultScreen(Screen):
 
         self.ids.result_box.text = result_groups
 
-        if opt_comp:
+        if self.opt_comp:
             opt_text = 'Maximum Score: ' + str(assigner.opt_score) + "\n"
             noptimal = len([group for group in assigner.class_state.groups if group.score == assigner.opt_score])
             opt_text += str(noptimal) + ' of ' + (str(len(assigner.class_state.groups))) \
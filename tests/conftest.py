@@ -0,0 +1,51 @@
+# Shared fixtures of the Group Assignment Tool tests
+
+import os
+import csv
+import random
+
+import pytest
+
+from Group_Assignment.groupAssignmentTool import GroupAssign
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+QUESTION_FILE = os.path.join(DATA, "qtypes.csv")
+RESPONSES = os.path.join(DATA, "c6_s_117.csv")
+
+def load_questions(seed: int):
+    '''
+    Reads the demo questions, weighting them at random
+    Returns:
+        Tuple of question weights, question types, and question options dictionaries
+    '''
+    with open(QUESTION_FILE, newline='') as qtypes_file:
+        (questions, types, options) = list(csv.reader(qtypes_file))[:3]
+    rng = random.Random(seed)
+    question_weights = {}
+    question_types = {}
+    question_opts = {}
+    for (question, question_type, opts) in zip(questions, types, options):
+        question_types[question] = question_type
+        question_opts[question] = opts.split(";")
+        if question_type == "(Identification Question)":
+            question_weights[question] = 0
+        else:
+            question_weights[question] = rng.choice([-1, 1])*rng.uniform(.5, 3)
+    return (question_weights, question_types, question_opts)
+
+@pytest.fixture
+def make_assigner():
+    '''
+    Builds seeded assigners over the demo survey, or over generated classes
+    with known optimal groups when student_csv is None
+    '''
+    def make(engine: str = "python", seed: int = 0, per_group: int = 5,
+             student_csv: str = RESPONSES, mode: str = "Random", select_size: int = 0,
+             **kwargs) -> GroupAssign:
+        (question_weights, question_types, question_opts) = load_questions(seed)
+        random.seed(seed)
+        return GroupAssign(student_csv, question_weights, question_types,
+                           question_opts=question_opts, per_group=per_group, mode=mode,
+                           engine=engine, select_size=select_size,
+                           optimal_comp=student_csv is None, **kwargs)
+    return make
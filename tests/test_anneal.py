@@ -0,0 +1,38 @@
+# Tests of anneal(): the best groups found are restored, with scores matching
+# a fresh scoring of the class
+
+import pytest
+
+from Group_Assignment.solverMetrics import SolverMetrics
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+@pytest.mark.parametrize("seed", [0, 1])
+def test_anneal_returns_best_state_and_score(make_assigner, engine, seed):
+    if engine == "numpy":
+        pytest.importorskip("numpy")
+    reports = []
+    assigner = make_assigner(engine=engine, seed=seed, mode="Anneal",
+                             metrics=SolverMetrics(callback=reports.append))
+    start = assigner.score_class_state()
+    score = assigner.anneal(moves=20000, block=500)
+
+    searched = [report for report in reports if report["event"] == "search"]
+    assert searched
+    best = max(report["best"] for report in searched)
+    assert score == pytest.approx(best)
+    assert score >= start - 1e-9
+    # The returned score is that of the groups left in place
+    assert score == pytest.approx(assigner.score_class_state())
+    for group in assigner.class_state.groups:
+        assert group.score == pytest.approx(assigner.score_group(group))
+
+def test_anneal_at_high_temperature_keeps_best(make_assigner):
+    # At a constant high temperature almost every move is kept, so the search
+    # wanders off the best state, which must still be the one returned
+    reports = []
+    assigner = make_assigner(seed=0, mode="Anneal", metrics=SolverMetrics(callback=reports.append))
+    score = assigner.anneal(moves=5000, schedule=lambda fraction: 1e6, block=100)
+    searched = [report for report in reports if report["event"] == "search"]
+    assert searched[-1]["score"] < max(report["best"] for report in searched)
+    assert score == pytest.approx(max(report["best"] for report in searched))
+    assert score == pytest.approx(assigner.score_class_state())
@@ -0,0 +1,100 @@
+# Tests of anytime_run() checkpoints: a killed run resumes to the same
+# restarts as an uninterrupted one, and checkpoints of other responses are refused
+
+import csv
+
+import pytest
+
+from Group_Assignment import checkpoints
+from Group_Assignment.solverMetrics import SolverMetrics
+from conftest import RESPONSES
+
+TIMELIMIT = 3
+
+class Killed(Exception):
+    '''
+    Stands in for the process being killed mid-search
+    '''
+
+def restart_recorder(scores, kill_at=None):
+    '''
+    Builds a metrics callback recording each restart's score, and raising
+    Killed at the kill_at (restart, iteration) search report if given
+    '''
+    def record(progress):
+        if progress["event"] == "restart":
+            scores[progress["restart"]] = progress["score"]
+        elif kill_at is not None and (len(scores) + 1, progress["iteration"]) == kill_at:
+            raise Killed()
+    return record
+
+def test_resume_after_kill_matches_uninterrupted_run(make_assigner, tmp_path):
+    expected = {}
+    assigner = make_assigner(seed=1, metrics=SolverMetrics(callback=restart_recorder(expected)))
+    assigner.anytime_run(timelimit=TIMELIMIT, seed=1)
+    assert len(expected) >= 2
+
+    path = str(tmp_path / "run.ckpt")
+    before = {}
+    assigner = make_assigner(seed=1, metrics=SolverMetrics(callback=restart_recorder(before, (2, 1000))))
+    with pytest.raises(Killed):
+        assigner.anytime_run(timelimit=TIMELIMIT, seed=1, checkpoint=path, checkpoint_every=0)
+    assert list(before) == [1]
+    saved = checkpoints.read_checkpoint(path)
+    assert (saved.restarts, saved.iteration) == (1, 1000)
+
+    after = {}
+    assigner = make_assigner(seed=1, metrics=SolverMetrics(callback=restart_recorder(after)))
+    score = assigner.anytime_run(timelimit=TIMELIMIT, seed=1, checkpoint=path, resume=True)
+    assert 2 in after
+    for restart in set(after) & set(expected):
+        assert after[restart] == expected[restart]
+    assert score == max(list(before.values()) + list(after.values()))
+    assert score == pytest.approx(assigner.score_class_state())
+
+def rotated_responses(path: str):
+    '''
+    Writes the demo responses with every answer column rotated by one row,
+    keeping each row's NETID
+    '''
+    with open(RESPONSES, newline='') as responses_file:
+        (header, *rows) = list(csv.reader(responses_file))
+    columns = list(zip(*rows))
+    columns = [column if i == 0 else column[1:] + column[:1] for (i, column) in enumerate(columns)]
+    with open(path, 'w', newline='') as rotated_file:
+        writer = csv.writer(rotated_file)
+        writer.writerow(header)
+        writer.writerows(zip(*columns))
+
+def test_checkpoint_of_other_answers_is_refused(make_assigner, tmp_path):
+    path = str(tmp_path / "run.ckpt")
+    make_assigner(seed=1).anytime_run(timelimit=1, seed=1, checkpoint=path)
+
+    rotated = str(tmp_path / "rotated.csv")
+    rotated_responses(rotated)
+    assigner = make_assigner(seed=1, student_csv=rotated)
+    assert [student.name for student in assigner.students] == \
+           [student.name for student in make_assigner(seed=1).students]
+    with pytest.raises(ValueError, match="other students or settings"):
+        assigner.anytime_run(timelimit=1, seed=1, checkpoint=path, resume=True)
+
+def test_checkpoint_scores_are_rescored_on_resume(make_assigner, tmp_path):
+    # A checkpoint passing the fingerprint check still has its groups rescored
+    path = str(tmp_path / "run.ckpt")
+    make_assigner(seed=1).anytime_run(timelimit=1, seed=1, checkpoint=path)
+
+    rotated = str(tmp_path / "rotated.csv")
+    rotated_responses(rotated)
+    assigner = make_assigner(seed=1, student_csv=rotated)
+    saved = checkpoints.read_checkpoint(path)
+    saved.fingerprint = checkpoints.fingerprint(assigner)
+    checkpoints.write_checkpoint(path, saved)
+    with pytest.raises(ValueError, match="does not match the loaded responses"):
+        assigner.anytime_run(timelimit=1, seed=1, checkpoint=path, resume=True)
+
+def test_fingerprint_covers_settings(make_assigner):
+    base = checkpoints.fingerprint(make_assigner(seed=1))
+    assert checkpoints.fingerprint(make_assigner(seed=1)) == base
+    assert checkpoints.fingerprint(make_assigner(seed=1, n_iter=500)) != base
+    assert checkpoints.fingerprint(make_assigner(seed=1, per_group=4)) != base
+    assert checkpoints.fingerprint(make_assigner(seed=2)) != base # Other weights
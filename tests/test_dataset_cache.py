@@ -0,0 +1,134 @@
+# Tests of the encoded dataset cache: cached loads match parsed ones, damaged
+# or foreign cache files are refused, and edited CSVs replace their caches
+
+import os
+import glob
+import pickle
+import random
+import shutil
+
+import pytest
+
+from Group_Assignment import datasetCache
+from conftest import RESPONSES
+
+def cached_files(cache_dir: str):
+    return sorted(glob.glob(os.path.join(cache_dir, "*" + datasetCache.EXTENSION)))
+
+def class_score(assigner, seed: int = 5) -> float:
+    '''
+    Scores the same random groups on any assigner of the same students
+    '''
+    random.seed(seed)
+    assigner.assign_initial_groups()
+    return assigner.score_class_state()
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / "cache")
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+def test_cached_load_matches_parsed(make_assigner, cache_dir, engine):
+    if engine == "numpy":
+        pytest.importorskip("numpy")
+    parsed = make_assigner(engine=engine)
+    written = make_assigner(engine=engine, cache_dir=cache_dir)
+    assert len(cached_files(cache_dir)) == 1
+    loaded = make_assigner(engine=engine, cache_dir=cache_dir)
+    assert isinstance(loaded.students[0].answers, datasetCache.EncodedAnswers)
+
+    for assigner in (written, loaded):
+        assert [student.name for student in assigner.students] == \
+               [student.name for student in parsed.students]
+        assert [student.index for student in assigner.students] == list(range(len(parsed.students)))
+        for (student, expected) in zip(assigner.students, parsed.students):
+            assert dict(student.answers) == dict(expected.answers)
+        assert class_score(assigner) == pytest.approx(class_score(parsed))
+
+    # Answers over the mapped file pickle as plain rows
+    copied = pickle.loads(pickle.dumps(loaded))
+    assert [dict(student.answers) for student in copied.students] == \
+           [dict(student.answers) for student in parsed.students]
+
+def damage(path: str, how: str):
+    with open(path, 'r+b') as cache_file:
+        if how == "format":
+            cache_file.write(b"GACACHE0")
+        elif how == "header":
+            cache_file.seek(len(datasetCache.FORMAT) + 8)
+            cache_file.write(b"\xff" * 16)
+        elif how == "truncated":
+            cache_file.truncate(os.path.getsize(path) // 2)
+        elif how == "empty":
+            cache_file.truncate(0)
+
+@pytest.mark.parametrize("how", ["format", "header", "truncated", "empty"])
+def test_damaged_cache_is_refused(make_assigner, cache_dir, how):
+    make_assigner(cache_dir=cache_dir)
+    (path,) = cached_files(cache_dir)
+    damage(path, how)
+
+    assigner = make_assigner()
+    (students, encoding) = (assigner.students, assigner.encoding)
+    key = datasetCache.dataset_key(assigner, 0)
+    assert not datasetCache.read_dataset(path, key, assigner)
+    assert assigner.students is students and assigner.encoding is encoding
+
+    # Loading parses the CSV again and rewrites the cache
+    reloaded = make_assigner(cache_dir=cache_dir)
+    assert class_score(reloaded) == pytest.approx(class_score(assigner))
+    assert datasetCache.read_dataset(path, key, assigner)
+
+def test_cache_of_other_key_is_refused(make_assigner, cache_dir):
+    make_assigner(cache_dir=cache_dir)
+    (path,) = cached_files(cache_dir)
+    assigner = make_assigner()
+    students = assigner.students
+    assert not datasetCache.read_dataset(path, "0" * 64, assigner)
+    assert assigner.students is students
+
+    # Other question settings change the key, so get a cache of their own
+    key = datasetCache.dataset_key(assigner, 0)
+    assert datasetCache.dataset_key(make_assigner(select_size=50), 50) != key
+    make_assigner(select_size=50, cache_dir=cache_dir)
+    assert len(cached_files(cache_dir)) == 1
+    assert cached_files(cache_dir) != [path]
+
+def test_edited_csv_replaces_stale_cache(make_assigner, cache_dir, tmp_path):
+    responses = str(tmp_path / "responses.csv")
+    shutil.copy(RESPONSES, responses)
+    make_assigner(student_csv=responses, cache_dir=cache_dir)
+    (stale,) = cached_files(cache_dir)
+
+    with open(responses) as responses_file:
+        lines = responses_file.readlines()
+    lines[1] = lines[1].replace("Male", "Female", 1)
+    with open(responses, 'w') as responses_file:
+        responses_file.writelines(lines)
+    assigner = make_assigner(student_csv=responses, cache_dir=cache_dir)
+    (fresh,) = cached_files(cache_dir)
+    assert fresh != stale
+    assert assigner.students[0].answers["What gender do you identify with?"] == "Female"
+
+    loaded = make_assigner(student_csv=responses, cache_dir=cache_dir)
+    assert isinstance(loaded.students[0].answers, datasetCache.EncodedAnswers)
+    assert loaded.students[0].answers["What gender do you identify with?"] == "Female"
+
+def test_same_named_csvs_keep_their_caches(make_assigner, cache_dir, tmp_path):
+    paths = []
+    for directory in ("one", "two"):
+        os.mkdir(str(tmp_path / directory))
+        paths.append(str(tmp_path / directory / "responses.csv"))
+        shutil.copy(RESPONSES, paths[-1])
+    with open(RESPONSES) as responses_file:
+        lines = responses_file.readlines()
+    with open(paths[1], 'w') as responses_file:
+        responses_file.writelines(lines[:-1])
+
+    for path in paths:
+        make_assigner(student_csv=path, cache_dir=cache_dir)
+    assert len(cached_files(cache_dir)) == 2
+    for (path, expected) in zip(paths, (117, 116)):
+        assigner = make_assigner(student_csv=path, cache_dir=cache_dir)
+        assert isinstance(assigner.students[0].answers, datasetCache.EncodedAnswers)
+        assert len(assigner.students) == expected
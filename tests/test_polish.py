@@ -0,0 +1,19 @@
+# Tests of polish(): compound moves never leave the class scoring lower than
+# they found it, even when moves which lower the score are made
+
+import pytest
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("patience", [1, 20])
+def test_polish_never_lowers_score(make_assigner, engine, seed, patience):
+    if engine == "numpy":
+        pytest.importorskip("numpy")
+    assigner = make_assigner(engine=engine, seed=seed)
+    assigner.iterate_normal(iterations=500)
+    before = assigner.score_class_state()
+    score = assigner.polish(rounds=150, patience=patience)
+    assert score >= before - 1e-9
+    assert score == pytest.approx(assigner.score_class_state())
+    assert sorted(student.index for group in assigner.class_state.groups
+                  for student in group.students) == list(range(len(assigner.students)))
@@ -0,0 +1,118 @@
+# Tests of repair(): a previous assignment is carried over to a changed roster,
+# keeping locked students, leaving out dropped ones, and moving few others
+
+import csv
+from collections import Counter
+
+import pytest
+
+from conftest import RESPONSES
+
+ROSTER = 20
+
+def write_roster(path: str, rows: int = ROSTER, skip=()):
+    '''
+    Writes the first rows of the demo responses, leaving out those at the
+    positions in skip
+    '''
+    with open(RESPONSES, newline='') as responses_file:
+        (header, *students) = list(csv.reader(responses_file))
+    with open(path, 'w', newline='') as roster_file:
+        writer = csv.writer(roster_file)
+        writer.writerow(header)
+        writer.writerows(student for (i, student) in enumerate(students[:rows]) if i not in skip)
+
+def placements(assigner):
+    '''
+    Gets the group number of each assigned student by name, checking that
+    no student is assigned twice
+    '''
+    names = [student.name for group in assigner.class_state.groups for student in group.students]
+    assert not [name for (name, count) in Counter(names).items() if count > 1]
+    return {student.name: group.number
+            for group in assigner.class_state.groups for student in group.students}
+
+@pytest.fixture
+def previous(make_assigner, tmp_path):
+    '''
+    Writes a random assignment of the roster, returning the assignment file
+    and each student's group number
+    '''
+    roster = str(tmp_path / "roster.csv")
+    write_roster(roster)
+    assigner = make_assigner(seed=3, student_csv=roster)
+    path = str(tmp_path / "previous.csv")
+    assigner.output_state('c', path)
+    return (path, placements(assigner))
+
+def repaired(make_assigner, tmp_path, previous_csv, rows=ROSTER, skip=(), **kwargs):
+    '''
+    Repairs the previous assignment onto the first rows of the responses
+    '''
+    roster = str(tmp_path / "current.csv")
+    write_roster(roster, rows, skip)
+    assigner = make_assigner(seed=3, student_csv=roster, mode="Repair")
+    score = assigner.repair(previous_csv, **kwargs)
+    assert score == pytest.approx(assigner.score_class_state())
+    return assigner
+
+def moved(before, after):
+    '''
+    Names the continuing students placed in another group than before
+    '''
+    return {name for name in after if name in before and after[name] != before[name]}
+
+def test_unchanged_roster_moves_nobody(make_assigner, tmp_path, previous):
+    (path, before) = previous
+    after = placements(repaired(make_assigner, tmp_path, path))
+    assert after == before
+
+def test_dropped_students_are_removed(make_assigner, tmp_path, previous):
+    (path, before) = previous
+    names = sorted(before)
+    assigner = repaired(make_assigner, tmp_path, path, skip={0}, dropped=[names[5]])
+    after = placements(assigner)
+    assert names[5] not in after
+    assert "1" not in after
+    assert set(after) == set(before) - {"1", names[5]}
+    assert sum(len(group.students) for group in assigner.class_state.groups) == ROSTER - 2
+
+def test_added_student_is_assigned_once(make_assigner, tmp_path, previous):
+    (path, before) = previous
+    assigner = repaired(make_assigner, tmp_path, path, rows=ROSTER + 1)
+    after = placements(assigner)
+    assert set(after) == set(before) | {student.name for student in assigner.students}
+    assert len(after) == ROSTER + 1
+
+def test_locked_students_stay(make_assigner, tmp_path, previous):
+    (path, before) = previous
+    # Dropping three of a group of five dissolves it, unless a member is locked
+    group = [name for name in sorted(before) if before[name] == before["1"]]
+    dropped = group[:3]
+    locked = group[3:4] + [name for name in before if name not in group][::3]
+    assigner = repaired(make_assigner, tmp_path, path, dropped=dropped, locked=locked,
+                        iterations=500)
+    after = placements(assigner)
+    assert all(after[name] == before[name] for name in locked)
+    assert not set(dropped) & set(after)
+    assert set(after) == set(before) - set(dropped)
+
+def test_moves_are_minimal(make_assigner, tmp_path, previous):
+    (path, before) = previous
+    # One drop leaves four groups of sizes 5, 5, 5, and 4: nobody need move
+    dropped = sorted(before)[:1]
+    after = placements(repaired(make_assigner, tmp_path, path, dropped=dropped, iterations=1))
+    assert len(moved(before, after)) <= 2 # At most the one swap allowed
+
+    assigner = make_assigner(seed=3, student_csv=str(tmp_path / "current.csv"), mode="Repair")
+    assigner.carry_over(assigner.read_assignment(path), dropped, [], 25)
+    assert not moved(before, placements(assigner))
+
+    # Dropping three of a group of five leaves 17 students in three groups:
+    # only the two left in the dissolved group move
+    group = [name for name in sorted(before) if before[name] == before["1"]]
+    assigner = make_assigner(seed=3, student_csv=str(tmp_path / "current.csv"), mode="Repair")
+    assigner.carry_over(assigner.read_assignment(path), group[:3], [], 25)
+    after = placements(assigner)
+    assert len(assigner.class_state.groups) == 3
+    assert moved(before, after) == set(group[3:])
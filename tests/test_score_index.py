@@ -0,0 +1,51 @@
+# Tests of ScoreIndex: its tournament trees and running total agree with a
+# linear scan of the group scores after every update
+
+import random
+
+import pytest
+
+from Group_Assignment.courseElements import Group
+from Group_Assignment.scoreIndex import ScoreIndex
+
+def make_groups(scores):
+    groups = []
+    for (number, score) in enumerate(scores):
+        group = Group()
+        group.number = number
+        group.score = score
+        groups.append(group)
+    return groups
+
+def check(index, groups):
+    '''
+    Compares the index with a linear scan, which takes the earliest group on ties
+    '''
+    scores = [group.score for group in groups]
+    assert index.min_group() is groups[scores.index(min(scores))]
+    assert index.max_group() is groups[scores.index(max(scores))]
+    assert index.total == pytest.approx(sum(scores))
+
+@pytest.mark.parametrize("n_groups", [1, 2, 7, 8, 13])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_index_follows_updates(n_groups, seed):
+    rng = random.Random(seed)
+    # Few distinct scores, so that ties are common
+    groups = make_groups([rng.choice([-1.5, 0, 0.25, 2]) for _ in range(n_groups)])
+    index = ScoreIndex(groups)
+    check(index, groups)
+    for _ in range(200):
+        group = rng.choice(groups)
+        group.score = rng.choice([-1.5, 0, 0.25, 2, rng.uniform(-3, 3)])
+        index.update(group)
+        check(index, groups)
+
+def test_unchanged_groups_keep_indexed_scores():
+    groups = make_groups([1, 2, 3])
+    index = ScoreIndex(groups)
+    groups[0].score = 10 # Not yet updated
+    assert index.max_group() is groups[2]
+    assert index.total == 6
+    index.update(groups[0])
+    assert index.max_group() is groups[0]
+    assert index.total == 15
@@ -0,0 +1,129 @@
+# Tests of the batched swap scoring primitives: Column.swap_matrix(),
+# ColumnEncoding.swap_matrix(), GroupAssign.swap_candidates() and
+# GroupAssign.swap_deltas(), checked against the sequential swap_score() and
+# the sequential best swap search they replace
+
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from Group_Assignment.groupAssignmentTool import GroupAssign
+
+ENGINES = ["python", "numpy"]
+
+def group_pairs(assigner: GroupAssign, n_pairs: int = 20):
+    '''
+    Yields pairs of distinct groups, including groups of different member counts
+    '''
+    groups = assigner.class_state.groups
+    rng = random.Random(1)
+    for i in range(n_pairs):
+        yield tuple(rng.sample(groups, 2))
+
+def sequential_swap_scores(assigner: GroupAssign, group_one, group_two):
+    '''
+    Scores every pairing by swapping, rescoring both groups, and swapping back
+    '''
+    shape = (len(group_one.students), len(group_two.students))
+    (g1_scores, g2_scores) = (np.zeros(shape), np.zeros(shape))
+    for (i, student_one) in enumerate(list(group_one.students)):
+        for (j, student_two) in enumerate(list(group_two.students)):
+            assigner.swap(group_one, student_one, group_two, student_two)
+            g1_scores[i, j] = assigner.score_group(group_one)
+            g2_scores[i, j] = assigner.score_group(group_two)
+            assigner.swap(group_one, student_two, group_two, student_one)
+    return (g1_scores, g2_scores)
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_column_swap_matrix_matches_swap_score(make_assigner, engine):
+    assigner = make_assigner(engine)
+    encoding = assigner.encoding
+    if not encoding.vectorized:
+        encoding.vectorize()
+    for (group_one, group_two) in group_pairs(assigner):
+        rows_one = [student.index for student in group_one.students]
+        rows_two = [student.index for student in group_two.students]
+        for (column, stats) in zip(encoding.columns, group_one.stats):
+            matrix = column.swap_matrix(stats, np.asarray(rows_one), np.asarray(rows_two),
+                                        group_one.size, len(rows_one))
+            expected = [[column.swap_score(stats, out_row, in_row, group_one.size, len(rows_one))
+                         for in_row in rows_two] for out_row in rows_one]
+            assert np.allclose(matrix, expected), column.question
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_encoding_swap_matrix_matches_swap_score(make_assigner, engine):
+    assigner = make_assigner(engine)
+    encoding = assigner.encoding
+    if not encoding.vectorized:
+        encoding.vectorize()
+    for (group_one, group_two) in group_pairs(assigner):
+        rows_one = [student.index for student in group_one.students]
+        rows_two = [student.index for student in group_two.students]
+        matrix = encoding.swap_matrix(group_one.stats, rows_one, rows_two, group_one.size, len(rows_one))
+        assert matrix.shape == (len(rows_one), len(rows_two))
+        for (i, out_row) in enumerate(rows_one):
+            for (j, in_row) in enumerate(rows_two):
+                expected = encoding.swap_score(group_one.stats, out_row, in_row, group_one.size, len(rows_one))
+                assert matrix[i, j] == pytest.approx(expected)
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_swap_score_matches_rescoring(make_assigner, engine):
+    assigner = make_assigner(engine)
+    encoding = assigner.encoding
+    for (group_one, group_two) in group_pairs(assigner, 5):
+        (g1_expected, g2_expected) = sequential_swap_scores(assigner, group_one, group_two)
+        for (i, student_one) in enumerate(group_one.students):
+            for (j, student_two) in enumerate(group_two.students):
+                g1_score = encoding.swap_score(group_one.stats, student_one.index, student_two.index,
+                                               group_one.size, len(group_one.students))
+                g2_score = encoding.swap_score(group_two.stats, student_two.index, student_one.index,
+                                               group_two.size, len(group_two.students))
+                assert g1_score == pytest.approx(g1_expected[i, j])
+                assert g2_score == pytest.approx(g2_expected[i, j])
+
+def test_swap_deltas_match_sequential_swaps(make_assigner):
+    assigner = make_assigner("numpy")
+    for (group_one, group_two) in group_pairs(assigner):
+        (g1_expected, g2_expected) = sequential_swap_scores(assigner, group_one, group_two)
+        (g1_scores, g2_scores) = assigner.swap_candidates(group_one, group_two)
+        assert np.allclose(g1_scores, g1_expected)
+        assert np.allclose(g2_scores, g2_expected)
+        deltas = assigner.swap_deltas(group_one, group_two)
+        assert np.allclose(deltas, g1_expected + g2_expected - (group_one.score + group_two.score))
+
+def test_swap_candidates_without_stats(make_assigner):
+    assigner = make_assigner("numpy")
+    (group_one, group_two) = next(group_pairs(assigner))
+    expected = assigner.swap_deltas(group_one, group_two)
+    (group_one.stats, group_two.stats) = (None, None)
+    assert np.allclose(assigner.swap_deltas(group_one, group_two), expected)
+
+@pytest.mark.parametrize("seed", range(3))
+def test_best_swap_argmax_matches_sequential_search(make_assigner, seed):
+    # The numpy engine picks the argmax of swap_candidates(), the python engine
+    # searches pairings one by one from swap_score(), on the same groups
+    numpy_assigner = make_assigner("numpy", seed)
+    python_assigner = make_assigner("python", seed)
+    pairs = zip(group_pairs(numpy_assigner, 30), group_pairs(python_assigner, 30))
+    improving = 0
+    for ((numpy_one, numpy_two), (python_one, python_two)) in pairs:
+        assert [s.name for s in numpy_one.students] == [s.name for s in python_one.students]
+        assert [s.name for s in numpy_two.students] == [s.name for s in python_two.students]
+        (numpy_from_one, numpy_from_two, numpy_g1, numpy_g2) = numpy_assigner.best_swap(numpy_one, numpy_two)
+        (python_from_one, python_from_two, python_g1, python_g2) = python_assigner.best_swap(python_one, python_two)
+        if python_from_one is None:
+            assert numpy_from_one is None and numpy_from_two is None
+            continue
+        improving += 1
+        assert numpy_from_one.name == python_from_one.name
+        assert numpy_from_two.name == python_from_two.name
+        assert numpy_g1 == pytest.approx(python_g1)
+        assert numpy_g2 == pytest.approx(python_g2)
+
+        deltas = numpy_assigner.swap_deltas(numpy_one, numpy_two)
+        (i, j) = np.unravel_index(int(deltas.argmax()), deltas.shape)
+        assert deltas[i, j] > 0
+        assert (numpy_one.students[i], numpy_two.students[j]) == (numpy_from_one, numpy_from_two)
+    assert improving > 0
@@ -0,0 +1,60 @@
+# Tests of upper_bound(): no grouping of a tiny class, found by brute force,
+# scores above the bound
+
+import pytest
+
+def partitions(students, sizes):
+    '''
+    Lists every way of splitting students into groups of the given sizes,
+    leaving out reorderings of equally sized groups
+    '''
+    if not sizes:
+        yield []
+        return
+    (first, rest) = (students[0], students[1:])
+    (size, *others) = sizes
+    for members in combinations(rest, size - 1):
+        remaining = [student for student in rest if student not in members]
+        for grouping in partitions(remaining, others):
+            yield [[first] + list(members)] + grouping
+
+def combinations(students, size):
+    if size == 0:
+        yield ()
+        return
+    for (i, student) in enumerate(students):
+        for others in combinations(students[i + 1:], size - 1):
+            yield (student,) + others
+
+def brute_force_optimum(assigner) -> float:
+    groups = assigner.class_state.groups
+    sizes = [len(group.students) for group in groups]
+    best = float('-inf')
+    for grouping in partitions(list(assigner.students), sizes):
+        for (group, members) in zip(groups, grouping):
+            group.students = members
+        assigner.index_class_state()
+        best = max(best, assigner.score_class_state())
+    return best
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+@pytest.mark.parametrize("n_students, per_group", [(6, 3), (8, 4), (9, 3), (7, 3)])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_bound_is_at_least_brute_forced_optimum(make_assigner, engine, n_students, per_group, seed):
+    if engine == "numpy":
+        pytest.importorskip("numpy")
+    assigner = make_assigner(engine=engine, seed=seed, per_group=per_group, select_size=n_students)
+    assert len(assigner.students) == n_students
+    bound = assigner.upper_bound()
+    assert bound is not None
+    optimum = brute_force_optimum(assigner)
+    assert bound >= optimum - 1e-9
+    assert assigner.optimality_gap(optimum) == pytest.approx(max(0, bound - optimum)/(abs(bound) or 1))
+
+def test_bound_is_at_least_known_optimum(make_assigner):
+    for seed in range(3):
+        assigner = make_assigner(seed=seed, student_csv=None, select_size=30)
+        bound = assigner.upper_bound()
+        assert bound is not None
+        assert bound >= assigner.opt_score - 1e-9
+        assert assigner.optimality_gap(assigner.opt_score) >= 0